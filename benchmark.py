@@ -0,0 +1,304 @@
+# Benchmarks for the hand-tracking pipeline on synthetic or recorded input, without camera or window
+import argparse
+import contextlib
+import json
+import os
+import socket
+import sys
+import time
+
+import cv2
+import numpy as np
+
+import hand
+from calibration import load_session
+from event_log import EventLog
+from frame_pool import FramePool
+from frame_sources import SyntheticSource, open_frame_source
+from machine_info import machine_info
+
+# Fractional slowdown of a benchmark's median accepted before it counts as a regression
+DEFAULT_TOLERANCE = 0.2
+BASELINE_DIR = "benchmarks"
+
+
+def load_frames(spec, count, width, height):
+    """Read up to count BGR frames into memory, so disk and decode time are not measured"""
+    if spec == "synthetic":
+        source = SyntheticSource(width, height)
+    else:
+        source = open_frame_source(spec)
+    frames = []
+    try:
+        while len(frames) < count:
+            ret, frame, _ = source.read()
+            if not ret:
+                break
+            frames.append(frame.copy())
+    finally:
+        source.release()
+    if not frames:
+        raise SystemExit(f"No frames could be read from {spec}")
+    return frames
+
+
+def hand_template():
+    """Rough open right hand as (21, 3) offsets from the wrist, fingers pointing up"""
+    points = np.zeros((21, 3), np.float32)
+    for finger in range(5):
+        angle = np.radians(-50 + finger * 22)
+        # Thumb is shorter than the other fingers
+        length = 0.7 if finger == 0 else 1.0
+        for joint in range(4):
+            radius = (0.07 + joint * 0.035) * length
+            points[1 + finger * 4 + joint, 0] = np.sin(angle) * radius
+            points[1 + finger * 4 + joint, 1] = -np.cos(angle) * radius
+    return points
+
+
+def synthetic_session(frames, max_hands=2, fps=30.0):
+    """Session in the SessionRecorder layout with two hands whose fingers tap in turn"""
+    template = hand_template()
+    num_hands = min(2, max_hands)
+    landmarks = np.zeros((frames, max_hands, 21, 3), np.float32)
+    handedness = np.full((frames, max_hands), -1, np.int8)
+    for frame in range(frames):
+        for hand_index in range(num_hands):
+            # Left hand on the left half of the display image, mirrored template
+            points = template.copy()
+            if hand_index == 0:
+                points[:, 0] *= -1
+            points[:, 0] += 0.3 + 0.4 * hand_index + 0.01 * np.sin(frame * 0.1)
+            points[:, 1] += 0.75
+            for finger in range(5):
+                # Each fingertip dips below its baseline for 3 of every 30 frames
+                if (frame + 6 * finger + 3 * hand_index) % 30 < 3:
+                    points[4 + finger * 4, 1] += 0.12
+            landmarks[frame, hand_index] = points
+            handedness[frame, hand_index] = hand_index
+    return {
+        "landmarks": landmarks,
+        "handedness": handedness,
+        "num_hands": np.full(frames, num_hands, np.int32),
+        "timestamps": np.arange(frames) / fps,
+    }
+
+
+def measure(func, count, warmup, setup=None):
+    """Call func(i) count times after warmup calls and return timing statistics in ms"""
+    for i in range(warmup):
+        if setup is not None:
+            setup(i)
+        func(i)
+    times = np.empty(count)
+    for i in range(count):
+        if setup is not None:
+            setup(i)
+        start = time.perf_counter()
+        func(i)
+        times[i] = time.perf_counter() - start
+    times *= 1000
+    return {
+        "median_ms": round(float(np.median(times)), 4),
+        "p95_ms": round(float(np.percentile(times, 95)), 4),
+        "mean_ms": round(float(times.mean()), 4),
+        "min_ms": round(float(times.min()), 4),
+        "runs": count,
+    }
+
+
+class PipelineBench:
+    """The per-frame stages of hand.py, driven by in-memory frames and landmark arrays"""
+
+    def __init__(self, frames, session, max_hands):
+        self.frames = frames
+        self.session = session
+        self.max_hands = max_hands
+        self.frame_shape = frames[0].shape
+        height, width = self.frame_shape[:2]
+        self.aspect = width / height
+        self.pool = FramePool()
+        self.piano = hand.VirtualPiano(max_hands, event_log=EventLog(echo=False))
+        self.canvas = np.empty(self.frame_shape, np.uint8)
+        # Session timestamps repeat, so the frame clock keeps counting across passes
+        self.frame_time = time.perf_counter()
+        timestamps = session["timestamps"]
+        self.frame_interval = float(np.median(np.diff(timestamps))) if len(timestamps) > 1 else 1 / 30
+
+    def load_landmarks(self, i):
+        """Copy session frame i into the piano's landmark arrays"""
+        piano = self.piano
+        frame = i % len(self.session["num_hands"])
+        num_hands = min(int(self.session["num_hands"][frame]), self.max_hands)
+        piano.landmarks[:num_hands] = self.session["landmarks"][frame, :num_hands]
+        piano.handedness_codes[:num_hands] = self.session["handedness"][frame, :num_hands]
+        piano.num_hands = num_hands
+
+    def next_frame_time(self):
+        self.frame_time += self.frame_interval
+        return self.frame_time
+
+    def detect(self, i):
+        self.load_landmarks(i)
+        self.piano.detect(self.next_frame_time(), self.aspect)
+
+    def prepare_canvas(self, i):
+        np.copyto(self.canvas, self.frames[i % len(self.frames)])
+        self.detect(i)
+
+    def render(self, i):
+        self.piano.draw_overlay(self.canvas, 30.0)
+        self.piano.expire_feedback()
+
+    def flip_and_convert(self, i):
+        raw = self.frames[i % len(self.frames)]
+        img = cv2.flip(raw, 1, dst=self.pool.get("display", self.frame_shape))
+        return cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=self.pool.get("rgb", self.frame_shape))
+
+    def end_to_end(self, i):
+        """One main-loop iteration of hand.py, minus inference, imshow and waitKey"""
+        raw = self.pool.get("raw", self.frame_shape)
+        np.copyto(raw, self.frames[i % len(self.frames)])
+        img = cv2.flip(raw, 1, dst=self.pool.get("display", self.frame_shape))
+        cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=self.pool.get("rgb", self.frame_shape))
+        self.detect(i)
+        self.piano.draw_overlay(img, 30.0)
+        self.piano.expire_feedback()
+
+
+def run_benchmarks(frames, session, args):
+    """Run every selected benchmark and return {name: stats}"""
+    bench = PipelineBench(frames, session, args.max_hands)
+    height, width = frames[0].shape[:2]
+    count, warmup = args.iterations, args.warmup
+
+    benchmarks = [
+        ("press_detection", lambda: measure(bench.detect, count, warmup)),
+        ("render_overlay", lambda: measure(bench.render, count, warmup, setup=bench.prepare_canvas)),
+        ("flip_and_convert", lambda: measure(bench.flip_and_convert, count, warmup)),
+        ("end_to_end", lambda: measure(bench.end_to_end, count, warmup)),
+    ]
+    for complexity in args.model_complexity:
+        benchmarks.append((f"inference_complexity_{complexity}",
+                           lambda complexity=complexity: measure_inference(frames, width, height, complexity, args)))
+
+    results = {}
+    for name, run in benchmarks:
+        if args.only and not any(pattern in name for pattern in args.only):
+            continue
+        # Note and chord output would dominate the timings
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            rounds = [run() for _ in range(args.rounds)]
+        # Keep the least disturbed round, background load only ever makes runs slower
+        stats = min(rounds, key=lambda stats: stats["median_ms"]) if None not in rounds else None
+        if stats is None:
+            print(f"{name:<24} skipped (MediaPipe hand model not available)")
+            continue
+        results[name] = stats
+        print(f"{name:<24} median {stats['median_ms']:8.3f} ms  p95 {stats['p95_ms']:8.3f} ms  "
+              f"min {stats['min_ms']:8.3f} ms")
+    return results
+
+
+def measure_inference(frames, width, height, complexity, args):
+    """Time hands.process() on the frames, or return None without a usable MediaPipe"""
+    try:
+        hands = hand.load_hand_model((width, height), args.max_hands, complexity)
+    except (ImportError, AttributeError):
+        return None
+    rgb_frames = [cv2.cvtColor(cv2.flip(frame, 1), cv2.COLOR_BGR2RGB) for frame in frames]
+    try:
+        return measure(lambda i: hands.process(rgb_frames[i % len(rgb_frames)]),
+                       args.inference_iterations, min(args.warmup, 5))
+    finally:
+        hands.close()
+
+
+def compare(results, baseline, tolerance):
+    """Print the change against the baseline and return the names of regressed benchmarks"""
+    if baseline["machine"] != machine_info():
+        print("Warning: baseline was recorded on a different machine or software setup")
+    regressions = []
+    print(f"\nAgainst baseline from {baseline['created']} (tolerance {tolerance:.0%}):")
+    for name, stats in results.items():
+        reference = baseline["results"].get(name)
+        if reference is None:
+            print(f"{name:<24} no baseline")
+            continue
+        change = stats["median_ms"] / reference["median_ms"] - 1
+        status = "REGRESSION" if change > tolerance else "ok"
+        if change > tolerance:
+            regressions.append(name)
+        print(f"{name:<24} {reference['median_ms']:8.3f} -> {stats['median_ms']:8.3f} ms  {change:+7.1%}  {status}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the hand-tracking pipeline")
+    parser.add_argument("--source", default="synthetic",
+                        help="'synthetic', video file or image folder/glob to take frames from")
+    parser.add_argument("--landmarks", help="landmark session (.npz) from hand.py --record-landmarks")
+    parser.add_argument("--width", type=int, default=640, help="synthetic frame width")
+    parser.add_argument("--height", type=int, default=480, help="synthetic frame height")
+    parser.add_argument("--frames", type=int, default=120, help="frames kept in memory and cycled through")
+    parser.add_argument("--max-hands", type=int, default=2, help="maximum number of hands tracked")
+    parser.add_argument("--iterations", type=int, default=500, help="timed runs per benchmark")
+    parser.add_argument("--inference-iterations", type=int, default=60, help="timed runs per inference benchmark")
+    parser.add_argument("--rounds", type=int, default=3, help="repetitions of each benchmark, fastest kept")
+    parser.add_argument("--warmup", type=int, default=20, help="untimed runs before each benchmark")
+    parser.add_argument("--model-complexity", type=int, nargs="*", default=[0, 1],
+                        help="MediaPipe model complexities to benchmark (none to skip inference)")
+    parser.add_argument("--only", nargs="+", help="run only benchmarks whose name contains one of these")
+    parser.add_argument("--baseline", help=f"baseline JSON (default: {BASELINE_DIR}/<hostname>.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed median slowdown before failing, e.g. 0.2 = 20%%")
+    parser.add_argument("-o", "--output", help="also write the results JSON here")
+    args = parser.parse_args()
+
+    frames = load_frames(args.source, args.frames, args.width, args.height)
+    if args.landmarks:
+        session = load_session(args.landmarks)
+    else:
+        session = synthetic_session(args.frames, args.max_hands)
+    height, width = frames[0].shape[:2]
+    print(f"{len(frames)} frames of {width}x{height} from {args.source}, "
+          f"{len(session['num_hands'])} landmark frames from {args.landmarks or 'synthetic hands'}")
+
+    report = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "machine": machine_info(),
+        "settings": {"source": args.source, "landmarks": args.landmarks, "width": width,
+                     "height": height, "frames": len(frames), "max_hands": args.max_hands},
+        "results": run_benchmarks(frames, session, args),
+    }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    baseline_path = args.baseline or os.path.join(BASELINE_DIR, f"{socket.gethostname()}.json")
+    if args.save_baseline:
+        directory = os.path.dirname(baseline_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline saved to {baseline_path}")
+        return
+
+    if not os.path.exists(baseline_path):
+        print(f"\nNo baseline at {baseline_path}; run with --save-baseline to create one")
+        return
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline["settings"] != report["settings"]:
+        print("Warning: baseline was recorded with different input settings")
+    regressions = compare(report["results"], baseline, args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) regressed: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+# Black-box recorder: the last few seconds of downscaled frames and detection state in a
+# fixed-size memory-mapped ring, dumped to a replayable .npz on request
+import argparse
+import mmap
+import os
+import struct
+import threading
+import time
+
+import cv2
+import numpy as np
+
+RING_MAGIC = b"HBBX"
+RING_VERSION = 1
+NUM_LANDMARKS = 21
+
+# Header: magic, version, latest recorded sequence number, slot count, max hands,
+# fingers, frame width, frame height
+HEADER = struct.Struct("<4sIQIIIII")
+HEADER_SIZE = 64
+LATEST_SEQ_OFFSET = 8
+
+
+def slot_dtype(max_hands, fingers, width, height):
+    """Layout of one recorded frame; slots with seq 0 were never written"""
+    return np.dtype([
+        ("seq", "<u8"),
+        ("timestamp", "<f8"),
+        ("num_hands", "<u4"),
+        ("handedness", "i1", (max_hands,)),
+        ("hand_ids", "<i4", (max_hands,)),
+        ("landmarks", "<f4", (max_hands, NUM_LANDMARKS, 3)),
+        ("baselines", "<f4", (max_hands, fingers)),
+        ("triggered", "?", (max_hands, fingers)),
+        ("frame", "u1", (height, width, 3)),
+    ], align=True)
+
+
+class _BlackBoxRing:
+    """Numpy views of the ring inside a mapped ring file"""
+
+    def _map(self, mapping, slots, max_hands, fingers, width, height):
+        self.mapping = mapping
+        self.slots = slots
+        self.max_hands = max_hands
+        self.frame_size = (width, height)
+        self.ring = np.ndarray((slots,), slot_dtype(max_hands, fingers, width, height),
+                               buffer=mapping, offset=HEADER_SIZE)
+        self.latest = np.ndarray((1,), "<u8", buffer=mapping, offset=LATEST_SEQ_OFFSET)
+        self.seq = self.ring["seq"]
+        self.timestamps = self.ring["timestamp"]
+        self.num_hands = self.ring["num_hands"]
+        self.handedness = self.ring["handedness"]
+        self.hand_ids = self.ring["hand_ids"]
+        self.landmarks = self.ring["landmarks"]
+        self.baselines = self.ring["baselines"]
+        self.triggered = self.ring["triggered"]
+        self.frames = self.ring["frame"]
+
+    def snapshot(self, latest=None, chunk_slots=64):
+        """Copy the recorded frames up to sequence number latest (default: the newest) out of
+        the ring, oldest first, as a dict of arrays
+
+        The ring may still be written meanwhile: slots are copied a chunk at a time, oldest
+        first, and a slot that no longer holds its sequence number after the copy was
+        overwritten during it and is left out.
+        """
+        if latest is None:
+            latest = int(self.latest[0])
+        seqs = np.arange(max(1, latest - self.slots + 1), latest + 1)
+        chunks = []
+        for start in range(0, len(seqs), chunk_slots):
+            chunk_seqs = seqs[start:start + chunk_slots]
+            order = chunk_seqs % self.slots
+            copied = self.ring[order]
+            # A slot holding another sequence number was skipped, never written, or is being rewritten
+            chunks.append(copied[self.seq[order] == chunk_seqs])
+        data = np.concatenate(chunks) if chunks else self.ring[:0].copy()
+        return {
+            "timestamps": data["timestamp"],
+            "num_hands": data["num_hands"].astype(np.int32),
+            "handedness": data["handedness"],
+            "landmarks": data["landmarks"],
+            "hand_ids": data["hand_ids"],
+            "baselines": data["baselines"],
+            "triggered": data["triggered"],
+            "frames": data["frame"],
+        }
+
+    def close(self):
+        # Views into the mapping have to go before it can be closed
+        self.ring = self.latest = self.seq = self.timestamps = self.num_hands = None
+        self.handedness = self.hand_ids = self.landmarks = self.baselines = None
+        self.triggered = self.frames = None
+        self.mapping.close()
+
+
+class BlackBoxRecorder(_BlackBoxRing):
+    """Keeps the last `seconds` of frames and detection state in a ring file of constant size
+
+    The ring lives in a memory-mapped file, so its contents also survive a crash and can
+    be read back with read_ring(). Each record() copies one downscaled frame and a few
+    small arrays into the next slot without allocating.
+    """
+
+    def __init__(self, path, frame_size, seconds=10.0, rate=60.0, max_hands=2, fingers=5):
+        width, height = frame_size
+        slots = max(1, int(np.ceil(seconds * rate)))
+        size = HEADER_SIZE + slots * slot_dtype(max_hands, fingers, width, height).itemsize
+        # Frames arriving faster than this are not recorded, unless they trigger a note
+        # (with some slack for capture timestamp jitter)
+        self.min_interval = 0.9 / rate
+        self.last_timestamp = None
+        self.path = path
+        self.dump_threads = []
+
+        with open(path, "w+b") as f:
+            f.truncate(size)
+            mapping = mmap.mmap(f.fileno(), size)
+        HEADER.pack_into(mapping, 0, RING_MAGIC, RING_VERSION, 0, slots, max_hands, fingers, width, height)
+        self._map(mapping, slots, max_hands, fingers, width, height)
+        self.seq[:] = 0
+        self.next_seq = 1
+
+    def record(self, timestamp, frame, landmarks, handedness, num_hands, triggered, ids, baselines, slots):
+        """Store one frame; ids, baselines are the tracker's arrays and slots the per-hand rows"""
+        if (self.last_timestamp is not None and timestamp - self.last_timestamp < self.min_interval
+                and not triggered[:num_hands].any()):
+            return
+        self.last_timestamp = timestamp
+        num_hands = min(num_hands, self.max_hands)
+        seq = self.next_seq
+        slot = seq % self.slots
+
+        # Invalidate the slot while it is being rewritten, for readers of a crashed ring
+        self.seq[slot] = 0
+        self.timestamps[slot] = timestamp
+        self.num_hands[slot] = num_hands
+        self.handedness[slot, :num_hands] = handedness[:num_hands]
+        self.landmarks[slot, :num_hands] = landmarks[:num_hands]
+        self.triggered[slot, :num_hands] = triggered[:num_hands]
+        np.take(ids, slots[:num_hands], out=self.hand_ids[slot, :num_hands])
+        np.take(baselines, slots[:num_hands], axis=0, out=self.baselines[slot, :num_hands])
+        cv2.resize(frame, self.frame_size, dst=self.frames[slot], interpolation=cv2.INTER_AREA)
+        self.seq[slot] = seq
+
+        self.latest[0] = seq
+        self.next_seq = seq + 1
+
+    def dump(self, path, done=None):
+        """Write the ring's current contents to a .npz in the background
+
+        Only the newest sequence number is read here; the frames are copied out of the ring
+        and saved on the dump thread, which calls done(frames) once the file is written.
+        """
+        thread = threading.Thread(target=self._dump, args=(path, int(self.latest[0]), done), name="black-box-dump")
+        thread.start()
+        self.dump_threads.append(thread)
+
+    def _dump(self, path, latest, done):
+        session = self.snapshot(latest)
+        save_dump(path, session)
+        if done is not None:
+            done(len(session["timestamps"]))
+
+    def close(self, remove=True):
+        for thread in self.dump_threads:
+            thread.join()
+        super().close()
+        if remove:
+            os.remove(self.path)
+
+
+class _RingFile(_BlackBoxRing):
+    """Read-only view of a ring file left behind by a recorder"""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, slots, max_hands, fingers, width, height = HEADER.unpack_from(mapping, 0)
+        if magic != RING_MAGIC or version != RING_VERSION:
+            mapping.close()
+            raise ValueError(f"{path} is not a version {RING_VERSION} black-box ring")
+        self._map(mapping, slots, max_hands, fingers, width, height)
+
+
+def save_dump(path, session):
+    """Save a snapshot; landmarks, handedness, num_hands and timestamps load like a recorded session"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    np.savez_compressed(path, **session)
+
+
+def read_ring(path):
+    """Snapshot of a ring file, e.g. one left behind by a crashed run"""
+    ring = _RingFile(path)
+    try:
+        return ring.snapshot()
+    finally:
+        ring.close()
+
+
+def dump_path(directory="blackbox"):
+    """Timestamped dump file name, unique for dumps in the same second"""
+    now = time.time()
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(now))
+    return os.path.join(directory, f"blackbox-{stamp}-{int(now * 1000) % 1000:03d}.npz")
+
+
+def replay(session, scale=4):
+    """Step through a dump: space pauses, ',' and '.' step, 'q' quits"""
+    # Imported here, hand.py imports this module
+    from hand import ALL_FINGER_TIPS, FINGER_KEYS, NOTE_NAMES, draw_skeleton
+    from landmark_feed import HANDEDNESS_LABELS
+
+    frames = session["frames"]
+    timestamps = session["timestamps"]
+    if not len(frames):
+        print("Recording is empty")
+        return
+    start = timestamps[0]
+
+    # Print the recorded note triggers first
+    for index in range(len(frames)):
+        for hand_index in range(session["num_hands"][index]):
+            hand = HANDEDNESS_LABELS.get(int(session["handedness"][index, hand_index]), "Unknown")
+            for finger_index in np.flatnonzero(session["triggered"][index, hand_index]):
+                key = FINGER_KEYS[hand][finger_index]
+                print(f"{timestamps[index] - start:7.3f} s  frame {index:4d}  hand #{session['hand_ids'][index, hand_index]} "
+                      f"{key} {NOTE_NAMES.get(key, 'Unknown')}")
+
+    height, width = frames.shape[1:3]
+    canvas = np.empty((height * scale, width * scale, 3), np.uint8)
+    index = 0
+    playing = True
+    while True:
+        cv2.resize(frames[index], (width * scale, height * scale), dst=canvas, interpolation=cv2.INTER_NEAREST)
+        for hand_index in range(session["num_hands"][index]):
+            landmarks = session["landmarks"][index, hand_index]
+            draw_skeleton(canvas, landmarks)
+            for finger_index, finger_id in enumerate(ALL_FINGER_TIPS):
+                x = int(landmarks[finger_id, 0] * canvas.shape[1])
+                baseline_y = int(session["baselines"][index, hand_index, finger_index] * canvas.shape[0])
+                cv2.line(canvas, (x - 20, baseline_y), (x + 20, baseline_y), (0, 255, 255), 2)
+                if session["triggered"][index, hand_index, finger_index]:
+                    y = int(landmarks[finger_id, 1] * canvas.shape[0])
+                    cv2.circle(canvas, (x, y), 20, (255, 0, 0), cv2.FILLED)
+        cv2.putText(canvas, f"{timestamps[index] - start:.3f} s  frame {index + 1}/{len(frames)}",
+                    (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+        cv2.imshow("Black box replay", canvas)
+
+        if playing and index + 1 < len(frames):
+            delay = max(1, int((timestamps[index + 1] - timestamps[index]) * 1000))
+        else:
+            delay = 0
+        key = cv2.waitKey(delay)
+        if key == ord('q'):
+            break
+        elif key == ord(' '):
+            playing = not playing
+        elif key == ord(','):
+            playing = False
+            index = max(0, index - 1)
+        elif key == ord('.'):
+            playing = False
+            index = min(len(frames) - 1, index + 1)
+        elif playing and index + 1 < len(frames):
+            index += 1
+    cv2.destroyAllWindows()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a black-box dump or a ring file left by a crashed run")
+    parser.add_argument("path", help="dump (.npz) written by hand.py, or the ring file itself")
+    parser.add_argument("-o", "--output", help="save the recording as a .npz dump instead of replaying it")
+    parser.add_argument("--scale", type=int, default=4, help="display magnification")
+    args = parser.parse_args()
+
+    if args.path.endswith(".npz"):
+        with np.load(args.path) as data:
+            session = {name: data[name] for name in data.files}
+    else:
+        session = read_ring(args.path)
+
+    if args.output:
+        save_dump(args.output, session)
+        print(f"Saved {len(session['timestamps'])} frames to {args.output}")
+    else:
+        replay(session, args.scale)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+# Auto-calibration: derive per-hand, per-finger press thresholds from a recorded tapping session
+import argparse
+import json
+import os
+import time
+import warnings
+
+import numpy as np
+
+from hand_tracker import BASELINE_UPDATE_RATE
+from landmark_feed import HANDEDNESS_CODES
+
+# Same fingertip order as hand.py
+FINGERTIP_IDS = [4, 8, 12, 16, 20]
+HANDS = ["Left", "Right"]
+
+# Percentiles of the distance below baseline taken as rest and press levels
+REST_PERCENTILE = 80
+PRESS_PERCENTILE = 99
+# Threshold placed this far from the rest level towards the press level
+PRESS_FRACTION = 0.5
+# Fingers whose press level is not this far above rest were not tapped in the take
+MIN_SEPARATION = 0.02
+
+
+class SessionRecorder:
+    """Collects per-frame landmark arrays and saves them as a compressed .npz session"""
+
+    def __init__(self):
+        self.landmarks = []
+        self.handedness = []
+        self.num_hands = []
+        self.timestamps = []
+
+    def add(self, landmarks, handedness_codes, num_hands, timestamp):
+        self.landmarks.append(landmarks.copy())
+        self.handedness.append(handedness_codes.copy())
+        self.num_hands.append(num_hands)
+        self.timestamps.append(timestamp)
+
+    def save(self, path):
+        np.savez_compressed(path,
+                            landmarks=np.array(self.landmarks, np.float32),
+                            handedness=np.array(self.handedness, np.int8),
+                            num_hands=np.array(self.num_hands, np.int32),
+                            timestamps=np.array(self.timestamps))
+
+
+def load_session(path):
+    """Load a session saved by SessionRecorder"""
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+
+def fingertip_heights(session):
+    """Fingertip y per frame as (frames, hands, fingers), NaN where that hand is not visible"""
+    landmarks = session["landmarks"]
+    handedness = session["handedness"]
+    if handedness.ndim != 2 or not len(handedness):
+        raise ValueError("No frames recorded in the session")
+    frames, max_hands = handedness.shape
+    visible = np.arange(max_hands)[None, :] < session["num_hands"][:, None]
+    tips_y = landmarks[:, :, FINGERTIP_IDS, 1]
+
+    heights = np.full((frames, len(HANDS), len(FINGERTIP_IDS)), np.nan)
+    for hand_index, hand in enumerate(HANDS):
+        # At most one hand per label is used per frame (the first one)
+        matches = visible & (handedness == HANDEDNESS_CODES[hand])
+        has_hand = matches.any(axis=1)
+        first = matches.argmax(axis=1)
+        heights[has_hand, hand_index] = tips_y[has_hand, first[has_hand]]
+    return heights
+
+
+def baseline_distances(heights, rate=BASELINE_UPDATE_RATE):
+    """Replay hand.py's baseline filter over all frames and fingers at once and return distances below it
+
+    One frame moves a baseline b to min(y, (1 - rate) * b + rate * y), a map of the form
+    min(cap, scale * b + offset). Two such maps compose into another one, so the baseline
+    after every frame comes from a prefix scan in log2(frames) vectorized steps.
+    """
+    seen = ~np.isnan(heights)
+    # Frames without the hand leave its baseline as it is
+    cap = np.where(seen, heights, np.inf)
+    scale = np.where(seen, 1 - rate, 1.0)
+    offset = np.where(seen, heights * rate, 0.0)
+
+    # After the step with a given shift, each frame holds its own map composed with the
+    # maps of the 2 * shift - 1 frames before it
+    shift = 1
+    while shift < len(heights):
+        earlier_cap, earlier_scale, earlier_offset = cap[:-shift], scale[:-shift], offset[:-shift]
+        later_scale, later_offset = scale[shift:], offset[shift:]
+        # scale can underflow to 0, and 0 * inf would be NaN
+        capped = np.multiply(later_scale, earlier_cap, out=np.full_like(earlier_cap, np.inf),
+                             where=np.isfinite(earlier_cap))
+        cap = np.concatenate([cap[:shift], np.minimum(cap[shift:], capped + later_offset)])
+        offset = np.concatenate([offset[:shift], later_scale * earlier_offset + later_offset])
+        scale = np.concatenate([scale[:shift], later_scale * earlier_scale])
+        shift *= 2
+
+    # Baselines start at the bottom of the screen
+    baseline = np.minimum(cap, scale + offset)
+    return heights - baseline
+
+
+def calibrate(session, rate=BASELINE_UPDATE_RATE):
+    """Return per hand-finger rest level, press level and threshold from a tapping session"""
+    distances = baseline_distances(fingertip_heights(session), rate)
+    if not len(distances):
+        return {}
+
+    # Fingers never seen give NaN levels (with a warning) and are skipped below
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        rest, press = np.nanpercentile(distances, [REST_PERCENTILE, PRESS_PERCENTILE], axis=0)
+    thresholds = rest + PRESS_FRACTION * (press - rest)
+    usable = press - rest >= MIN_SEPARATION
+
+    results = {}
+    for hand_index, hand in enumerate(HANDS):
+        for finger_index, finger_id in enumerate(FINGERTIP_IDS):
+            if usable[hand_index, finger_index]:
+                results[f"{hand}_{finger_id}"] = {
+                    "rest": round(float(rest[hand_index, finger_index]), 4),
+                    "press": round(float(press[hand_index, finger_index]), 4),
+                    "threshold": round(float(thresholds[hand_index, finger_index]), 4),
+                }
+    return results
+
+
+def save_profile(path, player, thresholds, calibration=None):
+    """Write a player profile; thresholds maps hand-finger keys to distance thresholds"""
+    profile = {
+        "player": player,
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "thresholds": {key: round(float(value), 4) for key, value in thresholds.items()},
+    }
+    if calibration:
+        profile["calibration"] = calibration
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(profile, f, indent=2)
+
+
+def load_profile(path):
+    """Return the hand-finger thresholds stored in a player profile"""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["thresholds"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate finger thresholds from a recorded session")
+    parser.add_argument("session", help="landmark session recorded with hand.py --record-landmarks")
+    parser.add_argument("--player", default="player", help="player name stored in the profile")
+    parser.add_argument("-o", "--output", help="profile path (default: profiles/<player>.json)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        calibration = calibrate(load_session(args.session))
+    except ValueError as error:
+        parser.exit(1, f"{args.session}: {error}\n")
+    elapsed = time.perf_counter() - start
+
+    for key, values in calibration.items():
+        print(f"{key:>9}: rest {values['rest']:.3f}  press {values['press']:.3f}  "
+              f"threshold {values['threshold']:.3f}")
+    missing = [f"{hand}_{finger_id}" for hand in HANDS for finger_id in FINGERTIP_IDS
+               if f"{hand}_{finger_id}" not in calibration]
+    if missing:
+        print(f"No clear taps for {', '.join(missing)}; hand.py keeps their default thresholds")
+
+    output = args.output or os.path.join("profiles", f"{args.player}.json")
+    thresholds = {key: values["threshold"] for key, values in calibration.items()}
+    save_profile(output, args.player, thresholds, calibration)
+    print(f"Saved profile {output} ({elapsed * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# Local control socket: line-based text commands for stations that run without a window
+import os
+import socket
+import socketserver
+import stat
+import sys
+import threading
+
+DEFAULT_CONTROL_ADDRESS = "hand_control.sock"
+
+
+class _CommandHandler(socketserver.StreamRequestHandler):
+    """One connection; every line is a command and gets exactly one reply line"""
+
+    def handle(self):
+        for raw in self.rfile:
+            line = raw.decode("utf-8", "replace").strip()
+            if not line:
+                continue
+            try:
+                reply = self.server.handle_command(line)
+            except Exception as error:
+                # Some errors, e.g. timeouts, have no message of their own
+                reply = f"error {str(error) or type(error).__name__}"
+            self.wfile.write((reply + "\n").encode("utf-8"))
+
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if hasattr(socket, "AF_UNIX"):
+    class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+
+def _is_port(address):
+    return str(address).isdigit()
+
+
+def remove_stale_socket(path):
+    """Remove a Unix socket file left behind by a run that did not shut down cleanly
+
+    Raises OSError if the path is not a socket, or if a server is still listening on it.
+    """
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise OSError(f"{path} exists and is not a socket")
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        # Nobody is listening: a leftover socket file
+        os.remove(path)
+        return
+    finally:
+        probe.close()
+    raise OSError(f"Another server is already listening on {path}")
+
+
+class ControlServer:
+    """Serves commands on a Unix socket path, or on a localhost TCP port if address is a number
+
+    handle_command(line) is called on the connection's thread and returns the reply text.
+    """
+
+    def __init__(self, address, handle_command):
+        self.address = str(address)
+        if _is_port(self.address):
+            self.server = _TCPServer(("127.0.0.1", int(self.address)), _CommandHandler)
+        else:
+            remove_stale_socket(self.address)
+            self.server = _UnixServer(self.address, _CommandHandler)
+        self.server.handle_command = handle_command
+        self.thread = threading.Thread(target=self.server.serve_forever, name="control", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        print(f"Control socket listening on {self.address}")
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if not _is_port(self.address) and os.path.exists(self.address):
+            os.remove(self.address)
+
+
+def send_command(address, command, timeout=5.0):
+    """Send one command to a running ControlServer and return its reply"""
+    address = str(address)
+    if _is_port(address):
+        sock = socket.create_connection(("127.0.0.1", int(address)), timeout)
+    else:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect(address)
+    with sock, sock.makefile("rwb") as stream:
+        stream.write((command + "\n").encode("utf-8"))
+        stream.flush()
+        return stream.readline().decode("utf-8").rstrip("\n")
+
+
+def main():
+    # Minimal client: python control_server.py [ADDRESS] COMMAND...
+    args = sys.argv[1:]
+    address = DEFAULT_CONTROL_ADDRESS
+    if len(args) > 1 and (_is_port(args[0]) or os.path.exists(args[0])):
+        address = args.pop(0)
+    if not args:
+        print("Usage: python control_server.py [ADDRESS] COMMAND...")
+        print("Commands: status, thresholds, threshold KEY [VALUE|up|down], reset, debug [on|off], "
+              "save, layout [PATH], dump, stop")
+        sys.exit(2)
+    print(send_command(address, " ".join(args)))
+
+
+if __name__ == "__main__":
+    main()
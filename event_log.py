@@ -0,0 +1,185 @@
+# Structured event log: the frame loop appends events to an in-memory ring, a background
+# thread writes them to the console and to rotating JSONL or binary files in batches
+import argparse
+import collections
+import json
+import os
+import struct
+import sys
+import threading
+import time
+
+# Event kinds, by their code in binary logs; new kinds go at the end so old logs keep their codes
+EVENT_KINDS = ["note", "chord", "threshold", "hand", "fps", "idle", "control", "gesture", "startup",
+               "black_box", "log", "report"]
+KIND_CODES = {kind: code for code, kind in enumerate(EVENT_KINDS)}
+# Kinds written to the log file only, they would flood the console
+QUIET_KINDS = {"fps", "hand"}
+
+BINARY_MAGIC = b"HEVL"
+BINARY_VERSION = 1
+# Binary file header: magic, version; record header: wall time, kind code, payload size,
+# followed by the event fields as compact JSON
+FILE_HEADER = struct.Struct("<4sI")
+RECORD_HEADER = struct.Struct("<dBH")
+
+
+def print_event(kind, message, **fields):
+    """Stand-in for EventLog.log where no log is set up: print the message right away"""
+    print(message.format(**fields))
+
+
+def _json_default(value):
+    # NumPy scalars and arrays
+    return value.tolist() if hasattr(value, "tolist") else str(value)
+
+
+class EventLog:
+    """Events in a bounded ring, flushed by a background thread
+
+    log() only appends to the ring, it never formats, encodes or waits on a file or a
+    terminal. The writer flushes every flush_interval seconds, or earlier once
+    flush_records events are waiting. If it falls so far behind that the ring is full,
+    the oldest events are dropped and the drop is logged.
+    """
+
+    def __init__(self, path=None, binary=False, capacity=8192, flush_records=256, flush_interval=1.0,
+                 max_bytes=10 * 2**20, backups=5, echo=True):
+        self.path = path
+        self.binary = binary
+        self.flush_records = flush_records
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.echo = echo
+
+        self.ring = collections.deque(maxlen=capacity)
+        # Counted by the logging threads and reset by the writer, so both sides take the lock;
+        # log() only does when the ring is full
+        self.dropped = 0
+        self.dropped_lock = threading.Lock()
+        self.written = 0
+        self.file = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._open()
+
+        self.wake = threading.Event()
+        self.stopping = False
+        self.thread = threading.Thread(target=self._run, name="event-log", daemon=True)
+        self.thread.start()
+
+    def log(self, kind, message, **fields):
+        """Queue one event; message is a str.format template over fields, formatted when written"""
+        ring = self.ring
+        if len(ring) == ring.maxlen:
+            with self.dropped_lock:
+                self.dropped += 1
+        ring.append((time.time(), kind, message, fields))
+        if len(ring) >= self.flush_records:
+            self.wake.set()
+
+    def _run(self):
+        while not self.stopping:
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Write every queued event; called on the writer thread"""
+        ring = self.ring
+        batch = []
+        while ring:
+            batch.append(ring.popleft())
+        with self.dropped_lock:
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            batch.append((time.time(), "log", "Event log: {dropped} events dropped, writer too slow",
+                          {"dropped": dropped}))
+        if not batch:
+            return
+
+        if self.echo:
+            lines = [message.format(**fields) for _, kind, message, fields in batch if kind not in QUIET_KINDS]
+            if lines:
+                sys.stdout.write("\n".join(lines) + "\n")
+                sys.stdout.flush()
+        if self.file is not None:
+            if self.binary:
+                chunks = []
+                for timestamp, kind, _, fields in batch:
+                    payload = json.dumps(fields, separators=(",", ":"), default=_json_default).encode("utf-8")
+                    chunks.append(RECORD_HEADER.pack(timestamp, KIND_CODES.get(kind, KIND_CODES["log"]),
+                                                     len(payload)))
+                    chunks.append(payload)
+                self.file.write(b"".join(chunks))
+            else:
+                self.file.write("".join(
+                    json.dumps({"time": round(timestamp, 6), "kind": kind, **fields,
+                                "message": message.format(**fields)}, default=_json_default) + "\n"
+                    for timestamp, kind, message, fields in batch).encode("utf-8"))
+            self.file.flush()
+            if self.file.tell() >= self.max_bytes:
+                self._rotate()
+        self.written += len(batch)
+
+    def _open(self):
+        self.file = open(self.path, "ab")
+        if self.binary and self.file.tell() == 0:
+            self.file.write(FILE_HEADER.pack(BINARY_MAGIC, BINARY_VERSION))
+
+    def _rotate(self):
+        """PATH -> PATH.1 -> ... -> PATH.<backups>, like logging's RotatingFileHandler"""
+        self.file.close()
+        for number in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{number}"):
+                os.replace(f"{self.path}.{number}", f"{self.path}.{number + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._open()
+
+    def close(self):
+        """Write what is left and stop the writer"""
+        self.stopping = True
+        self.wake.set()
+        self.thread.join()
+        self.flush()
+        if self.file is not None:
+            self.file.close()
+
+
+def read_events(path):
+    """Yield the events of a JSONL or binary log file as dicts"""
+    with open(path, "rb") as f:
+        header = f.read(FILE_HEADER.size)
+        if header[:4] != BINARY_MAGIC:
+            f.seek(0)
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+        while True:
+            record = f.read(RECORD_HEADER.size)
+            if len(record) < RECORD_HEADER.size:
+                return
+            timestamp, code, size = RECORD_HEADER.unpack(record)
+            fields = json.loads(f.read(size))
+            yield {"time": timestamp, "kind": EVENT_KINDS[code], **fields}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print a hand.py event log (JSONL or binary) as JSON lines")
+    parser.add_argument("path", help="log file written with hand.py --event-log")
+    parser.add_argument("--kind", action="append", choices=EVENT_KINDS, help="only these kinds (repeatable)")
+    args = parser.parse_args()
+    for event in read_events(args.path):
+        if not args.kind or event["kind"] in args.kind:
+            print(json.dumps(event))
+
+
+if __name__ == "__main__":
+    main()
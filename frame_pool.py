@@ -0,0 +1,68 @@
+# Reusable frame buffers for the capture and processing loop
+import threading
+
+import numpy as np
+
+
+class FramePool:
+    """Preallocated frame buffers, so the frame loop stops allocating new images"""
+
+    def __init__(self, slots=2):
+        # Several slots per buffer name let a consumer keep one frame
+        # while the next one is written into another slot
+        self.slots = slots
+        self._buffers = {}
+        self._next_slot = {}
+
+    def get(self, name, shape, dtype=np.uint8):
+        """Return the next buffer for name, allocating only when the frame shape changes"""
+        buffers = self._buffers.get(name)
+        if buffers is None or buffers[0].shape != tuple(shape) or buffers[0].dtype != dtype:
+            buffers = [np.empty(shape, dtype) for _ in range(self.slots)]
+            self._buffers[name] = buffers
+            self._next_slot[name] = 0
+
+        slot = self._next_slot[name]
+        self._next_slot[name] = (slot + 1) % self.slots
+        return buffers[slot]
+
+
+class LatestFrame:
+    """Triple buffer handing the newest frame from a producer thread to a consumer thread
+
+    The producer fills back_buffer() and publish()es it, the consumer take()s the newest
+    published frame and owns it until its next take(). Neither side ever waits for the
+    other longer than it takes to swap two references, and frames the consumer was
+    too slow to take are simply replaced.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Back (being written), middle (latest published), front (held by the consumer)
+        self._buffers = [None, None, None]
+        self._data = [None, None, None]
+        self._fresh = False
+
+    def back_buffer(self, shape, dtype=np.uint8):
+        """Buffer the next frame is written into, allocated only when the shape changes"""
+        buffer = self._buffers[0]
+        if buffer is None or buffer.shape != tuple(shape) or buffer.dtype != dtype:
+            buffer = self._buffers[0] = np.empty(shape, dtype)
+        return buffer
+
+    def publish(self, data=None):
+        """Make the back buffer the latest frame, with data (any object) attached"""
+        with self._lock:
+            self._buffers[0], self._buffers[1] = self._buffers[1], self._buffers[0]
+            self._data[1] = data
+            self._fresh = True
+
+    def take(self):
+        """Return (frame, data) of the newest frame, or (None, None) if none was published since"""
+        with self._lock:
+            if not self._fresh:
+                return None, None
+            self._buffers[1], self._buffers[2] = self._buffers[2], self._buffers[1]
+            self._data[1], self._data[2] = self._data[2], self._data[1]
+            self._fresh = False
+        return self._buffers[2], self._data[2]
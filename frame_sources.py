@@ -0,0 +1,168 @@
+# Frame sources for the virtual piano: live camera, video file, image sequence, synthetic
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+
+
+class FrameSource:
+    """Base frame source, read() works like VideoCapture.read plus a capture timestamp"""
+
+    # Seconds between frames when pacing a non-live source, 0 = as fast as possible
+    frame_interval = 0.0
+    next_frame_time = None
+
+    def read(self, out=None):
+        """Return (ret, frame, timestamp), writing into out when possible"""
+        raise NotImplementedError
+
+    def wait_for_next_frame(self):
+        """Sleep until the next frame is due when pacing at frame_interval"""
+        if not self.frame_interval:
+            return
+        now = time.perf_counter()
+        if self.next_frame_time is not None and now < self.next_frame_time:
+            time.sleep(self.next_frame_time - now)
+            now = self.next_frame_time
+        self.next_frame_time = now + self.frame_interval
+
+    def release(self):
+        pass
+
+
+class CameraSource(FrameSource):
+    """Live camera with latency settings
+
+    Every setting left as None keeps the driver default. With drain_frames > 0,
+    frames already queued in the driver are grabbed and discarded before
+    retrieve(), so the decoded frame is the newest one instead of a stale one.
+    """
+
+    def __init__(self, index=0, width=None, height=None, fps=None, fourcc=None,
+                 buffer_size=1, drain_frames=4, drain_threshold=0.004):
+        self.cap = cv2.VideoCapture(index)
+        # FOURCC has to be set before the resolution on most V4L2 drivers
+        if fourcc:
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+        if width:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        if height:
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        if fps:
+            self.cap.set(cv2.CAP_PROP_FPS, fps)
+        if buffer_size:
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, buffer_size)
+
+        self.drain_frames = drain_frames
+        # A grab() faster than this returned a frame that was already queued
+        self.drain_threshold = drain_threshold
+        self.frames_drained = 0
+
+    def read(self, out=None):
+        start = time.perf_counter()
+        if not self.cap.grab():
+            return False, None, None
+        timestamp = time.perf_counter()
+
+        # Keep grabbing while frames come back immediately (already queued)
+        drained = 0
+        while drained < self.drain_frames and timestamp - start < self.drain_threshold:
+            start = timestamp
+            if not self.cap.grab():
+                return False, None, None
+            timestamp = time.perf_counter()
+            drained += 1
+        self.frames_drained += drained
+
+        ret, frame = self.cap.retrieve(out)
+        return ret, frame, timestamp
+
+    def release(self):
+        self.cap.release()
+
+
+class VideoFileSource(FrameSource):
+    """Recorded video file, optionally looped and paced at its own frame rate"""
+
+    def __init__(self, path, loop=False, realtime=False):
+        self.path = path
+        self.cap = cv2.VideoCapture(path)
+        self.loop = loop
+        fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.frame_interval = 1.0 / fps if realtime and fps > 0 else 0.0
+
+    def read(self, out=None):
+        self.wait_for_next_frame()
+        ret, frame = self.cap.read(out)
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read(out)
+        return ret, frame, time.perf_counter()
+
+    def release(self):
+        self.cap.release()
+
+
+class ImageSequenceSource(FrameSource):
+    """Folder or glob pattern of still images, read in sorted order"""
+
+    def __init__(self, pattern, loop=False):
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "*")
+        extensions = (".png", ".jpg", ".jpeg", ".bmp")
+        self.paths = sorted(p for p in glob.glob(pattern) if p.lower().endswith(extensions))
+        self.loop = loop
+        self.position = 0
+
+    def read(self, out=None):
+        if self.position >= len(self.paths):
+            if not self.loop or not self.paths:
+                return False, None, None
+            self.position = 0
+        frame = cv2.imread(self.paths[self.position])
+        self.position += 1
+        return frame is not None, frame, time.perf_counter()
+
+
+class SyntheticSource(FrameSource):
+    """Generated frames with a moving blob, for running the pipeline without a camera"""
+
+    def __init__(self, width=640, height=480, fps=None, frame_count=None):
+        self.shape = (height, width, 3)
+        self.frame_interval = 1.0 / fps if fps else 0.0
+        self.frame_count = frame_count
+        self.frame_index = 0
+
+    def read(self, out=None):
+        if self.frame_count is not None and self.frame_index >= self.frame_count:
+            return False, None, None
+        self.wait_for_next_frame()
+        if out is None or out.shape != self.shape:
+            out = np.empty(self.shape, np.uint8)
+        height, width = self.shape[:2]
+        out[:] = 40
+        x = int((0.5 + 0.4 * np.sin(self.frame_index * 0.05)) * width)
+        y = int((0.5 + 0.3 * np.cos(self.frame_index * 0.07)) * height)
+        cv2.circle(out, (x, y), height // 8, (180, 200, 230), cv2.FILLED)
+        self.frame_index += 1
+        return True, out, time.perf_counter()
+
+
+def open_frame_source(spec, loop=False, realtime=False, **camera_settings):
+    """Open a source from a camera index, "synthetic", an image folder/glob or a video path
+
+    loop restarts recorded sources (video, image sequence) at their end,
+    realtime paces a video file at its own frame rate instead of as fast as possible.
+    """
+    spec = str(spec)
+    if spec.isdigit():
+        return CameraSource(int(spec), **camera_settings)
+    if spec == "synthetic":
+        # Unset camera settings keep the synthetic defaults
+        return SyntheticSource(camera_settings.get("width") or 640, camera_settings.get("height") or 480,
+                               camera_settings.get("fps"))
+    if os.path.isdir(spec) or any(c in spec for c in "*?["):
+        return ImageSequenceSource(spec, loop=loop)
+    return VideoFileSource(spec, loop=loop, realtime=realtime)
@@ -0,0 +1,141 @@
+# Hand-pose gestures: normalized 21-landmark features matched against recorded poses
+import json
+import os
+
+import numpy as np
+
+# SciPy's KD-tree is used when installed (optional), otherwise a NumPy index of
+# precomputed squared norms searched with one matrix-vector product
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+# Which nearest-neighbour index PoseLibrary builds
+INDEX_KIND = "kd-tree" if cKDTree is not None else "numpy"
+
+WRIST = 0
+MIDDLE_MCP = 9
+FEATURE_SIZE = 20 * 3
+
+# Commands a recorded pose can trigger
+GESTURE_COMMANDS = ["octave_up", "octave_down", "sustain", "recalibrate"]
+
+
+def pose_features(landmarks, handedness="Right", aspect=1.0):
+    """Scale- and rotation-invariant feature vector from one hand's (21, 3) landmarks
+
+    aspect is the frame width / height, so x and y are in the same units.
+    """
+    points = np.array(landmarks, np.float32)
+    points -= points[WRIST]
+    points[:, 0] *= aspect
+    # Left hands are mirrored so one recorded pose matches either hand
+    if handedness == "Left":
+        points[:, 0] *= -1
+
+    # Rotate in the image plane so the wrist -> middle knuckle axis points up,
+    # and use its length as the unit of scale
+    dx, dy = points[MIDDLE_MCP, 0], points[MIDDLE_MCP, 1]
+    scale = float(np.hypot(dx, dy))
+    if scale < 1e-6:
+        return None
+    ux, uy = dx / scale, dy / scale
+    x, y = points[1:, 0].copy(), points[1:, 1].copy()
+    points[1:, 0] = -uy * x + ux * y
+    points[1:, 1] = -ux * x - uy * y
+    points /= scale
+
+    return points[1:].ravel()
+
+
+def save_poses(path, commands, features):
+    """Write poses (command names and their feature rows) as a PoseLibrary JSON file"""
+    poses = [{"command": command, "features": [round(float(v), 5) for v in row]}
+             for command, row in zip(commands, features)]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"poses": poses}, f)
+
+
+class PoseLibrary:
+    """Recorded poses with a prebuilt nearest-neighbour index, stored as JSON"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.commands = []
+        self.features = np.empty((0, FEATURE_SIZE), np.float32)
+        self.index = None
+        self.squared_norms = np.empty(0, np.float32)
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self):
+        return len(self.commands)
+
+    def load(self, path):
+        with open(path, encoding="utf-8") as f:
+            poses = json.load(f)["poses"]
+        self.commands = [pose["command"] for pose in poses]
+        self.features = np.array([pose["features"] for pose in poses], np.float32).reshape(-1, FEATURE_SIZE)
+        self.rebuild_index()
+
+    def save(self, path=None):
+        save_poses(path or self.path, self.commands, self.features)
+
+    def add(self, command, features):
+        """Record one more example pose for a command and rebuild the index"""
+        self.commands.append(command)
+        self.features = np.vstack([self.features, features[None, :]])
+        self.rebuild_index()
+
+    def rebuild_index(self):
+        self.index = cKDTree(self.features) if cKDTree is not None and len(self) else None
+        self.squared_norms = np.einsum("ij,ij->i", self.features, self.features)
+
+    def match(self, features):
+        """Return (command, distance) of the nearest recorded pose, or (None, inf) if empty"""
+        if not len(self):
+            return None, float("inf")
+        if self.index is not None:
+            distance, i = self.index.query(features)
+        else:
+            # |a - b|^2 = |a|^2 - 2 a.b + |b|^2; |b|^2 is the same for every pose
+            i = int(np.argmin(self.squared_norms - 2 * (self.features @ features)))
+            distance = np.linalg.norm(self.features[i] - features)
+        return self.commands[i], float(distance)
+
+
+class GestureRecognizer:
+    """Fires a pose's command once it has been held for hold_frames consecutive frames"""
+
+    def __init__(self, library, max_distance=0.6, hold_frames=5, timeout=0.2):
+        self.library = library
+        self.max_distance = max_distance
+        self.hold_frames = hold_frames
+        # A hand unseen for longer than this starts over
+        self.timeout = timeout
+        self.state = {}
+
+    def update(self, hand_id, handedness, landmarks, timestamp, aspect=1.0):
+        """Feed one hand's landmarks; return a command the first frame its pose is held long enough"""
+        if not len(self.library):
+            return None
+        features = pose_features(landmarks, handedness, aspect)
+        command = None
+        if features is not None:
+            command, distance = self.library.match(features)
+            if distance > self.max_distance:
+                command = None
+
+        if hand_id not in self.state and len(self.state) >= 16:
+            # Drop hands that left long ago, IDs are not reused
+            self.state = {key: value for key, value in self.state.items()
+                          if timestamp - value[3] <= self.timeout}
+        last_command, held, fired, last_seen = self.state.get(hand_id, (None, 0, False, timestamp))
+        if command != last_command or timestamp - last_seen > self.timeout:
+            held, fired = 0, False
+        held += 1
+
+        fire = command is not None and not fired and held >= self.hold_frames
+        self.state[hand_id] = (command, held, fired or fire, timestamp)
+        return command if fire else None
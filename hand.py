@@ -1,32 +1,34 @@
-import cv2
-import mediapipe as mp
 import time
+# Reference point for time-to-first-frame and time-to-first-detection
+START_TIME = time.perf_counter()
+
+import cv2
 import numpy as np
+import math
 import collections
-
-# Open camera
-cap = cv2.VideoCapture(0)
-
-# Specify MediaPipe model
-mpHands = mp.solutions.hands
-hands = mpHands.Hands(
-    static_image_mode=False,
-    max_num_hands=2,
-    model_complexity=1,
-    min_detection_confidence=0.5,
-    min_tracking_confidence=0.5
-)
-
-# Drawing utilities
-mpDraw = mp.solutions.drawing_utils
-
-# Change landmark and connection styles
-handLmStyle = mpDraw.DrawingSpec(color=(0, 0, 255), thickness=5)
-handConStyle = mpDraw.DrawingSpec(color=(0, 255, 0), thickness=5)
-
-# Time calculation
-pTime = 0
-cTime = 0
+import argparse
+import os
+import signal
+import sys
+import threading
+import queue
+from concurrent.futures import Future, ThreadPoolExecutor
+from frame_pool import FramePool, LatestFrame
+from frame_sources import open_frame_source
+from landmark_feed import LandmarkFeedWriter, DEFAULT_FEED_NAME, HANDEDNESS_CODES
+from note_events import ChordGrouper
+from hand_tracker import HandTracker, BASELINE_UPDATE_RATE
+from calibration import SessionRecorder, load_profile, save_profile
+from gestures import PoseLibrary, GestureRecognizer, GESTURE_COMMANDS, INDEX_KIND, pose_features, save_poses
+from black_box import BlackBoxRecorder, dump_path
+from control_server import ControlServer, DEFAULT_CONTROL_ADDRESS
+from soak import SoakMonitor
+from idle_gate import IdleGate, INFER_FULL, INFER_LOW
+from piano_roll import PianoRoll
+from key_zones import KeyZones
+from session_index import SessionVideoRecorder
+from event_log import EventLog
+from remote_inference import RemoteHands, DEFAULT_INFERENCE_ADDRESS, read_packet
 
 # Define fingertip IDs
 THUMB_TIP = 4
@@ -53,20 +55,9 @@ NOTE_NAMES = {
     "Right_20": "Mi' (E')" # Right pinky
 }
 
-# Baseline position tracking for each hand-finger combination
-finger_baseline = {}
-for hand in ["Left", "Right"]:
-    for finger_id in ALL_FINGER_TIPS:
-        finger_baseline[f"{hand}_{finger_id}"] = 1.0  # Initialize at bottom of screen
-
-# Record pressed state for each finger
-fingers_pressed = {}
-last_trigger_time = {}
-for hand in ["Left", "Right"]:
-    for finger_id in ALL_FINGER_TIPS:
-        key = f"{hand}_{finger_id}"
-        fingers_pressed[key] = False
-        last_trigger_time[key] = 0
+# Hand-finger combination keys per hand type, in ALL_FINGER_TIPS order
+FINGER_KEYS = {hand: [f"{hand}_{finger_id}" for finger_id in ALL_FINGER_TIPS]
+               for hand in ["Left", "Right", "Unknown"]}
 
 # Define threshold values for each finger type
 FINGER_THRESHOLDS = {
@@ -77,257 +68,1086 @@ FINGER_THRESHOLDS = {
     PINKY_TIP: 0.076    # Pinky
 }
 
-# Individual distance thresholds for each hand-finger combination
-distance_thresholds = {}
-for hand in ["Left", "Right"]:
-    for finger_id in ALL_FINGER_TIPS:
-        # Use specific threshold values for each finger type
-        distance_thresholds[f"{hand}_{finger_id}"] = FINGER_THRESHOLDS[finger_id]
-
 # Other parameters
 TRIGGER_COOLDOWN = 0.5           # Trigger cooldown time
 VISUAL_FEEDBACK_DURATION = 0.3   # Visual feedback duration
-BASELINE_UPDATE_RATE = 0.05      # Rate to update baseline (higher = faster adaptation)
 
-# Debug mode
-DEBUG_MODE = True
-# Currently selected hand and finger
-SELECTED_HAND = "Left"
-SELECTED_FINGER = INDEX_TIP
+# Run inference on the unflipped camera frame and mirror landmark x-coordinates
+# instead, so only the display image is flipped
+MIRROR_LANDMARKS = False
+
+WINDOW_NAME = 'Virtual Piano - Separate Hand Settings'
+
+# With --measure-drawing, headless mode draws one in this many frames off-screen to
+# measure the drawing it saves
+DRAW_SAMPLE_INTERVAL = 100
+# Timed draws per sample; an untimed draw before them warms caches and builds the piano roll
+DRAW_SAMPLE_REPEATS = 5
+# Seconds a control socket command may wait for the detection thread
+CONTROL_TIMEOUT = 2.0
+# Seconds between FPS samples in the event log
+FPS_LOG_INTERVAL = 1.0
 
-# Create window
-cv2.namedWindow('Virtual Piano - Separate Hand Settings', cv2.WINDOW_NORMAL)
-cv2.resizeWindow('Virtual Piano - Separate Hand Settings', 1280, 720)
+# Hand skeleton, same connections as mp.solutions.hands.HAND_CONNECTIONS
+HAND_CONNECTIONS = [
+    (0, 1), (1, 2), (2, 3), (3, 4),
+    (0, 5), (5, 6), (6, 7), (7, 8),
+    (5, 9), (9, 10), (10, 11), (11, 12),
+    (9, 13), (13, 14), (14, 15), (15, 16),
+    (13, 17), (0, 17), (17, 18), (18, 19), (19, 20),
+]
+
+# Landmark and connection styles
+LANDMARK_COLOR = (0, 0, 255)
+LANDMARK_BORDER_COLOR = (224, 224, 224)
+CONNECTION_COLOR = (0, 255, 0)
+SKELETON_THICKNESS = 5
+
+def load_hand_model(frame_size, max_hands=2, model_complexity=1):
+    """Import MediaPipe, build the Hands model and warm it up on a dummy frame"""
+    # Imported here so the slow MediaPipe import overlaps camera and window setup
+    import mediapipe as mp
+
+    # Specify MediaPipe model
+    hands = mp.solutions.hands.Hands(
+        static_image_mode=False,
+        max_num_hands=max_hands,
+        model_complexity=model_complexity,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5
+    )
+
+    # Pay model initialization on a blank frame instead of the first live one
+    width, height = frame_size
+    hands.process(np.zeros((height, width, 3), np.uint8))
+
+    return hands
 
 def get_finger_name(finger_id):
     """Get finger name from finger ID"""
     index = ALL_FINGER_TIPS.index(finger_id)
     return FINGER_NAMES[index]
 
-def get_current_selection_key():
-    """Get the key for the currently selected hand-finger combination"""
-    return f"{SELECTED_HAND}_{SELECTED_FINGER}"
-
-while True:
-    ret, img = cap.read()
-    if not ret:
-        break
-    
-    # Horizontal flip
-    img = cv2.flip(img, 1)
-    
-    # Convert BGR to RGB
-    imgRGB = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-    
-    # Process image
-    result = hands.process(imgRGB)
-    
-    # Get window dimensions
-    imgHeight = img.shape[0]
-    imgWidth = img.shape[1]
-    
-    # Display debug info
-    if DEBUG_MODE:
-        cv2.putText(img, "Press 'D': toggle debug, '+'/'-': adjust threshold", 
-                    (30, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-        
-        # Display thresholds for all fingers of both hands
-        y_pos = 120
-        
-        # Current selection key
-        current_key = get_current_selection_key()
-        
-        # Left hand thresholds
-        cv2.putText(img, "LEFT HAND:", (30, y_pos), 
-                  cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-        y_pos += 30
-        
-        for finger_id in ALL_FINGER_TIPS:
-            key = f"Left_{finger_id}"
-            color = (255, 0, 255) if key == current_key else (0, 0, 255)
-            name = get_finger_name(finger_id)
-            threshold = distance_thresholds[key]
-            cv2.putText(img, f"L-{name}: {threshold:.3f}", (30, y_pos), 
-                      cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
-            y_pos += 25
-        
-        y_pos += 10
-        # Right hand thresholds
-        cv2.putText(img, "RIGHT HAND:", (30, y_pos), 
-                  cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-        y_pos += 30
-        
-        for finger_id in ALL_FINGER_TIPS:
-            key = f"Right_{finger_id}"
-            color = (255, 0, 255) if key == current_key else (0, 0, 255)
-            name = get_finger_name(finger_id)
-            threshold = distance_thresholds[key]
-            cv2.putText(img, f"R-{name}: {threshold:.3f}", (30, y_pos), 
-                      cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
-            y_pos += 25
-        
-        # Display instructions
-        y_pos += 10
-        cv2.putText(img, f"Selected: {SELECTED_HAND} {get_finger_name(SELECTED_FINGER)}", 
-                  (30, y_pos), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-        y_pos += 30
-        
-        cv2.putText(img, "Use L/R to switch hands, 1-5 for fingers", (30, y_pos), 
-                  cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-        y_pos += 30
-        cv2.putText(img, "+: increase threshold, -: decrease threshold", (30, y_pos), 
-                  cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-    
-    # Display key instructions
-    cv2.putText(img, "Press 'Q' to quit", (imgWidth - 200, 30), 
-              cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-    
-    # Hand detection results
-    if result.multi_hand_landmarks:
-        # Identify left/right hands
-        handedness_list = []
-        if result.multi_handedness:
-            for hand_idx, hand_info in enumerate(result.multi_handedness):
-                handedness = hand_info.classification[0].label
-                handedness_list.append(handedness)
-        
-        for idx, handLms in enumerate(result.multi_hand_landmarks):
-            # Get current hand type (left/right)
-            if idx < len(handedness_list):
-                current_hand = handedness_list[idx]
+def fill_landmark_array(handLms, out):
+    """Copy the 21 landmarks of one hand into a preallocated (21, 3) array"""
+    for lm_id, lm in enumerate(handLms.landmark):
+        out[lm_id, 0] = lm.x
+        out[lm_id, 1] = lm.y
+        out[lm_id, 2] = lm.z
+
+def read_hand_result(result, landmarks, handedness_codes, mirror=False):
+    """Copy a MediaPipe result into the landmark and handedness arrays, return the hand count"""
+    if result is None or not result.multi_hand_landmarks:
+        return 0
+
+    # Identify left/right hands
+    handedness_list = []
+    if result.multi_handedness:
+        for hand_info in result.multi_handedness:
+            handedness = hand_info.classification[0].label
+            # MediaPipe assumes a mirrored input, so labels swap on the unflipped frame
+            if mirror:
+                handedness = "Right" if handedness == "Left" else "Left"
+            handedness_list.append(handedness)
+
+    num_hands = 0
+    for idx, handLms in enumerate(result.multi_hand_landmarks[:len(landmarks)]):
+        fill_landmark_array(handLms, landmarks[idx])
+        if idx < len(handedness_list):
+            handedness_codes[idx] = HANDEDNESS_CODES.get(handedness_list[idx], -1)
+        else:
+            handedness_codes[idx] = -1
+        num_hands = idx + 1
+
+    # Bring landmarks detected on the unflipped frame into display coordinates
+    if mirror:
+        landmarks[:num_hands, :, 0] = 1.0 - landmarks[:num_hands, :, 0]
+    return num_hands
+
+def draw_skeleton(img, landmarks):
+    """Draw one hand's (21, 3) landmarks and connections the way mpDraw.draw_landmarks does"""
+    imgHeight, imgWidth = img.shape[:2]
+    points = {}
+    for idx, (x, y) in enumerate(landmarks[:, :2].tolist()):
+        # Landmarks outside the frame are skipped
+        if 0.0 <= x <= 1.0 and 0.0 <= y <= 1.0:
+            points[idx] = (min(math.floor(x * imgWidth), imgWidth - 1),
+                           min(math.floor(y * imgHeight), imgHeight - 1))
+
+    for start, end in HAND_CONNECTIONS:
+        if start in points and end in points:
+            cv2.line(img, points[start], points[end], CONNECTION_COLOR, SKELETON_THICKNESS)
+    for point in points.values():
+        # Light border, then the landmark color
+        cv2.circle(img, point, 3, LANDMARK_BORDER_COLOR, SKELETON_THICKNESS)
+        cv2.circle(img, point, 2, LANDMARK_COLOR, SKELETON_THICKNESS)
+
+# Per-hand results of one frame as drawn by the overlay, indexed [hand] or [hand, finger]
+HandsState = collections.namedtuple("HandsState", ["labels", "ids", "landmarks", "baselines", "pressed",
+                                                   "distances", "thresholds", "triggered", "notes"])
+
+class VirtualPiano:
+    """Press detection, keyboard controls and on-screen overlay, independent of camera and model"""
+
+    def __init__(self, max_hands=2, chord_window=0.0, gestures_path=None, profile_path=None,
+                 piano_roll_seconds=4.0, layout_path=None, event_log=None):
+        # Notes, threshold changes and other events, written out off the frame loop
+        self.event_log = event_log or EventLog()
+        self.log = self.event_log.log
+
+        # Individual distance thresholds for each hand-finger combination
+        self.distance_thresholds = {}
+        for hand in ["Left", "Right"]:
+            for finger_id in ALL_FINGER_TIPS:
+                # Use specific threshold values for each finger type
+                self.distance_thresholds[f"{hand}_{finger_id}"] = FINGER_THRESHOLDS[finger_id]
+
+        # Calibrated thresholds from the player profile replace the defaults
+        self.profile_path = profile_path or "profile.json"
+        if profile_path:
+            self.distance_thresholds.update(load_profile(profile_path))
+            self.log("startup", "Loaded profile {path}", path=profile_path)
+
+        # Debug mode
+        self.debug_mode = True
+        # Currently selected hand and finger
+        self.selected_hand = "Left"
+        self.selected_finger = INDEX_TIP
+        # Gesture command that 'P' records a pose for
+        self.selected_gesture = GESTURE_COMMANDS[0]
+
+        # State changed by gesture commands
+        self.octave_shift = 0
+        self.sustain_on = False
+
+        # Per-frame landmarks and handedness codes of up to max_hands hands
+        self.landmarks = np.zeros((max_hands, 21, 3), np.float32)
+        self.handedness_codes = np.full(max_hands, -1, np.int8)
+        self.num_hands = 0
+        self.aspect = 1.0
+
+        # Persistent hand IDs and per-hand finger state (baselines, pressed, last trigger, notes)
+        self.hand_tracker = HandTracker(capacity=max_hands, fingers=len(ALL_FINGER_TIPS))
+
+        # Detection results of the current frame, drawn by the overlay
+        fingers = len(ALL_FINGER_TIPS)
+        self.hand_slots = np.zeros(0, np.intp)
+        self.hand_labels = []
+        self.finger_distances = np.zeros((0, fingers))
+        self.finger_thresholds = np.zeros((max_hands, fingers))
+        self.triggered = np.zeros((max_hands, fingers), bool)
+
+        # Notes as screen zones instead of one note per finger
+        self.key_zones = KeyZones(layout_path, self.log) if layout_path else None
+
+        # Presses within the chord window leave as one output event
+        self.chord_grouper = ChordGrouper(chord_window)
+
+        # Recorded poses that trigger control commands
+        self.pose_library = PoseLibrary(gestures_path)
+        self.gesture_recognizer = GestureRecognizer(self.pose_library)
+        self.log("startup", "Gesture poses: {poses}, {index} index", poses=len(self.pose_library), index=INDEX_KIND)
+
+        # Hand IDs seen in the last frame, for hand loss and recovery events
+        self.visible_ids = set()
+
+        # Profile and pose files are written here, so key handlers never wait on the disk;
+        # one worker keeps the saves of a file in order
+        self.save_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="save")
+
+        # Scrolling history of the played notes, created at the first overlay (0 disables it)
+        self.piano_roll_seconds = piano_roll_seconds
+        self.piano_roll = None
+        # Keys pressed since the roll last drew, appended by detection and drained by the
+        # display, so presses in frames the display skips still reach the roll
+        self.roll_onsets = collections.deque(maxlen=256)
+
+    def get_current_selection_key(self):
+        """Get the key for the currently selected hand-finger combination"""
+        return f"{self.selected_hand}_{self.selected_finger}"
+
+    def save_in_background(self, save, args, message, **fields):
+        """Run save(*args) on the save thread and log message once it is written"""
+        def run():
+            try:
+                save(*args)
+            except OSError as error:
+                self.log("control", "Save failed: {error}", error=str(error))
             else:
-                current_hand = "Unknown"
-            
-            # Draw hand landmarks
-            mpDraw.draw_landmarks(img, handLms, mpHands.HAND_CONNECTIONS, handLmStyle, handConStyle)
-            
+                self.log("control", message, **fields)
+        self.save_pool.submit(run)
+
+    def close(self):
+        """Wait for the saves still being written"""
+        self.save_pool.shutdown(wait=True)
+
+    def reset_baselines(self):
+        """Move every finger baseline back to the bottom of the screen"""
+        self.hand_tracker.baseline[:] = 1.0
+        self.log("control", "Baselines reset")
+
+    def run_gesture_command(self, command):
+        """Apply a command recognized from a hand pose"""
+        if command == "octave_up":
+            self.octave_shift += 1
+            self.log("gesture", "Octave shift: {octave:+d}", octave=self.octave_shift)
+        elif command == "octave_down":
+            self.octave_shift -= 1
+            self.log("gesture", "Octave shift: {octave:+d}", octave=self.octave_shift)
+        elif command == "sustain":
+            self.sustain_on = not self.sustain_on
+            self.log("gesture", "Sustain: {state}", state="ON" if self.sustain_on else "OFF")
+        elif command == "recalibrate":
+            self.reset_baselines()
+
+    def play_chord(self, chord):
+        """Send one chord event (one or more notes sharing a timestamp) to the output"""
+        # Add UART command to NUC140 here
+        latency_ms = (time.perf_counter() - chord.timestamp) * 1000
+        octave = " octave {octave:+d}" if self.octave_shift else ""
+        sustain = " (sustain)" if self.sustain_on else ""
+        if len(chord.notes) == 1:
+            finger_key, note_name = chord.notes[0]
+            hand, finger_id = finger_key.split("_")
+            self.log("note", "Note {note}" + octave + sustain + " played by {hand} finger {finger} "
+                     "({latency_ms:.1f} ms after capture)", note=note_name, key=finger_key, hand=hand,
+                     finger=int(finger_id), octave=self.octave_shift, sustain=self.sustain_on, latency_ms=latency_ms)
+        else:
+            keys = [finger_key for finger_key, _ in chord.notes]
+            notes = [note_name for _, note_name in chord.notes]
+            self.log("chord", "Chord {chord}" + octave + sustain + " played ({latency_ms:.1f} ms after capture)",
+                     chord=" + ".join(notes), notes=notes, keys=keys, octave=self.octave_shift,
+                     sustain=self.sustain_on, latency_ms=latency_ms)
+
+    def detect(self, frame_time, aspect=1.0):
+        """Press detection on the first num_hands hands in self.landmarks; aspect is width / height"""
+        num_hands = self.num_hands
+        self.aspect = aspect
+        tracker = self.hand_tracker
+
+        # Match hands to persistent IDs, then update all finger baselines at once
+        # (lowest y value = highest position)
+        self.hand_slots = tracker.update(self.landmarks, self.handedness_codes, num_hands, frame_time)
+        self.finger_distances = tracker.update_baselines(
+            self.hand_slots, self.landmarks[:num_hands, ALL_FINGER_TIPS, 1], BASELINE_UPDATE_RATE)
+        self.hand_labels = []
+        self.triggered[:] = False
+        layout = self.key_zones.layout if self.key_zones is not None else None
+
+        # Hand loss and recovery, by persistent hand ID
+        visible_ids = set(tracker.ids[self.hand_slots].tolist())
+        if visible_ids != self.visible_ids:
+            for hand_id in self.visible_ids - visible_ids:
+                self.log("hand", "Hand #{id} lost", id=hand_id, event="lost")
+            for hand_id in visible_ids - self.visible_ids:
+                self.log("hand", "Hand #{id} found", id=hand_id, event="found")
+            self.visible_ids = visible_ids
+
+        for idx in range(num_hands):
+            slot = self.hand_slots[idx]
+
+            # Get current hand type (left/right), smoothed over frames
+            current_hand = tracker.handedness(slot)
+            self.handedness_codes[idx] = HANDEDNESS_CODES.get(current_hand, -1)
+            self.hand_labels.append(current_hand)
+
+            # Control gestures
+            gesture = self.gesture_recognizer.update(tracker.ids[slot], current_hand,
+                                                     self.landmarks[idx], frame_time, aspect)
+            if gesture:
+                self.run_gesture_command(gesture)
+
             # Check each fingertip
+            for finger_index, finger_key in enumerate(FINGER_KEYS[current_hand]):
+                # Use hand-specific threshold
+                current_threshold = self.distance_thresholds.get(finger_key, 0.05)  # Default if not found
+                self.finger_thresholds[idx, finger_index] = current_threshold
+
+                # Check if distance exceeds threshold
+                if self.finger_distances[idx, finger_index] > current_threshold:
+                    current_time = time.time()
+
+                    # Check cooldown to avoid rapid triggers
+                    if current_time - tracker.last_trigger[slot, finger_index] > TRIGGER_COOLDOWN:
+                        # With a layout, the zone under the fingertip; presses outside every zone are ignored
+                        if layout is not None:
+                            tip_x, tip_y = self.landmarks[idx, ALL_FINGER_TIPS[finger_index], :2]
+                            note_name = layout.lookup(tip_x, tip_y)
+                            if note_name is None:
+                                continue
+                        else:
+                            note_name = NOTE_NAMES.get(finger_key, "Unknown")
+
+                        tracker.pressed[slot, finger_index] = True
+                        tracker.last_trigger[slot, finger_index] = current_time
+                        self.triggered[idx, finger_index] = True
+                        tracker.notes[slot, finger_index] = note_name
+                        self.roll_onsets.append(finger_key)
+
+                        # Sent together with the other presses of this chord
+                        self.chord_grouper.add(finger_key, note_name, frame_time)
+
+        # Send the chords completed in this frame
+        for chord in self.chord_grouper.flush(frame_time):
+            self.play_chord(chord)
+
+    def expire_feedback(self):
+        """Reset fingers not continuously pressed once their visual feedback has run out"""
+        tracker = self.hand_tracker
+        tracker.pressed[time.time() - tracker.last_trigger > VISUAL_FEEDBACK_DURATION] = False
+
+    def draw_hud(self, img, model_loading=False):
+        """Draw the threshold panel (debug mode) and key instructions"""
+        imgHeight, imgWidth = img.shape[:2]
+
+        # Display debug info
+        if self.debug_mode:
+            cv2.putText(img, "Press 'D': toggle debug, '+'/'-': adjust threshold",
+                        (30, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+
+            # Display thresholds for all fingers of both hands
+            y_pos = 120
+
+            # Current selection key
+            current_key = self.get_current_selection_key()
+
+            # Left hand thresholds
+            cv2.putText(img, "LEFT HAND:", (30, y_pos),
+                      cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+            y_pos += 30
+
             for finger_id in ALL_FINGER_TIPS:
-                lm = handLms.landmark[finger_id]
-                xPos = int(lm.x * imgWidth)
-                yPos = int(lm.y * imgHeight)
-                
-                # Create hand-finger combination key
-                finger_key = f"{current_hand}_{finger_id}"
-                
-                # Update baseline (lowest y value = highest position)
-                # Use a sliding update to adapt to hand movement
-                current_y = lm.y
-                if finger_key in finger_baseline:
-                    if current_y < finger_baseline[finger_key]:
-                        # Immediately update if position is higher than baseline
-                        finger_baseline[finger_key] = current_y
-                    else:
-                        # Slowly adapt baseline to current position
-                        finger_baseline[finger_key] = finger_baseline[finger_key] * (1 - BASELINE_UPDATE_RATE) + current_y * BASELINE_UPDATE_RATE
-                else:
-                    finger_baseline[finger_key] = current_y
-                
-                # Calculate downward distance from baseline
-                distance = current_y - finger_baseline[finger_key]
-                
+                key = f"Left_{finger_id}"
+                color = (255, 0, 255) if key == current_key else (0, 0, 255)
+                name = get_finger_name(finger_id)
+                threshold = self.distance_thresholds[key]
+                cv2.putText(img, f"L-{name}: {threshold:.3f}", (30, y_pos),
+                          cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+                y_pos += 25
+
+            y_pos += 10
+            # Right hand thresholds
+            cv2.putText(img, "RIGHT HAND:", (30, y_pos),
+                      cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+            y_pos += 30
+
+            for finger_id in ALL_FINGER_TIPS:
+                key = f"Right_{finger_id}"
+                color = (255, 0, 255) if key == current_key else (0, 0, 255)
+                name = get_finger_name(finger_id)
+                threshold = self.distance_thresholds[key]
+                cv2.putText(img, f"R-{name}: {threshold:.3f}", (30, y_pos),
+                          cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+                y_pos += 25
+
+            # Display instructions
+            y_pos += 10
+            cv2.putText(img, f"Selected: {self.selected_hand} {get_finger_name(self.selected_finger)}",
+                      (30, y_pos), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+            y_pos += 30
+
+            cv2.putText(img, "Use L/R to switch hands, 1-5 for fingers", (30, y_pos),
+                      cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+            y_pos += 30
+            cv2.putText(img, "+: increase threshold, -: decrease threshold", (30, y_pos),
+                      cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+            y_pos += 30
+            cv2.putText(img, f"G: gesture '{self.selected_gesture}', P: record pose ({len(self.pose_library)} poses)",
+                      (30, y_pos), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+            y_pos += 30
+            cv2.putText(img, f"Octave: {self.octave_shift:+d}  Sustain: {'ON' if self.sustain_on else 'OFF'}",
+                      (30, y_pos), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+
+        # Display key instructions
+        cv2.putText(img, "Press 'Q' to quit", (imgWidth - 200, 30),
+                  cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+
+        if model_loading:
+            cv2.putText(img, "Loading hand model...", (imgWidth//2 - 150, imgHeight//2),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+
+    def hands_state(self):
+        """Copy of this frame's per-hand results, safe to draw while the next frame is detected"""
+        slots = self.hand_slots
+        num_hands = len(slots)
+        tracker = self.hand_tracker
+        return HandsState(list(self.hand_labels), tracker.ids[slots], self.landmarks[:num_hands].copy(),
+                          tracker.baseline[slots], tracker.pressed[slots], self.finger_distances.copy(),
+                          self.finger_thresholds[:num_hands].copy(), self.triggered[:num_hands].copy(),
+                          tracker.notes[slots])
+
+    def draw_hands(self, img, state):
+        """Draw skeleton, fingertip state and press feedback of the hands in a HandsState"""
+        imgHeight, imgWidth = img.shape[:2]
+
+        for idx, current_hand in enumerate(state.labels):
+            landmarks = state.landmarks[idx]
+
+            # Draw hand landmarks
+            draw_skeleton(img, landmarks)
+
+            for finger_index, finger_id in enumerate(ALL_FINGER_TIPS):
+                xPos = int(landmarks[finger_id, 0] * imgWidth)
+                yPos = int(landmarks[finger_id, 1] * imgHeight)
+                baseline = state.baselines[idx, finger_index]
+
                 # Display distance (debug)
-                if DEBUG_MODE:
+                if self.debug_mode:
                     # Magnify for display
-                    display_distance = distance * 100
+                    display_distance = state.distances[idx, finger_index] * 100
                     cv2.putText(img, f"{display_distance:.1f}", (xPos + 10, yPos - 10),
                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1)
-                    
+
                     # Draw baseline position
-                    baseline_y = int(finger_baseline[finger_key] * imgHeight)
+                    baseline_y = int(baseline * imgHeight)
                     cv2.line(img, (xPos - 30, baseline_y), (xPos + 30, baseline_y), (0, 255, 255), 2)
-                
+
                 # Mark all fingertips (normal size)
                 cv2.circle(img, (xPos, yPos), 5, (0, 255, 0), cv2.FILLED)
-                
-                # Check if distance exceeds threshold
-                # Use hand-specific threshold
-                if finger_key in distance_thresholds:
-                    current_threshold = distance_thresholds[finger_key]
-                else:
-                    current_threshold = 0.05  # Default if not found
-                
-                if distance > current_threshold:
-                    current_time = time.time()
-                    
-                    # Check cooldown to avoid rapid triggers
-                    if current_time - last_trigger_time.get(finger_key, 0) > TRIGGER_COOLDOWN:
-                        fingers_pressed[finger_key] = True
-                        last_trigger_time[finger_key] = current_time
-                        
-                        # Press feedback - large text on screen
-                        note_name = NOTE_NAMES.get(finger_key, "Unknown")
-                        cv2.putText(img, f"PLAYED: {note_name}", (imgWidth//2 - 200, imgHeight//2),
-                                   cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0, 0, 255), 3)
-                        
-                        # Add UART command to NUC140 here
-                        print(f"Note {note_name} played by {current_hand} finger {finger_id}")
-                
+
+                # Press feedback - large text on screen
+                if state.triggered[idx, finger_index]:
+                    note_name = state.notes[idx, finger_index]
+                    cv2.putText(img, f"PLAYED: {note_name}", (imgWidth//2 - 200, imgHeight//2),
+                               cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0, 0, 255), 3)
+
                 # If finger is in pressed state, draw blue circle
-                if fingers_pressed.get(finger_key, False):
+                if state.pressed[idx, finger_index]:
                     # Large blue circle
                     cv2.circle(img, (xPos, yPos), 25, (255, 0, 0), cv2.FILLED)
                     # Inner white circle (for visibility)
                     cv2.circle(img, (xPos, yPos), 15, (255, 255, 255), cv2.FILLED)
-                    
+
                     # Display note name
-                    note_name = NOTE_NAMES.get(finger_key, "")
-                    cv2.putText(img, note_name, (xPos-25, yPos-25), 
+                    note_name = state.notes[idx, finger_index]
+                    cv2.putText(img, note_name, (xPos-25, yPos-25),
                               cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 0), 2)
-                
-                # Reset fingers not continuously pressed
-                if fingers_pressed.get(finger_key, False) and time.time() - last_trigger_time.get(finger_key, 0) > VISUAL_FEEDBACK_DURATION:
-                    fingers_pressed[finger_key] = False
-                    
+
                 # Draw threshold line
-                if DEBUG_MODE:
-                    threshold_y = int((finger_baseline[finger_key] + current_threshold) * imgHeight)
+                if self.debug_mode:
+                    threshold_y = int((baseline + state.thresholds[idx, finger_index]) * imgHeight)
                     cv2.line(img, (xPos - 15, threshold_y), (xPos + 15, threshold_y), (255, 0, 255), 2)
-            
-            # Display hand type
-            wrist_x = int(handLms.landmark[0].x * imgWidth)
-            wrist_y = int(handLms.landmark[0].y * imgHeight)
-            cv2.putText(img, current_hand, (wrist_x-20, wrist_y-20), 
+
+            # Display hand type and ID
+            wrist_x = int(landmarks[0, 0] * imgWidth)
+            wrist_y = int(landmarks[0, 1] * imgHeight)
+            cv2.putText(img, f"{current_hand} #{state.ids[idx]}", (wrist_x-20, wrist_y-20),
                       cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 0), 2)
-    
-    # Calculate FPS
-    cTime = time.time()
-    fps = 1 / (cTime - pTime)
-    pTime = cTime
-    cv2.putText(img, f"FPS: {int(fps)}", (30, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-    
-    # Display image
-    cv2.imshow('Virtual Piano - Separate Hand Settings', img)
-    
-    key = cv2.waitKey(1) 
-    if key == ord('q'):
-        break
-    elif key == ord('d'):
-        DEBUG_MODE = not DEBUG_MODE
-        print(f"Debug mode: {'ON' if DEBUG_MODE else 'OFF'}")
-    elif key == ord('+') or key == ord('='):  # Increase threshold (less sensitive)
-        current_key = get_current_selection_key()
-        distance_thresholds[current_key] *= 1.2  # REVERSED: multiply to increase
-        print(f"{SELECTED_HAND} {get_finger_name(SELECTED_FINGER)} threshold increased: {distance_thresholds[current_key]:.3f}")
-    elif key == ord('-') or key == ord('_'):  # Decrease threshold (more sensitive)
-        current_key = get_current_selection_key()
-        distance_thresholds[current_key] /= 1.2  # REVERSED: divide to decrease
-        print(f"{SELECTED_HAND} {get_finger_name(SELECTED_FINGER)} threshold decreased: {distance_thresholds[current_key]:.3f}")
-    elif key in [ord('1'), ord('2'), ord('3'), ord('4'), ord('5')]:  # Select different finger
-        finger_index = int(chr(key)) - 1  # Convert key to index (0-4)
-        SELECTED_FINGER = ALL_FINGER_TIPS[finger_index]
-        print(f"Selected finger: {SELECTED_HAND} {get_finger_name(SELECTED_FINGER)}")
-    elif key == ord('l') or key == ord('L'):  # Select left hand
-        SELECTED_HAND = "Left"
-        print(f"Selected hand: {SELECTED_HAND}")
-    elif key == ord('r') or key == ord('R'):  # Select right hand
-        SELECTED_HAND = "Right"
-        print(f"Selected hand: {SELECTED_HAND}")
-    elif key == ord('c'):  # Reset baselines
-        for hand in ["Left", "Right"]:
-            for finger_id in ALL_FINGER_TIPS:
-                finger_baseline[f"{hand}_{finger_id}"] = 1.0
-        print("Baselines reset")
 
-cap.release()
-cv2.destroyAllWindows()
\ No newline at end of file
+    def draw_piano_roll(self, img, state):
+        """Scroll the piano roll to now, adding the notes held in a HandsState and the presses
+        detected since the last draw, and draw it"""
+        imgWidth = img.shape[1]
+        if self.piano_roll is None or self.piano_roll.size[0] != imgWidth:
+            self.piano_roll = PianoRoll(list(NOTE_NAMES), NOTE_NAMES, imgWidth, self.piano_roll_seconds)
+
+        held = []
+        for idx, current_hand in enumerate(state.labels):
+            finger_keys = FINGER_KEYS[current_hand]
+            held.extend(finger_keys[i] for i in np.flatnonzero(state.pressed[idx]))
+        onsets = []
+        while self.roll_onsets:
+            onsets.append(self.roll_onsets.popleft())
+        self.piano_roll.update(time.perf_counter(), held, onsets)
+        self.piano_roll.draw(img)
+
+    def draw_overlay(self, img, fps, model_loading=False, state=None):
+        """Draw the piano roll, HUD, the hands (of state, default the last detect()) and the FPS counter"""
+        if state is None:
+            state = self.hands_state()
+        # The piano roll has one row per finger note, so it is not shown with a layout
+        if self.key_zones is not None:
+            self.key_zones.layout.draw(img)
+        elif self.piano_roll_seconds:
+            self.draw_piano_roll(img, state)
+        self.draw_hud(img, model_loading)
+        self.draw_hands(img, state)
+        cv2.putText(img, f"FPS: {int(fps)}", (30, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+
+    def handle_key(self, key):
+        """Apply a keyboard command; returns False when the user quits"""
+        if key == ord('q'):
+            return False
+        elif key == ord('d'):
+            self.debug_mode = not self.debug_mode
+            self.log("control", "Debug mode: {state}", state="ON" if self.debug_mode else "OFF")
+        elif key == ord('+') or key == ord('='):  # Increase threshold (less sensitive)
+            current_key = self.get_current_selection_key()
+            self.distance_thresholds[current_key] *= 1.2  # REVERSED: multiply to increase
+            self.log("threshold", "{hand} {finger} threshold increased: {threshold:.3f}", key=current_key,
+                     hand=self.selected_hand, finger=get_finger_name(self.selected_finger),
+                     threshold=self.distance_thresholds[current_key])
+        elif key == ord('-') or key == ord('_'):  # Decrease threshold (more sensitive)
+            current_key = self.get_current_selection_key()
+            self.distance_thresholds[current_key] /= 1.2  # REVERSED: divide to decrease
+            self.log("threshold", "{hand} {finger} threshold decreased: {threshold:.3f}", key=current_key,
+                     hand=self.selected_hand, finger=get_finger_name(self.selected_finger),
+                     threshold=self.distance_thresholds[current_key])
+        elif key in [ord('1'), ord('2'), ord('3'), ord('4'), ord('5')]:  # Select different finger
+            finger_index = int(chr(key)) - 1  # Convert key to index (0-4)
+            self.selected_finger = ALL_FINGER_TIPS[finger_index]
+            self.log("control", "Selected finger: {hand} {finger}", hand=self.selected_hand,
+                     finger=get_finger_name(self.selected_finger))
+        elif key == ord('l') or key == ord('L'):  # Select left hand
+            self.selected_hand = "Left"
+            self.log("control", "Selected hand: {hand}", hand=self.selected_hand)
+        elif key == ord('r') or key == ord('R'):  # Select right hand
+            self.selected_hand = "Right"
+            self.log("control", "Selected hand: {hand}", hand=self.selected_hand)
+        elif key == ord('s') or key == ord('S'):  # Save thresholds to the player profile
+            player = os.path.splitext(os.path.basename(self.profile_path))[0]
+            self.save_in_background(save_profile, (self.profile_path, player, dict(self.distance_thresholds)),
+                                    "Thresholds saved to {path}", path=self.profile_path)
+        elif key == ord('c'):  # Reset baselines
+            self.reset_baselines()
+        elif key == ord('z') or key == ord('Z'):  # Reload the key-zone layout file
+            if self.key_zones is not None:
+                self.key_zones.reload()
+            else:
+                self.log("control", "No layout loaded, start with --layout")
+        elif key == ord('g') or key == ord('G'):  # Select gesture command to record
+            next_index = (GESTURE_COMMANDS.index(self.selected_gesture) + 1) % len(GESTURE_COMMANDS)
+            self.selected_gesture = GESTURE_COMMANDS[next_index]
+            self.log("control", "Selected gesture: {gesture}", gesture=self.selected_gesture)
+        elif key == ord('p') or key == ord('P'):  # Record the first visible hand's pose
+            if self.num_hands:
+                hand = "Left" if self.handedness_codes[0] == HANDEDNESS_CODES["Left"] else "Right"
+                features = pose_features(self.landmarks[0], hand, self.aspect)
+                if features is not None:
+                    library = self.pose_library
+                    library.add(self.selected_gesture, features)
+                    # add() replaces the features array, so the one passed on is not changed later
+                    self.save_in_background(save_poses, (library.path, list(library.commands), library.features),
+                                            "Recorded {hand} pose for '{gesture}' ({poses} poses)", hand=hand,
+                                            gesture=self.selected_gesture, poses=len(library))
+            else:
+                self.log("control", "No hand visible to record")
+        return True
+
+    def handle_command(self, line):
+        """Apply a text command from the control socket and return the reply"""
+        words = line.split()
+        command, params = words[0].lower(), words[1:]
+        if command == "thresholds":
+            return "ok " + " ".join(f"{key}={value:.3f}" for key, value in self.distance_thresholds.items())
+        elif command == "threshold" and params:
+            key = params[0]
+            if key not in self.distance_thresholds:
+                return f"error unknown finger {key}, expected e.g. Left_8"
+            if len(params) > 1:
+                if params[1] == "up":
+                    self.distance_thresholds[key] *= 1.2
+                elif params[1] == "down":
+                    self.distance_thresholds[key] /= 1.2
+                else:
+                    self.distance_thresholds[key] = float(params[1])
+                self.log("threshold", "{key} threshold set to {threshold:.3f}", key=key,
+                         threshold=self.distance_thresholds[key])
+            return f"ok {key}={self.distance_thresholds[key]:.3f}"
+        elif command == "reset":
+            self.reset_baselines()
+            return "ok"
+        elif command == "debug":
+            self.debug_mode = params[0] == "on" if params else not self.debug_mode
+            self.log("control", "Debug mode: {state}", state="ON" if self.debug_mode else "OFF")
+            return f"ok debug {'on' if self.debug_mode else 'off'}"
+        elif command == "save":
+            self.handle_key(ord('s'))
+            return f"ok {self.profile_path}"
+        elif command == "layout":
+            if self.key_zones is None:
+                return "error no layout loaded, start with --layout"
+            path = params[0] if params else self.key_zones.path
+            self.key_zones.reload(path)
+            return f"ok loading {path}"
+        return f"error unknown command {line!r}"
+
+class DetectionLoop(threading.Thread):
+    """Capture, inference and press detection at camera rate on their own thread
+
+    Every processed frame is handed to the display through a LatestFrame, together
+    with a HandsState snapshot, so drawing and imshow never hold up a note. Without
+    a LatestFrame (headless) nothing is drawn at all. Key presses from the display
+    and control socket commands are applied here, between frames.
+    """
+
+    def __init__(self, args, piano, cap, model_future, latest_frame=None):
+        super().__init__(name="detection", daemon=True)
+        self.args = args
+        self.piano = piano
+        self.cap = cap
+        self.model_future = model_future
+        self.latest_frame = latest_frame
+
+        # Calls from other threads, run between frames
+        self.calls = queue.SimpleQueue()
+        self.stop_event = threading.Event()
+        self.error = None
+
+        # CPU accounting, and with --measure-drawing the sampled cost of the skipped drawing
+        self.frames = 0
+        self.fps = 0.0
+        self.cpu_start = self.wall_start = None
+        self.draw_samples = []
+
+        # Per-stage durations, timed in soak tests only
+        self.stage_timer = None
+
+        # Model, set once the warm-up has finished
+        self.hands = None
+        self.first_detection_reported = False
+
+        # Throttles inference once nobody has been in view for a while
+        # Not in soak tests: with no hands in view it would stop running most of the pipeline
+        self.idle_gate = (IdleGate(args.idle_after, args.idle_rate, log=piano.log)
+                          if args.idle_after > 0 and not args.soak else None)
+
+        # Time calculation
+        self.pTime = 0
+        # Frame count and time of the last FPS sample in the event log
+        self.fps_sample = (0, None)
+
+        # Frame buffers reused every iteration instead of allocating new images
+        self.frame_pool = FramePool()
+        self.frame_shape = None
+
+        # Landmarks published to the shared-memory feed
+        self.landmark_feed = LandmarkFeedWriter(args.feed, max_hands=args.max_hands) if args.feed else None
+
+        # Landmark recording for calibration.py
+        self.session_recorder = SessionRecorder() if args.record_landmarks else None
+
+        # Indexed session video for session_index.py, created once the frame size is known
+        self.session_video = None
+
+        # Black-box ring, created once the frame size is known; a dump is requested
+        # with 'B' or SIGUSR1
+        self.black_box = None
+        self.black_box_dump = threading.Event()
+
+    def run(self):
+        self.cpu_start = time.process_time()
+        self.wall_start = time.perf_counter()
+        try:
+            while not self.stop_event.is_set() and self.step():
+                pass
+        except BaseException as error:
+            # Re-raised by main() once the display has shut down
+            self.error = error
+
+    def call_soon(self, func, *args):
+        """Run func(*args) on the detection thread before the next frame; returns a Future"""
+        future = Future()
+        self.calls.put((future, func, args))
+        return future
+
+    def run_calls(self):
+        while True:
+            try:
+                future, func, args = self.calls.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                future.set_result(func(*args))
+            except Exception as error:
+                future.set_exception(error)
+
+    def handle_key(self, key):
+        """Apply a key pressed in the display window"""
+        if key == ord('b') or key == ord('B'):  # Dump the black-box recording
+            if self.args.black_box:
+                self.black_box_dump.set()
+            else:
+                self.piano.log("control", "Black box is off, start with --black-box")
+        else:
+            self.piano.handle_key(key)
+
+    def handle_command(self, line):
+        """Apply a control socket command and return the reply"""
+        command = line.split()[0].lower()
+        if command == "status":
+            piano = self.piano
+            return (f"ok fps={self.fps:.1f} frames={self.frames} hands={piano.num_hands} "
+                    f"debug={'on' if piano.debug_mode else 'off'} model={'ready' if self.hands else 'loading'} "
+                    f"idle={'on' if self.idle_gate and self.idle_gate.idle else 'off'}")
+        elif command == "dump":
+            if not self.args.black_box:
+                return "error black box is off, start with --black-box"
+            self.black_box_dump.set()
+            return "ok"
+        elif command == "stop":
+            self.stop_event.set()
+            return "ok"
+        return self.piano.handle_command(line)
+
+    def step(self):
+        """Process one frame; returns False at the end of the frame source"""
+        args = self.args
+        piano = self.piano
+        frame_pool = self.frame_pool
+        timer = self.stage_timer
+        if timer:
+            timer.start()
+
+        ret, raw, frame_time = self.cap.read(frame_pool.get("raw", self.frame_shape) if self.frame_shape else None)
+        if not ret:
+            return False
+        if timer:
+            timer.lap("capture")
+        if self.frame_shape is None:
+            piano.log("startup", "Time to first frame: {seconds:.2f} s", seconds=frame_time - START_TIME)
+        self.frame_shape = raw.shape
+
+        # Horizontal flip (display image), straight into the buffer handed to the display
+        if self.latest_frame is not None:
+            display_buffer = self.latest_frame.back_buffer(self.frame_shape)
+        else:
+            display_buffer = frame_pool.get("display", self.frame_shape)
+        img = cv2.flip(raw, 1, dst=display_buffer)
+
+        # Convert BGR to RGB (a remote server converts the frames it receives)
+        if not args.remote:
+            imgRGB = cv2.cvtColor(raw if MIRROR_LANDMARKS else img, cv2.COLOR_BGR2RGB,
+                                  dst=frame_pool.get("rgb", self.frame_shape))
+        if timer:
+            timer.lap("convert")
+
+        # Pick up the model once the background warm-up has finished
+        if self.hands is None and self.model_future.done():
+            self.hands = self.model_future.result()
+            piano.log("startup", "Hand model {state}: {seconds:.2f} s", state="connected" if args.remote else "ready",
+                      seconds=time.perf_counter() - START_TIME)
+        hands = self.hands
+
+        # Process image; when idle only on motion, or now and then at low resolution
+        inference = INFER_FULL
+        if hands is not None and self.idle_gate is not None:
+            inference = self.idle_gate.check(raw, frame_time)
+        if hands is None or inference is None:
+            result = None
+        elif args.remote:
+            scale = self.idle_gate.low_res_scale if inference == INFER_LOW else 1.0
+            result = hands.process(img, frame_time, scale)
+        elif inference == INFER_LOW:
+            result = hands.process(self.idle_gate.downscale(imgRGB))
+        else:
+            result = hands.process(imgRGB)
+        if timer:
+            timer.lap("inference")
+
+        # Hand detection results; remote landmarks belong to the frame they were sent with
+        imgHeight, imgWidth = img.shape[:2]
+        if args.remote:
+            piano.num_hands = read_packet(result, piano.landmarks, piano.handedness_codes)
+            if result is not None:
+                frame_time = result.timestamp
+        else:
+            piano.num_hands = read_hand_result(result, piano.landmarks, piano.handedness_codes,
+                                               MIRROR_LANDMARKS)
+
+        if piano.num_hands and not self.first_detection_reported:
+            self.first_detection_reported = True
+            piano.log("startup", "Time to first detection: {seconds:.2f} s", seconds=time.perf_counter() - START_TIME)
+        if self.idle_gate is not None and hands is not None:
+            self.idle_gate.update(piano.num_hands, frame_time, time.perf_counter())
+        self.run_calls()
+        piano.detect(frame_time, imgWidth / imgHeight)
+        if timer:
+            timer.lap("detection")
+
+        # Keep the clean frame and this frame's detection state in the black box
+        if args.black_box and hands is not None:
+            if self.black_box is None:
+                self.black_box = BlackBoxRecorder(args.black_box_file, (imgWidth // 4, imgHeight // 4),
+                                                  args.black_box, max_hands=args.max_hands,
+                                                  fingers=len(ALL_FINGER_TIPS))
+            tracker = piano.hand_tracker
+            self.black_box.record(frame_time, img, piano.landmarks, piano.handedness_codes, piano.num_hands,
+                                  piano.triggered, tracker.ids, tracker.baseline, piano.hand_slots)
+            if self.black_box_dump.is_set():
+                self.black_box_dump.clear()
+                path = dump_path()
+                self.black_box.dump(path, lambda frames, path=path: piano.log(
+                    "black_box", "Black box: {frames} frames dumped to {path}", frames=frames, path=path))
+
+        # Keep the clean frame in the session video, indexed with this frame's presses and hands
+        if args.record_video and hands is not None:
+            if self.session_video is None:
+                self.session_video = SessionVideoRecorder(args.record_video, (imgWidth, imgHeight), args.fps or 30.0)
+            slots = piano.hand_slots
+            self.session_video.add(img, frame_time, piano.hand_labels, piano.triggered, piano.hand_tracker.notes[slots],
+                                   piano.hand_tracker.ids[slots])
+
+        # Keep this frame for calibration
+        if self.session_recorder is not None and hands is not None:
+            self.session_recorder.add(piano.landmarks, piano.handedness_codes, piano.num_hands, frame_time)
+
+        # Publish this frame's landmarks to co-located consumers
+        if self.landmark_feed is not None:
+            if hands is not None:
+                self.landmark_feed.publish(piano.landmarks, piano.handedness_codes, piano.num_hands, frame_time)
+            else:
+                self.landmark_feed.heartbeat()
+
+        # Calculate FPS
+        cTime = time.time()
+        fps = self.fps = 1 / (cTime - self.pTime)
+        self.pTime = cTime
+        self.frames += 1
+        sample_frames, sample_time = self.fps_sample
+        if sample_time is None:
+            self.fps_sample = (self.frames, frame_time)
+        elif frame_time - sample_time >= FPS_LOG_INTERVAL:
+            piano.log("fps", "FPS: {fps:.1f}", fps=(self.frames - sample_frames) / (frame_time - sample_time),
+                      frames=self.frames)
+            self.fps_sample = (self.frames, frame_time)
+
+        if self.latest_frame is not None:
+            # Hand the frame to the display
+            self.latest_frame.publish((piano.hands_state(), fps, hands is None))
+        elif self.args.measure_drawing and self.frames % DRAW_SAMPLE_INTERVAL == 0:
+            # Now and then draw the skipped overlay off-screen, to report what headless mode saves
+            overlay = frame_pool.get("overlay", self.frame_shape)
+            durations = []
+            for repeat in range(DRAW_SAMPLE_REPEATS + 1):
+                np.copyto(overlay, img)
+                start = time.perf_counter()
+                piano.draw_overlay(overlay, fps, hands is None)
+                if repeat:
+                    durations.append(time.perf_counter() - start)
+            self.draw_samples.append(float(np.median(durations)))
+        piano.expire_feedback()
+        if timer:
+            timer.lap("output")
+        return True
+
+    def cpu_report(self):
+        """Log the CPU used per frame and, headless, the estimated saving against windowed mode"""
+        if not self.frames:
+            return
+        cpu = time.process_time() - self.cpu_start
+        wall = time.perf_counter() - self.wall_start
+        self.piano.log("report", "CPU: {cpu_s:.1f} s in {wall_s:.1f} s ({core:.0%} of one core), "
+                       "{frame_ms:.2f} ms per frame over {frames} frames", cpu_s=cpu, wall_s=wall,
+                       core=cpu / wall, frame_ms=cpu / self.frames * 1000, frames=self.frames)
+        if self.draw_samples:
+            # A window is refreshed at most display_fps times per second
+            draw_ms = float(np.median(self.draw_samples)) * 1000
+            refreshes = min(self.frames / wall, self.args.display_fps)
+            self.piano.log("report", "Headless: skipped drawing costs {draw_ms:.2f} ms per refresh in windowed mode "
+                           "(median of {samples} sampled frames, {repeats} draws each after a warm-up draw), "
+                           "about {core_percent:.1f}% of one core at {refreshes:.0f} refreshes/s, "
+                           "plus window compositing", draw_ms=draw_ms, samples=len(self.draw_samples),
+                           repeats=DRAW_SAMPLE_REPEATS, core_percent=draw_ms * refreshes / 10, refreshes=refreshes)
+
+    def close(self):
+        self.cap.release()
+        self.cpu_report()
+        if self.idle_gate is not None:
+            self.idle_gate.report()
+        if self.args.remote and self.hands is not None:
+            self.hands.close()
+        if self.session_recorder is not None:
+            self.session_recorder.save(self.args.record_landmarks)
+            self.piano.log("report", "Landmarks saved to {path}", path=self.args.record_landmarks)
+        if self.session_video is not None:
+            self.piano.log("report", "Session video saved to {path}, index {index}", path=self.args.record_video,
+                           index=self.session_video.close())
+        if self.landmark_feed is not None:
+            self.landmark_feed.close()
+        if self.black_box is not None:
+            self.black_box.close()
+
+def run_display(piano, detection, latest_frame, display_fps):
+    """Show detected frames at display_fps and forward keys until 'Q' or the end of detection"""
+    display_interval = 1.0 / display_fps
+    next_display = time.perf_counter()
+    while detection.is_alive():
+        # Draw the newest detected frame, if there is one since the last refresh
+        img, state = latest_frame.take()
+        if img is not None:
+            hands_state, fps, model_loading = state
+            piano.draw_overlay(img, fps, model_loading, hands_state)
+
+            # Display image
+            cv2.imshow(WINDOW_NAME, img)
+
+        # Handle keys while waiting for the next refresh
+        next_display = max(next_display + display_interval, time.perf_counter())
+        key = cv2.waitKey(max(1, int((next_display - time.perf_counter()) * 1000)))
+        if key == ord('q'):
+            break
+        if key != -1:
+            detection.call_soon(detection.handle_key, key)
+
+def main():
+    # Command line options
+    parser = argparse.ArgumentParser(description="Virtual piano hand tracking")
+    parser.add_argument("--source", default="0",
+                        help="camera index, video file, image folder/glob or 'synthetic'")
+    parser.add_argument("--realtime", action="store_true",
+                        help="play a video file source at its own frame rate instead of as fast as possible")
+    parser.add_argument("--width", type=int, help="requested camera width")
+    parser.add_argument("--height", type=int, help="requested camera height")
+    parser.add_argument("--fps", type=int, help="requested camera FPS")
+    parser.add_argument("--fourcc", help="camera FOURCC, e.g. MJPG")
+    parser.add_argument("--buffer-size", type=int, default=1, help="camera CAP_PROP_BUFFERSIZE")
+    parser.add_argument("--drain-frames", type=int, default=4,
+                        help="max queued camera frames discarded before retrieve (0 = off)")
+    parser.add_argument("--feed", nargs="?", const=DEFAULT_FEED_NAME,
+                        help="publish landmarks to a shared-memory feed with this name")
+    parser.add_argument("--chord-window", type=float, default=0.0,
+                        help="ms within which presses are sent as one chord (0 = same frame only)")
+    parser.add_argument("--gestures", default="gestures.json", help="recorded gesture pose library")
+    parser.add_argument("--max-hands", type=int, default=2, help="maximum number of hands tracked")
+    parser.add_argument("--profile", help="player profile with calibrated thresholds ('S' saves to it)")
+    parser.add_argument("--record-landmarks", metavar="PATH",
+                        help="save the session's landmarks (.npz) for calibration.py")
+    parser.add_argument("--record-video", metavar="PATH",
+                        help="save the session as an MJPG .avi with a seekable index for session_index.py")
+    parser.add_argument("--event-log", metavar="PATH",
+                        help="write notes, threshold changes, hand loss/recovery and FPS samples to this file")
+    parser.add_argument("--event-log-format", choices=["jsonl", "binary"], default="jsonl",
+                        help="event log file format; event_log.py prints either as JSON lines")
+    parser.add_argument("--event-log-flush-records", type=int, default=256,
+                        help="flush the event log once this many events are waiting")
+    parser.add_argument("--event-log-flush-interval", type=float, default=1.0,
+                        help="seconds between event log flushes")
+    parser.add_argument("--event-log-max-mb", type=float, default=10.0, help="event log size before rotating")
+    parser.add_argument("--event-log-backups", type=int, default=5, help="rotated event log files kept")
+    parser.add_argument("--black-box", type=float, nargs="?", const=10.0, metavar="SECONDS",
+                        help="keep the last SECONDS of frames and detection state; 'B' or SIGUSR1 dumps them")
+    parser.add_argument("--black-box-file", default="blackbox.ring",
+                        help="memory-mapped ring file of the black-box recorder")
+    parser.add_argument("--remote", nargs="?", const=DEFAULT_INFERENCE_ADDRESS, metavar="ADDRESS",
+                        help="thin client: send frames to remote_inference.py at this Unix socket path, "
+                             "localhost port or HOST:PORT instead of running MediaPipe (default: %(const)s)")
+    parser.add_argument("--remote-encoding", choices=["jpeg", "raw"], default="jpeg",
+                        help="frame encoding sent to the inference server")
+    parser.add_argument("--remote-width", type=int, default=320, help="width frames are downsized to before sending")
+    parser.add_argument("--remote-quality", type=int, default=80, help="JPEG quality of sent frames")
+    parser.add_argument("--remote-pipeline", type=int, default=0,
+                        help="frames in flight to the server; 0 waits for every frame's landmarks, 1 overlaps "
+                             "the next frame with the round trip but returns the previous frame's hands "
+                             "(only worth it when the round trip is longer than a frame)")
+    parser.add_argument("--idle-after", type=float, default=3.0, metavar="SECONDS",
+                        help="throttle inference after this long without a hand (0 disables idle mode)")
+    parser.add_argument("--idle-rate", type=float, default=3.0,
+                        help="low-resolution inferences per second while idle")
+    parser.add_argument("--layout", help="key-zone layout (JSON): notes are screen zones instead of fingers, "
+                                         "'Z' reloads the file")
+    parser.add_argument("--piano-roll", type=float, default=4.0, metavar="SECONDS",
+                        help="seconds of played notes shown in the piano roll (0 hides it)")
+    parser.add_argument("--display-fps", type=float, default=30.0,
+                        help="window refresh rate; detection runs at camera rate regardless")
+    parser.add_argument("--headless", action="store_true",
+                        help="service mode: no window and no drawing, control through --control")
+    parser.add_argument("--measure-drawing", action="store_true",
+                        help="headless: every %d frames draw the overlay off-screen %d times after a warm-up "
+                             "draw, and report what skipping the drawing saves"
+                             % (DRAW_SAMPLE_INTERVAL, DRAW_SAMPLE_REPEATS))
+    parser.add_argument("--control", nargs="?", const=DEFAULT_CONTROL_ADDRESS, metavar="ADDRESS",
+                        help="accept commands on this Unix socket path or localhost TCP port "
+                             "(default with --headless: %(const)s)")
+    parser.add_argument("--soak", type=float, metavar="SECONDS",
+                        help="soak test: run the whole pipeline without a window at full speed for SECONDS, "
+                             "looping the source, and report memory growth and latency drift; the idle gate "
+                             "is off, and a recorded video with hands also exercises press detection")
+    parser.add_argument("--soak-interval", type=float, default=60.0, help="seconds between soak samples")
+    parser.add_argument("--soak-report", default="soak-report.json", help="soak time-series report (JSON)")
+    parser.add_argument("--soak-top", type=int, default=10,
+                        help="tracemalloc allocation sites reported per sample (0 = tracemalloc off)")
+    args = parser.parse_args()
+    if args.headless and args.control is None:
+        args.control = DEFAULT_CONTROL_ADDRESS
+
+    # Started before anything else, so tracemalloc sees every allocation of the run
+    soak_monitor = None
+    if args.soak:
+        soak_monitor = SoakMonitor(args.soak, args.soak_interval, args.soak_report, args.soak_top)
+    windowed = not args.headless and not args.soak
+
+    # Load the model and open the frame source (camera by default) in the background,
+    # while the window is created on the main thread
+    startup_pool = ThreadPoolExecutor(max_workers=2)
+    if args.remote:
+        model_future = startup_pool.submit(RemoteHands, args.remote, args.max_hands, args.remote_encoding,
+                                           args.remote_width, args.remote_quality, args.remote_pipeline)
+    else:
+        model_future = startup_pool.submit(load_hand_model, (args.width or 640, args.height or 480),
+                                           args.max_hands)
+    source_future = startup_pool.submit(
+        open_frame_source, args.source, loop=bool(args.soak), realtime=args.realtime, width=args.width,
+        height=args.height, fps=args.fps, fourcc=args.fourcc, buffer_size=args.buffer_size,
+        drain_frames=args.drain_frames)
+
+    event_log = EventLog(args.event_log, args.event_log_format == "binary",
+                         flush_records=args.event_log_flush_records, flush_interval=args.event_log_flush_interval,
+                         max_bytes=int(args.event_log_max_mb * 2**20), backups=args.event_log_backups)
+    piano = VirtualPiano(args.max_hands, args.chord_window / 1000, args.gestures, args.profile,
+                         args.piano_roll, args.layout, event_log)
+
+    # Create window
+    if windowed:
+        cv2.namedWindow(WINDOW_NAME, cv2.WINDOW_NORMAL)
+        cv2.resizeWindow(WINDOW_NAME, 1280, 720)
+
+    cap = source_future.result()
+    startup_pool.shutdown(wait=False)
+
+    # Detection runs at camera rate on its own thread, this thread only displays
+    latest_frame = None if args.headless else LatestFrame()
+    detection = DetectionLoop(args, piano, cap, model_future, latest_frame)
+    if soak_monitor is not None:
+        detection.stage_timer = soak_monitor.detection_timer
+    if args.black_box and hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: detection.black_box_dump.set())
+    # SIGTERM (service stop) shuts down like 'Q'
+    signal.signal(signal.SIGTERM, lambda signum, frame: detection.stop_event.set())
+
+    control = None
+    if args.control:
+        try:
+            control = ControlServer(args.control, lambda line: detection.call_soon(
+                detection.handle_command, line).result(timeout=CONTROL_TIMEOUT))
+        except OSError as error:
+            sys.exit(f"Control socket not started: {error}")
+        control.start()
+    detection.start()
+
+    if soak_monitor is not None:
+        # The overlay is still drawn, off-screen, so drawing is part of the soak
+        soak_monitor.run(piano, detection, latest_frame)
+    elif args.headless:
+        # Nothing to display; wake up regularly so signals are handled
+        try:
+            while detection.is_alive():
+                detection.join(0.5)
+        except KeyboardInterrupt:
+            pass
+    else:
+        run_display(piano, detection, latest_frame, args.display_fps)
+
+    detection.stop_event.set()
+    detection.join()
+    piano.close()
+    if control is not None:
+        control.close()
+    detection.close()
+    # Last, so the lines logged while everything else shuts down (e.g. black-box dumps) are written
+    event_log.close()
+    if windowed:
+        cv2.destroyAllWindows()
+    if detection.error is not None:
+        raise detection.error
+
+    if soak_monitor is not None:
+        settings = {"source": args.source, "duration_s": args.soak, "max_hands": args.max_hands,
+                    "black_box": args.black_box, "feed": args.feed}
+        flags = soak_monitor.write_report(settings)
+        soak_monitor.close()
+        if flags:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# Persistent hand identities across frames, with per-hand finger state in arrays
+import numpy as np
+
+# Wrist and the four finger base knuckles, averaged into a palm centre
+PALM_LANDMARKS = [0, 5, 9, 13, 17]
+
+# Handedness codes as published in the landmark feed
+LEFT = 0
+RIGHT = 1
+
+# Rate the finger baselines adapt to downward movement (higher = faster adaptation)
+BASELINE_UPDATE_RATE = 0.05
+
+
+class HandTracker:
+    """Keeps a stable ID per hand by matching palm centres between frames
+
+    Each tracked hand owns a slot in the state arrays (baseline, pressed,
+    last_trigger, notes), indexed [slot, finger]. Slots of lost hands are reused and
+    the arrays only grow when more hands are visible at once than ever before.
+    """
+
+    def __init__(self, capacity=2, fingers=5, max_distance=0.15, max_missing=0.5,
+                 handedness_rate=0.2):
+        # Largest palm movement (in normalized image units) still counted as the same hand
+        self.max_distance = max_distance
+        # Seconds a hand may go undetected before its ID is dropped
+        self.max_missing = max_missing
+        # Smoothing of the handedness label, so one mislabelled frame does not flip it
+        self.handedness_rate = handedness_rate
+        self.next_id = 1
+
+        self.ids = np.full(capacity, -1, np.int64)
+        self.centers = np.zeros((capacity, 2))
+        self.last_seen = np.zeros(capacity)
+        self.left_votes = np.zeros(capacity)
+        self.baseline = np.ones((capacity, fingers))
+        self.pressed = np.zeros((capacity, fingers), bool)
+        self.last_trigger = np.zeros((capacity, fingers))
+        # Note of each finger's last press, "" before the first
+        self.notes = np.full((capacity, fingers), "", object)
+
+    def update(self, landmarks, handedness_codes, num_hands, timestamp):
+        """Assign a slot to each of the first num_hands detections and return the slots"""
+        # Forget hands that have been gone too long
+        expired = (self.ids >= 0) & (timestamp - self.last_seen > self.max_missing)
+        self.ids[expired] = -1
+
+        centers = landmarks[:num_hands, PALM_LANDMARKS, :2].mean(axis=1)
+        slots = np.full(num_hands, -1, np.intp)
+
+        # Greedy matching on palm distance, closest pairs first
+        active = np.flatnonzero(self.ids >= 0)
+        if num_hands and len(active):
+            cost = np.linalg.norm(centers[:, None, :] - self.centers[None, active, :], axis=2)
+            taken = np.zeros(len(active), bool)
+            for flat in np.argsort(cost, axis=None):
+                detection, track = divmod(int(flat), len(active))
+                if cost[detection, track] > self.max_distance:
+                    break
+                if slots[detection] < 0 and not taken[track]:
+                    slots[detection] = active[track]
+                    taken[track] = True
+
+        for detection in range(num_hands):
+            code = handedness_codes[detection]
+            vote = 1.0 if code == LEFT else -1.0 if code == RIGHT else 0.0
+            slot = slots[detection]
+            if slot < 0:
+                slot = slots[detection] = self._new_track()
+                self.left_votes[slot] = vote
+            else:
+                rate = self.handedness_rate
+                self.left_votes[slot] = self.left_votes[slot] * (1 - rate) + vote * rate
+            self.centers[slot] = centers[detection]
+            self.last_seen[slot] = timestamp
+
+        return slots
+
+    def handedness(self, slot):
+        """Smoothed "Left"/"Right" label of the hand in this slot"""
+        votes = self.left_votes[slot]
+        if votes > 0:
+            return "Left"
+        if votes < 0:
+            return "Right"
+        return "Unknown"
+
+    def update_baselines(self, slots, tips_y, rate):
+        """Update finger baselines from fingertip y (hands, fingers) and return the distances below them"""
+        baseline = self.baseline[slots]
+        # Follow upward movement immediately, adapt slowly to downward movement
+        baseline = np.where(tips_y < baseline, tips_y, baseline * (1 - rate) + tips_y * rate)
+        self.baseline[slots] = baseline
+        return tips_y - baseline
+
+    def _new_track(self):
+        free = np.flatnonzero(self.ids < 0)
+        if len(free):
+            slot = int(free[0])
+        else:
+            slot = len(self.ids)
+            self._grow()
+
+        self.ids[slot] = self.next_id
+        self.next_id += 1
+        self.baseline[slot] = 1.0
+        self.pressed[slot] = False
+        self.last_trigger[slot] = 0.0
+        self.notes[slot] = ""
+        return slot
+
+    def _grow(self):
+        capacity = len(self.ids)
+        self.ids = np.concatenate([self.ids, np.full(capacity, -1, np.int64)])
+        for name in ("centers", "last_seen", "left_votes", "baseline", "pressed", "last_trigger"):
+            array = getattr(self, name)
+            setattr(self, name, np.concatenate([array, np.zeros_like(array)]))
+        self.notes = np.concatenate([self.notes, np.full_like(self.notes, "")])
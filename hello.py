@@ -5,13 +5,26 @@
 import turtle
 import random
 import math
+import os
+import sys
+import time
+import argparse
+import itertools
+import concurrent.futures
+
+import numpy as np
+
+from scene_export import Scene, save_scene
+
+# 櫻花顏色
+BLOSSOM_COLORS = ["#ffb7c5", "#ffc0cb", "#ff80a0", "#ffaeb9"]
 
 # 設置視窗
-def setup_window():
+def setup_window(width=800):
     window = turtle.Screen()
     window.bgcolor("lightblue")  # 淺藍色背景
     window.title("隨機櫻花樹")
-    window.setup(width=800, height=600)
+    window.setup(width=width, height=600)
     return window
 
 # 初始化烏龜
@@ -21,14 +34,14 @@ def setup_turtle():
     t.hideturtle()
     return t
 
-# 繪製櫻花
-def draw_cherry_blossom(t, size):
+# 繪製櫻花 (未指定顏色時隨機選擇)
+def draw_cherry_blossom(t, size, color=None):
     current_pos = t.position()
     current_heading = t.heading()
     
     # 隨機選擇櫻花顏色
-    colors = ["#ffb7c5", "#ffc0cb", "#ff80a0", "#ffaeb9"]
-    color = random.choice(colors)
+    if color is None:
+        color = random.choice(BLOSSOM_COLORS)
     
     t.pencolor(color)
     t.fillcolor(color)
@@ -59,97 +72,209 @@ def draw_cherry_blossom(t, size):
     t.setheading(current_heading)
     t.pendown()
 
-# 遞歸繪製樹枝 (優化版)
-def draw_branch(t, length, angle, depth, min_length=5):
-    if length < min_length or depth > 10:  # 增加深度限制
-        return
+# 子樹模板快取: (量化長度, 種子桶, 剩餘深度, 最短長度, 細節長度) -> (segments, blossoms)
+# 模板以子樹起點為原點, 方向 0 度生成, 跨多棵樹共用
+SUBTREE_TEMPLATES = {}
+
+# 從一段樹枝開始生長 (迭代, 不繪圖), 把樹枝與花朵加進 segments / blossoms 列表
+# 以顯式堆疊代替遞歸, 隨機數的抽取順序與原本的遞歸繪製相同, 同一種子得到同一棵樹
+# 深度不受遞歸上限限制; 兩種上限讓很深的樹也在有限時間內完成:
+#   - 細節層級: 短於 lod_length 的樹枝不再展開, 整個子樹合併成末端的一朵花
+#   - 圖元預算: 樹枝段數加花朵數最多到 limit, 每段樹枝的剩餘預算先分一半給右側子樹,
+#     右側用剩的全留給左側; 預算用完的樹枝還有餘額時以一朵花代替, 否則略去
+# instance_length > 0 時, 短於它的子樹從模板快取蓋印, 模板由 rng 抽出的種子桶選擇
+# 每個樹枝與花朵記下繪製層 (深度加一, 樹幹為 0), 花朵與所在的樹枝同層
+# segments 可含已蓋印的 (n, 6) 陣列, 回傳目前的圖元總數 (樹枝加花朵)
+def grow_branches(rng, segments, blossoms, x, y, heading, length, count=0, min_length=5, max_depth=10,
+                  lod_length=1.0, limit=4096, instance_length=0, instance_buckets=8):
+    # 堆疊項目: (階段, x, y, 方向, 長度, 深度, 預算上限)
+    # BRANCH 畫一段樹枝並先展開右側分支; 右側整棵完成後, LEFT 才抽左側分支的隨機數
+    # 預算上限是子樹完成時最多能有的圖元總數
+    BRANCH, LEFT = 0, 1
+    stack = [(BRANCH, x, y, heading, length, 0, limit)]
+    while stack:
+        phase, x, y, heading, length, depth, limit = stack.pop()
+        if phase == LEFT:
+            left_angle = rng.randint(15, 30)
+            left_length = length * rng.uniform(0.6, 0.8)
+            stack.append((BRANCH, x, y, heading + left_angle, left_length, depth + 1, limit))
+            continue
     
-    # 樹幹顏色和粗細
-    t.pencolor("brown")
-    t.pensize(length/10)
+        if length < min_length or depth > max_depth:
+            continue
     
-    # 主幹
-    t.forward(length)
-    current_pos = t.position()
-    current_heading = t.heading()
+        # 短子樹: 蓋印快取的模板 (長度量化到整數, 蓋印時縮放回實際長度); 放不進預算時照常生長
+        if length < instance_length and length >= max(lod_length, 1):
+            template = subtree_template(round(length), rng.randrange(instance_buckets), max_depth - depth,
+                                        min_length, lod_length)
+            if count + len(template[0]) + len(template[1]) <= limit:
+                stamped_segments, stamped_blossoms = stamp_template(template, x, y, heading, length / round(length),
+                                                                    depth)
+                segments.append(stamped_segments)
+                blossoms.append(stamped_blossoms)
+                count += len(stamped_segments) + len(stamped_blossoms)
+                continue
     
-    # 如果達到末端，繪製花朵
-    if length < 20:
-        draw_cherry_blossom(t, random.uniform(3, 6))
+        # 樹枝
+        radians = math.radians(heading)
+        x1 = x + length * math.cos(radians)
+        y1 = y + length * math.sin(radians)
     
-    # 右側分支
-    right_angle = random.randint(15, 30)
-    right_length = length * random.uniform(0.6, 0.8)
+        # 小於一個細節單位或超出預算: 整個子樹只留末端一朵花 (預算用盡時連花也不留)
+        if length < lod_length or count >= limit:
+            if count < limit:
+                size = rng.uniform(3, 6)
+                color = BLOSSOM_COLORS.index(rng.choice(BLOSSOM_COLORS))
+                blossoms.append((x1, y1, heading, size, color, length / 10, depth + 1))
+                count += 1
+            continue
     
-    t.right(right_angle)
-    draw_branch(t, right_length, right_angle, depth+1, min_length)
+        segments.append((x, y, x1, y1, length / 10, depth + 1))
+        count += 1
     
-    # 恢復位置
-    t.penup()
-    t.goto(current_pos)
-    t.setheading(current_heading)
-    t.pendown()
+        # 如果達到末端, 記錄花朵 (仍在預算內時)
+        if length < 20 and count < limit:
+            size = rng.uniform(3, 6)
+            color = BLOSSOM_COLORS.index(rng.choice(BLOSSOM_COLORS))
+            blossoms.append((x1, y1, heading, size, color, length / 10, depth + 1))
+            count += 1
     
-    # 左側分支
-    left_angle = random.randint(15, 30)
-    left_length = length * random.uniform(0.6, 0.8)
+        # 右側分支先處理, 左側分支排在它之後
+        right_angle = rng.randint(15, 30)
+        right_length = length * rng.uniform(0.6, 0.8)
+        stack.append((LEFT, x1, y1, heading, length, depth, limit))
+        stack.append((BRANCH, x1, y1, heading - right_angle, right_length, depth + 1, count + (limit - count) // 2))
     
-    t.left(left_angle)
-    draw_branch(t, left_length, left_angle, depth+1, min_length)
+    return count
+
+# 列表中的元組與已蓋印的陣列合併成一個陣列
+def stack_rows(rows, columns):
+    tuples = [row for row in rows if isinstance(row, tuple)]
+    arrays = [row for row in rows if not isinstance(row, tuple)]
+    return np.concatenate([np.array(tuples, np.float64).reshape(-1, columns)] + arrays)
+
+# 取得 (必要時生成) 子樹模板; 模板有自己的隨機數產生器, 內容只由鍵決定
+def subtree_template(length, bucket, max_depth, min_length, lod_length):
+    key = (length, bucket, max_depth, min_length, lod_length)
+    template = SUBTREE_TEMPLATES.get(key)
+    if template is None:
+        rng = random.Random(f"subtree {key}")
+        segments = []
+        blossoms = []
+        # 模板不設預算; 用最大整數而非無限大, 因為 inf // 2 是 nan, 預算比較會全部失敗
+        grow_branches(rng, segments, blossoms, 0.0, 0.0, 0.0, length, min_length=min_length,
+                      max_depth=max_depth, lod_length=lod_length, limit=sys.maxsize)
+        template = (stack_rows(segments, 6), stack_rows(blossoms, 7))
+        SUBTREE_TEMPLATES[key] = template
+    return template
+
+# 把模板縮放 scale 倍 (座標與筆寬, 花朵大小不變), 旋轉到 heading 方向並平移到 (x, y),
+# 繪製層加上蓋印處的深度
+def stamp_template(template, x, y, heading, scale=1.0, depth=0):
+    segments, blossoms = template
+    radians = math.radians(heading)
+    cos, sin = math.cos(radians), math.sin(radians)
+    # 列向量乘以縮放後的旋轉矩陣
+    rotation = scale * np.array([[cos, sin], [-sin, cos]])
+    offset = np.array([x, y])
+    stamped_segments = segments.copy()
+    stamped_segments[:, 0:2] = segments[:, 0:2] @ rotation + offset
+    stamped_segments[:, 2:4] = segments[:, 2:4] @ rotation + offset
+    stamped_segments[:, 4] *= scale
+    stamped_segments[:, 5] += depth
+    stamped_blossoms = blossoms.copy()
+    stamped_blossoms[:, 0:2] = blossoms[:, 0:2] @ rotation + offset
+    stamped_blossoms[:, 2] += heading
+    stamped_blossoms[:, 5] *= scale
+    stamped_blossoms[:, 6] += depth
+    return stamped_segments, stamped_blossoms
+
+# 生成整棵樹的幾何 (不繪圖), pixel_size 為一個輸出像素的長度, 細節層級以像素計
+# 預設參數下不會觸及細節層級與預算上限, 也不用模板, 結果與原本的遞歸繪製相同
+# 回傳 segments: (N, 6) 陣列 x0, y0, x1, y1, 筆寬, 繪製層
+#      blossoms: (M, 7) 陣列 x, y, 方向, 大小, 顏色索引, 筆寬, 繪製層
+def generate_cherry_tree(start=(0, -200), trunk_length=80, trunk_width=10, min_length=5, max_depth=10,
+                         pixel_size=1.0, lod_pixels=1.0, max_segments=4096, instance_length=0,
+                         instance_buckets=8, rng=random):
+    # 樹幹 (向上)
+    x, y = start
+    segments = [(x, y, x, y + trunk_length, trunk_width, 0)]
+    blossoms = []
     
-    # 恢復位置
-    t.penup()
-    t.goto(current_pos)
-    t.setheading(current_heading)
-    t.pendown()
+    grow_branches(rng, segments, blossoms, x, y + trunk_length, 90.0, rng.randint(60, 80), count=1,
+                  min_length=min_length, max_depth=max_depth, lod_length=lod_pixels * pixel_size,
+                  limit=max_segments, instance_length=instance_length, instance_buckets=instance_buckets)
+    return stack_rows(segments, 6), stack_rows(blossoms, 7)
 
-# 繪製櫻花樹
-def draw_cherry_tree(t):
-    # 從底部開始
-    t.penup()
-    t.goto(0, -200)
-    t.setheading(90)  # 向上
-    t.pendown()
+# 批次繪製樹的幾何, 依繪製層由樹幹到枝梢: 每層先畫樹枝 (依筆寬分組, 粗到細), 再畫花朵 (依顏色分組)
+# 子樹枝蓋住上一層末端的花朵, 與逐枝遞歸繪製的前後關係相同; 每層只更新一次畫面
+def draw_tree_geometry(t, segments, blossoms):
+    screen = t.getscreen()
+    tracer = screen.tracer()
+    screen.tracer(0)
+    
+    # 畫布線寬以整數像素繪製
+    widths = np.maximum(1, np.round(segments[:, 4]))
+    for layer in np.union1d(segments[:, 5], blossoms[:, 6]):
+        in_layer = segments[:, 5] == layer
+        t.pencolor("brown")
+        for width in np.unique(widths[in_layer])[::-1]:
+            t.pensize(width)
+            for x0, y0, x1, y1 in segments[in_layer & (widths == width), :4].tolist():
+                t.penup()
+                t.goto(x0, y0)
+                t.pendown()
+                t.goto(x1, y1)
     
-    # 樹幹
-    t.pencolor("brown")
-    t.pensize(10)
-    t.forward(80)
+        layer_blossoms = blossoms[blossoms[:, 6] == layer]
+        for color_index, color in enumerate(BLOSSOM_COLORS):
+            for x, y, heading, size, _, width, _ in layer_blossoms[layer_blossoms[:, 4] == color_index].tolist():
+                t.penup()
+                t.goto(x, y)
+                t.setheading(heading)
+                t.pensize(width)
+                t.pendown()
+                draw_cherry_blossom(t, size, color)
+        screen.update()
     
-    # 開始分支
-    initial_length = random.randint(60, 80)
-    draw_branch(t, initial_length, 0, 0)
+    t.penup()
+    screen.tracer(tracer)
+
+# 繪製櫻花樹: 先生成全部幾何, 再批次繪製 (tree_options 傳給 generate_cherry_tree)
+def draw_cherry_tree(t, **tree_options):
+    segments, blossoms = generate_cherry_tree(**tree_options)
+    draw_tree_geometry(t, segments, blossoms)
 
 # 添加地面
-def draw_ground(t):
+def draw_ground(t, width=800):
     t.penup()
-    t.goto(-400, -200)
+    t.goto(-width / 2, -200)
     t.pendown()
     t.pencolor("#228b22")
     t.fillcolor("#228b22")
     t.begin_fill()
     t.setheading(0)
     for _ in range(2):
-        t.forward(800)
+        t.forward(width)
         t.right(90)
         t.forward(50)
         t.right(90)
     t.end_fill()
 
-# 添加落櫻效果
-def add_falling_petals(count=30):
+# 添加落櫻效果 (new_turtle 建立每片花瓣的烏龜)
+def add_falling_petals(count=30, new_turtle=turtle.Turtle, width=800):
     petals = []
-    colors = ["#ffb7c5", "#ffc0cb", "#ff80a0", "#ffaeb9"]
+    colors = BLOSSOM_COLORS
     
     for _ in range(count):
         # 創建新的烏龜
-        p = turtle.Turtle()
+        p = new_turtle()
         p.speed(0)
         p.hideturtle()
         p.penup()
         
         # 隨機位置
-        x = random.randint(-380, 380)
+        x = random.randint(-width // 2 + 20, width // 2 - 20)
         y = random.randint(-100, 280)
         p.goto(x, y)
         
@@ -167,10 +292,88 @@ def add_falling_petals(count=30):
     
     return petals
 
+# 花瓣形狀: 以原點為中心, 沿 x 軸的橢圓, 長度 1
+PETAL_SHAPE = np.stack([0.5 * np.cos(np.linspace(0, 2 * np.pi, 8, endpoint=False)),
+                        0.25 * np.sin(np.linspace(0, 2 * np.pi, 8, endpoint=False))], axis=1)
+
+# 落櫻動畫: 花瓣的位置, 速度, 旋轉與顏色索引存在 NumPy 陣列, 每一步一次更新全部花瓣
+# 畫面由一組預先建立的 Canvas 多邊形重複使用, 每格只改座標, 不建立或刪除圖形
+class FallingPetals:
+    def __init__(self, count=300, left=-400, right=400, top=300, ground=-200, seed=None):
+        rng = np.random.default_rng(seed)
+        self.rng = rng
+        self.left, self.right, self.top, self.ground = left, right, top, ground
+        # 一開始就散布在整個天空
+        self.position = np.column_stack([rng.uniform(left, right, count), rng.uniform(ground, top, count)])
+        # 基本速度 (每秒): 微風向右, 緩慢下落
+        self.velocity = np.column_stack([rng.uniform(5, 25, count), -rng.uniform(25, 60, count)])
+        self.rotation = rng.uniform(0, 2 * np.pi, count)
+        self.spin = rng.uniform(-3, 3, count)
+        # 左右搖擺
+        self.sway_phase = rng.uniform(0, 2 * np.pi, count)
+        self.sway_rate = rng.uniform(1, 3, count)
+        self.size = rng.uniform(5, 9, count)
+        self.color = rng.integers(len(BLOSSOM_COLORS), size=count)
+        self.items = []
+    
+    # 前進 dt 秒; 落地或飄出畫面的花瓣回到頂端
+    def step(self, dt):
+        self.sway_phase += self.sway_rate * dt
+        self.position[:, 0] += (self.velocity[:, 0] + 15 * np.sin(self.sway_phase)) * dt
+        self.position[:, 1] += self.velocity[:, 1] * dt
+        self.rotation += self.spin * dt
+    
+        landed = (self.position[:, 1] < self.ground) | (self.position[:, 0] > self.right + 20)
+        if landed.any():
+            self.position[landed, 0] = self.rng.uniform(self.left - 20, self.right, landed.sum())
+            self.position[landed, 1] = self.top + 10
+    
+    # 全部花瓣多邊形的頂點 (花瓣數, 頂點數, 2)
+    def outlines(self):
+        cos = np.cos(self.rotation)[:, None]
+        sin = np.sin(self.rotation)[:, None]
+        x = PETAL_SHAPE[:, 0] * self.size[:, None]
+        y = PETAL_SHAPE[:, 1] * self.size[:, None]
+        return np.stack([self.position[:, 0:1] + x * cos - y * sin,
+                         self.position[:, 1:2] + x * sin + y * cos], axis=2)
+    
+    # 在烏龜畫布上建立花瓣圖形 (畫在目前所有圖形之上)
+    def create_items(self, canvas):
+        for color in self.color:
+            self.items.append(canvas.create_polygon(0, 0, 0, 0, 0, 0, fill=BLOSSOM_COLORS[color], outline=""))
+    
+    # 把目前狀態寫進畫布圖形的座標 (烏龜座標的 y 軸向上, 畫布向下)
+    def draw(self, canvas):
+        points = self.outlines()
+        points[:, :, 1] *= -1
+        for item, coords in zip(self.items, points.reshape(len(points), -1).tolist()):
+            canvas.coords(item, *coords)
+    
+    # 固定時間步長的動畫: ontimer 每 1/fps 秒觸發一次, 依實際經過的時間補足步數,
+    # 計時器延遲時畫面仍以相同速度前進 (一次最多補 max_steps 步)
+    def animate(self, screen, fps=60, max_steps=5):
+        canvas = screen.getcanvas()
+        self.create_items(canvas)
+        dt = 1.0 / fps
+        state = {"last": time.perf_counter(), "pending": 0.0}
+    
+        def tick():
+            now = time.perf_counter()
+            state["pending"] = min(state["pending"] + now - state["last"], max_steps * dt)
+            state["last"] = now
+            while state["pending"] >= dt:
+                self.step(dt)
+                state["pending"] -= dt
+            self.draw(canvas)
+            screen.ontimer(tick, int(dt * 1000))
+    
+        self.draw(canvas)
+        screen.ontimer(tick, int(dt * 1000))
+
 # 添加太陽
-def draw_sun(t):
+def draw_sun(t, width=800):
     t.penup()
-    t.goto(300, 200)
+    t.goto(width / 2 - 100, 200)
     t.pendown()
     t.pencolor("#FFD700")
     t.fillcolor("#FFD700")
@@ -179,36 +382,164 @@ def draw_sun(t):
     t.end_fill()
 
 # 添加簽名
-def add_signature(t):
+def add_signature(t, width=800):
     t.penup()
-    t.goto(-380, -280)
+    t.goto(-width / 2 + 20, -280)
     t.pendown()
     t.pencolor("black")
     t.write("隨機櫻花樹生成器 - 點擊視窗關閉", font=("Arial", 12, "normal"))
 
+# 森林的樹: (種子, x, 大小) 的列表, 只由主種子決定; 遠 (小) 的樹在前, 先畫
+def forest_layout(master_seed, count, width):
+    rng = random.Random(master_seed)
+    trees = []
+    for _ in range(count):
+        size = rng.uniform(0.4, 1.0)
+        x = rng.uniform(-width / 2 + 60, width / 2 - 60)
+        trees.append((rng.getrandbits(32), x, size))
+    return sorted(trees, key=lambda tree: tree[2])
+
+# 生成森林中的一棵樹 (在工作行程中執行): 以自己的種子生成, 縮放到大小後移到位置
+# 近的樹根部在地面較低處; 回傳 float32 陣列, 傳回主行程的資料量減半
+def generate_forest_tree(tree, tree_options):
+    seed, x, size = tree
+    # 細節層級以縮放後的像素計算
+    options = dict(tree_options, pixel_size=tree_options.get("pixel_size", 1.0) / size)
+    segments, blossoms = generate_cherry_tree(start=(0, 0), rng=random.Random(seed), **options)
+    base_y = -200 - (size - 0.4) / 0.6 * 40
+    segments[:, :5] *= size
+    segments[:, [0, 2]] += x
+    segments[:, [1, 3]] += base_y
+    blossoms[:, [0, 1, 3, 5]] *= size
+    blossoms[:, 0] += x
+    blossoms[:, 1] += base_y
+    return segments.astype(np.float32), blossoms.astype(np.float32)
+
+# 森林依樹的大小分成的遠近層數; 同一層的樹一起批次繪製, 較近的層蓋住較遠的層
+FOREST_BANDS = 4
+
+# 平行生成整個森林, 依佈局順序 (遠到近) 合併成一組 (segments, blossoms)
+# 繪製層改為 遠近層 * 層距 + 樹內的繪製層, 整個森林一次依層批次繪製
+# 每棵樹只依自己的種子生成, 結果與工作行程數無關; workers=1 時不建立行程池
+def generate_forest(trees, tree_options=None, workers=None):
+    tree_options = tree_options or {}
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(trees) == 1:
+        results = [generate_forest_tree(tree, tree_options) for tree in trees]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+            chunksize = max(1, len(trees) // (4 * workers))
+            results = list(pool.map(generate_forest_tree, trees, itertools.repeat(tree_options),
+                                    chunksize=chunksize))
+    
+    stride = 1 + max(max(segments[:, 5].max(initial=0), blossoms[:, 6].max(initial=0))
+                     for segments, blossoms in results)
+    for (_, _, size), (segments, blossoms) in zip(trees, results):
+        band = min(int((size - 0.4) / 0.6 * FOREST_BANDS), FOREST_BANDS - 1)
+        segments[:, 5] += band * stride
+        blossoms[:, 6] += band * stride
+    return (np.concatenate([segments for segments, _ in results]),
+            np.concatenate([blossoms for _, blossoms in results]))
+
+# 繪製整個場景: 地面, 太陽, 櫻花樹 (或已生成的森林) 與落櫻
+# 森林由遠到近逐層繪製, 近的樹蓋住遠的樹; 每層內依筆寬與顏色批次繪製
+def draw_scene(t, new_turtle=turtle.Turtle, petal_count=30, tree_options=None, width=800, forest=None):
+    draw_ground(t, width)
+    draw_sun(t, width)
+    if forest is None:
+        draw_cherry_tree(t, **(tree_options or {}))
+    else:
+        draw_tree_geometry(t, *forest)
+    return add_falling_petals(petal_count, new_turtle, width)
+
+# 無視窗輸出場景 (.svg 或 .png), 回傳寫出的路徑
+# forest 為 (樹數, 工作行程數) 時輸出寬度 width 的森林
+def export_scene(path, seed=None, scale=1.0, tree_options=None, width=800, forest=None):
+    if seed is not None:
+        random.seed(seed)
+    scene = Scene(width=width)
+    # 細節層級以輸出的像素計算
+    tree_options = dict(tree_options or {}, pixel_size=1.0 / scale)
+    trees = None
+    if forest:
+        count, workers = forest
+        trees = generate_forest(forest_layout(seed, count, width), tree_options, workers)
+    draw_scene(scene.new_turtle(), scene.new_turtle, 30 * width // 800, tree_options, width, trees)
+    save_scene(scene, path, scale)
+    return path
+
+# 批次輸出的檔名: 路徑中的 {seed} 換成種子, 沒有時加在副檔名前
+def output_path(path, seed, count):
+    if "{seed}" in path:
+        return path.format(seed=seed)
+    if count == 1:
+        return path
+    stem, dot, extension = path.rpartition(".")
+    return f"{stem}_{seed}.{extension}" if dot else f"{path}_{seed}"
+
 # 主函數
 def main():
+    parser = argparse.ArgumentParser(description="隨機櫻花樹")
+    parser.add_argument("--seed", type=int, help="隨機種子, 同一種子畫出同一個場景")
+    parser.add_argument("-o", "--output", help="不開視窗, 把場景寫成 SVG 或 PNG (依副檔名)")
+    parser.add_argument("--count", type=int, default=1, help="批次輸出的場景數, 種子依次加一")
+    parser.add_argument("--scale", type=float, default=1.0, help="PNG 的縮放倍數")
+    parser.add_argument("--depth", type=int, default=10, help="樹枝的最大深度")
+    parser.add_argument("--min-length", type=float, default=5, help="短於此長度的樹枝不再畫")
+    parser.add_argument("--lod", type=float, default=1.0, help="畫出來短於這麼多像素的子樹合併成一朵花")
+    parser.add_argument("--max-segments", type=int, default=4096, help="每棵樹最多的樹枝段數加花朵數")
+    parser.add_argument("--instance-length", type=float, default=0,
+                        help="短於此長度的子樹從快取的模板蓋印 (0 表示不用模板)")
+    parser.add_argument("--petals", type=int, default=300, help="視窗中落櫻動畫的花瓣數")
+    parser.add_argument("--fps", type=int, default=60, help="落櫻動畫每秒的步數")
+    parser.add_argument("--forest", type=int, default=0, metavar="N", help="畫 N 棵樹的森林, 平行生成")
+    parser.add_argument("--width", type=int, help="畫布寬度 (預設 800, 森林 2400)")
+    parser.add_argument("--workers", type=int, help="生成森林的行程數 (預設為 CPU 核心數)")
+    args = parser.parse_args()
+    tree_options = {"max_depth": args.depth, "min_length": args.min_length, "lod_pixels": args.lod,
+                    "max_segments": args.max_segments, "instance_length": args.instance_length}
+    width = args.width or (2400 if args.forest else 800)
+    forest = (args.forest, args.workers) if args.forest else None
+    
+    if args.output:
+        first_seed = args.seed if args.seed is not None else random.randrange(2**31)
+        for seed in range(first_seed, first_seed + args.count):
+            start = time.perf_counter()
+            path = export_scene(output_path(args.output, seed, args.count), seed, args.scale, tree_options,
+                                width, forest)
+            print(f"{path} (種子 {seed}, {(time.perf_counter() - start) * 1000:.0f} ms)")
+        return
+    
+    seed = args.seed if args.seed is not None else random.randrange(2**31)
+    random.seed(seed)
+    
+    # 森林在開視窗前先平行生成
+    trees = None
+    if forest:
+        start = time.perf_counter()
+        trees = generate_forest(forest_layout(seed, args.forest, width), tree_options, args.workers)
+        print(f"森林 {args.forest} 棵樹 (種子 {seed}): {len(trees[0])} 段樹枝, {len(trees[1])} 朵花, "
+              f"{(time.perf_counter() - start) * 1000:.0f} ms")
+    
     try:
         # 初始化
-        window = setup_window()
+        window = setup_window(width)
         t = setup_turtle()
         
-        # 繪製場景
-        draw_ground(t)
-        draw_sun(t)
-        
-        # 繪製櫻花樹
-        draw_cherry_tree(t)
-        
-        # 添加落櫻
-        petals = add_falling_petals(30)
+        # 繪製場景 (落櫻另外以動畫呈現)
+        draw_scene(t, petal_count=0, tree_options=tree_options, width=width, forest=trees)
         
         # 添加簽名
-        add_signature(t)
+        add_signature(t, width)
         
         # 完成繪製，隱藏烏龜
         t.hideturtle()
         
+        # 落櫻動畫
+        petals = FallingPetals(args.petals * width // 800, left=-width / 2, right=width / 2,
+                               seed=random.getrandbits(32))
+        petals.animate(window, args.fps)
+        
         # 等待點擊
         turtle.exitonclick()
         
@@ -0,0 +1,130 @@
+# Idle mode: while nobody is at the piano, run hand inference only on motion or at a low rate
+import cv2
+import numpy as np
+
+from event_log import print_event
+
+# Inference to run on a frame
+INFER_FULL = "full"
+INFER_LOW = "low"
+
+
+class IdleGate:
+    """Decides per frame whether, and at which resolution, hand inference runs
+
+    Active: every frame at full resolution. After idle_after seconds without a hand the
+    gate goes idle: frames are only checked for motion by differencing tiny grayscale
+    copies, and a low-resolution inference runs idle_rate times per second to catch a
+    hand that holds still. Motion, or a hand found at low resolution, makes the gate
+    active again on that same frame.
+    """
+
+    def __init__(self, idle_after=3.0, idle_rate=3.0, motion_threshold=12, motion_fraction=0.002,
+                 motion_size=(80, 60), low_res_scale=0.5, log=None):
+        self.log = log or print_event
+        self.idle_after = idle_after
+        self.idle_interval = 1.0 / idle_rate
+        # A pixel moved if its gray level changed by more than motion_threshold;
+        # the frame moved if more than motion_fraction of its pixels did
+        self.motion_threshold = motion_threshold
+        self.motion_pixels = max(1, int(motion_fraction * motion_size[0] * motion_size[1]))
+        self.motion_size = motion_size
+        self.low_res_scale = low_res_scale
+
+        self.idle = False
+        self.last_hand_time = None
+        self.last_idle_inference = None
+
+        # Motion detection buffers, previous and current gray frame alternate
+        width, height = motion_size
+        self.small = np.empty((height, width, 3), np.uint8)
+        self.gray = [np.empty((height, width), np.uint8) for _ in range(2)]
+        self.diff = np.empty((height, width), np.uint8)
+        self.current = 0
+        self.have_previous = False
+        self.low_res = None
+
+        # Wake-up in progress: (capture timestamp, reason)
+        self.waking = None
+        self.wake_latencies = []
+        self.frames = 0
+        self.idle_frames = 0
+        self.skipped_frames = 0
+
+    def check(self, frame, timestamp):
+        """Return INFER_FULL, INFER_LOW or None (no inference) for this BGR frame"""
+        self.frames += 1
+        if self.last_hand_time is None:
+            self.last_hand_time = timestamp
+        if not self.idle:
+            return INFER_FULL
+
+        self.idle_frames += 1
+        if self.moved(frame):
+            self.wake(timestamp, "motion")
+            return INFER_FULL
+        if timestamp - self.last_idle_inference >= self.idle_interval:
+            self.last_idle_inference = timestamp
+            return INFER_LOW
+        self.skipped_frames += 1
+        return None
+
+    def moved(self, frame):
+        """Frame differencing on a downscaled grayscale copy"""
+        current, previous = self.gray[self.current], self.gray[1 - self.current]
+        cv2.resize(frame, self.motion_size, dst=self.small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self.small, cv2.COLOR_BGR2GRAY, dst=current)
+        self.current = 1 - self.current
+        if not self.have_previous:
+            self.have_previous = True
+            return False
+        cv2.absdiff(current, previous, dst=self.diff)
+        cv2.threshold(self.diff, self.motion_threshold, 255, cv2.THRESH_BINARY, dst=self.diff)
+        return cv2.countNonZero(self.diff) >= self.motion_pixels
+
+    def downscale(self, image):
+        """Low-resolution copy of the RGB inference image, in a reused buffer"""
+        height, width = image.shape[:2]
+        size = (int(width * self.low_res_scale), int(height * self.low_res_scale))
+        if self.low_res is None or self.low_res.shape[1::-1] != size:
+            self.low_res = np.empty((size[1], size[0], 3), np.uint8)
+        return cv2.resize(image, size, dst=self.low_res, interpolation=cv2.INTER_AREA)
+
+    def wake(self, timestamp, reason):
+        # Full-rate tracking for at least another idle_after seconds
+        self.idle = False
+        self.last_hand_time = timestamp
+        self.waking = (timestamp, reason)
+
+    def update(self, num_hands, timestamp, now):
+        """Feed the hand count of this frame; now is the time its landmarks became available"""
+        if num_hands:
+            self.last_hand_time = timestamp
+            if self.idle:
+                self.wake(timestamp, "hand")
+        elif not self.idle and timestamp - self.last_hand_time > self.idle_after:
+            self.idle = True
+            self.have_previous = False
+            self.last_idle_inference = timestamp
+            self.log("idle", "Idle: no hands for {seconds:g} s, hand tracking throttled", seconds=self.idle_after,
+                     event="idle")
+
+        if self.waking is not None:
+            capture_time, reason = self.waking
+            self.waking = None
+            latency = now - capture_time
+            self.wake_latencies.append(latency)
+            self.log("idle", "Idle: woke on {reason}, {latency_ms:.1f} ms from capture to full-rate tracking",
+                     reason=reason, latency_ms=latency * 1000, event="wake")
+
+    def report(self):
+        """Log how much of the run was idle and the wake-up latencies"""
+        if not self.frames:
+            return
+        self.log("report", "Idle: {idle:.0%} of {frames} frames idle, inference skipped on {skipped}",
+                 idle=self.idle_frames / self.frames, frames=self.frames, skipped=self.skipped_frames)
+        if self.wake_latencies:
+            latencies = np.array(self.wake_latencies) * 1000
+            self.log("report", "Idle: {wakeups} wake-ups, capture to tracking median {median_ms:.1f} ms, "
+                     "max {max_ms:.1f} ms", wakeups=len(latencies), median_ms=float(np.median(latencies)),
+                     max_ms=float(latencies.max()))
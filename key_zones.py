@@ -0,0 +1,138 @@
+# Key-zone layouts: notes as screen regions, resolved through a precomputed lookup raster
+import json
+import threading
+
+import cv2
+import numpy as np
+
+from event_log import print_event
+
+NOTE_LETTERS = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
+# Semitones of the white keys in an octave, and the white keys (C, D, F, G, A) followed by a black key
+WHITE_SEMITONES = [0, 2, 4, 5, 7, 9, 11]
+BLACK_AFTER_WHITE = {0, 1, 3, 4, 5}
+BLACK_KEY_WIDTH = 0.6
+BLACK_KEY_HEIGHT = 0.6
+
+DEFAULT_RESOLUTION = (512, 256)
+ZONE_COLOR = (255, 255, 255)
+BLACK_ZONE_COLOR = (0, 200, 255)
+
+
+def note_number(name):
+    """MIDI note number of a name like "C4" or "F#3" """
+    letter = name[:2] if len(name) > 2 and name[1] == "#" else name[:1]
+    return NOTE_LETTERS.index(letter.upper()) + 12 * (int(name[len(letter):]) + 1)
+
+
+def note_name(number):
+    """Name of a MIDI note number, e.g. 61 -> "C#4" """
+    return f"{NOTE_LETTERS[number % 12]}{number // 12 - 1}"
+
+
+def keyboard_zones(start="C4", octaves=2, rect=(0.0, 0.65, 1.0, 0.35), black_keys=True):
+    """Zones of a keyboard strip in rect (x, y, width, height), white keys first"""
+    x, y, width, height = rect
+    first = note_number(start)
+    # Start on the white key at or below the start note
+    while first % 12 not in WHITE_SEMITONES:
+        first -= 1
+    whites = 7 * octaves
+    key_width = width / whites
+    octave_start = first - first % 12
+    white_index = WHITE_SEMITONES.index(first % 12)
+
+    zones = []
+    blacks = []
+    for i in range(whites):
+        octave, index = divmod(white_index + i, 7)
+        number = octave_start + 12 * octave + WHITE_SEMITONES[index]
+        zones.append({"note": note_name(number), "rect": [x + i * key_width, y, key_width, height]})
+        # Black key straddling the boundary to the next white key
+        if black_keys and index in BLACK_AFTER_WHITE and i + 1 < whites:
+            black_width = key_width * BLACK_KEY_WIDTH
+            blacks.append({"note": note_name(number + 1), "black": True,
+                           "rect": [x + (i + 1) * key_width - black_width / 2, y, black_width,
+                                    height * BLACK_KEY_HEIGHT]})
+    # Black keys are rasterized last, on top of the white keys
+    return zones + blacks
+
+
+class KeyLayout:
+    """A loaded layout: its zones and the raster mapping grid cells to zone index + 1"""
+
+    def __init__(self, name, zones, resolution=DEFAULT_RESOLUTION):
+        self.name = name
+        self.zones = zones
+        self.notes = [zone["note"] for zone in zones]
+        columns, rows = resolution
+        # Later zones paint over earlier ones where they overlap
+        self.raster = np.zeros((rows, columns), np.uint16)
+        for index, zone in enumerate(zones):
+            x, y, width, height = zone["rect"]
+            left, right = int(round(x * columns)), int(round((x + width) * columns))
+            top, bottom = int(round(y * rows)), int(round((y + height) * rows))
+            self.raster[max(top, 0):bottom, max(left, 0):right] = index + 1
+
+    def lookup(self, x, y):
+        """Note at normalized screen position (x, y), or None outside every zone"""
+        rows, columns = self.raster.shape
+        column, row = int(x * columns), int(y * rows)
+        if not (0 <= column < columns and 0 <= row < rows):
+            return None
+        index = self.raster[row, column]
+        return self.notes[index - 1] if index else None
+
+    def draw(self, img):
+        """Outline every zone and label it with its note"""
+        imgHeight, imgWidth = img.shape[:2]
+        for zone in self.zones:
+            x, y, width, height = zone["rect"]
+            black = zone.get("black", False)
+            top_left = (int(x * imgWidth), int(y * imgHeight))
+            bottom_right = (int((x + width) * imgWidth), int((y + height) * imgHeight))
+            color = BLACK_ZONE_COLOR if black else ZONE_COLOR
+            cv2.rectangle(img, top_left, bottom_right, color, 1)
+            label_y = bottom_right[1] - 8 if not black else top_left[1] + 16
+            cv2.putText(img, zone["note"], (top_left[0] + 3, label_y), cv2.FONT_HERSHEY_SIMPLEX, 0.4, color, 1)
+
+
+def load_layout(path):
+    """Read a layout file: explicit "zones" and generated "keyboards" strips"""
+    with open(path, encoding="utf-8") as f:
+        spec = json.load(f)
+    zones = []
+    for keyboard in spec.get("keyboards", []):
+        zones.extend(keyboard_zones(keyboard.get("start", "C4"), keyboard.get("octaves", 2),
+                                    keyboard.get("rect", (0.0, 0.65, 1.0, 0.35)),
+                                    keyboard.get("black_keys", True)))
+    zones.extend(spec.get("zones", []))
+    if not zones:
+        raise ValueError(f"{path} defines no zones")
+    return KeyLayout(spec.get("name", path), zones, tuple(spec.get("resolution", DEFAULT_RESOLUTION)))
+
+
+class KeyZones:
+    """The active layout, swapped for a new one once it has been built on a background thread"""
+
+    def __init__(self, path, log=None):
+        self.log = log or print_event
+        self.path = path
+        self.layout = load_layout(path)
+        self.log("startup", "Layout '{name}': {keys} keys", name=self.layout.name, keys=len(self.layout.zones))
+
+    def reload(self, path=None):
+        """Load path (default: the current file again) in the background; the old layout stays until done"""
+        path = path or self.path
+        threading.Thread(target=self._build, args=(path,), name="layout", daemon=True).start()
+
+    def _build(self, path):
+        try:
+            layout = load_layout(path)
+        except (OSError, ValueError, KeyError, IndexError, TypeError) as error:
+            self.log("control", "Layout {path} not loaded: {error}", path=path, error=str(error))
+            return
+        # One reference assignment, so detection sees the old or the new layout, never a mix
+        self.path = path
+        self.layout = layout
+        self.log("control", "Layout '{name}': {keys} keys", name=layout.name, keys=len(layout.zones))
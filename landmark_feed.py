@@ -0,0 +1,241 @@
+# Shared-memory landmark feed: hand.py publishes every frame, local tools read it
+# without running MediaPipe again
+import collections
+import struct
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+DEFAULT_FEED_NAME = "hand_landmarks"
+FEED_MAGIC = b"HLMF"
+FEED_VERSION = 1
+NUM_LANDMARKS = 21
+
+# Handedness is stored as a small code per hand, -1 = unknown
+HANDEDNESS_CODES = {"Left": 0, "Right": 1}
+HANDEDNESS_LABELS = {0: "Left", 1: "Right"}
+
+# Header: magic, version, slot count, max hands, latest published sequence number
+HEADER = struct.Struct("<4sIIIQ")
+HEADER_SIZE = 64
+LATEST_SEQ_OFFSET = 16
+# Wall time the writer last showed it is alive, a float64 after the header fields
+HEARTBEAT_OFFSET = 24
+# A block whose writer has not beaten for this many seconds is left over from a dead run
+FEED_STALE_AFTER = 5.0
+
+LandmarkFrame = collections.namedtuple("LandmarkFrame", ["seq", "timestamp", "handedness", "landmarks"])
+
+
+def slot_dtype(max_hands):
+    """Fixed layout of one ring slot, framed by the sequence number on both ends"""
+    return np.dtype([
+        ("seq_begin", "<u8"),
+        ("timestamp", "<f8"),
+        ("num_hands", "<u4"),
+        ("handedness", "i1", (max_hands,)),
+        ("landmarks", "<f4", (max_hands, NUM_LANDMARKS, 3)),
+        ("seq_end", "<u8"),
+    ], align=True)
+
+
+class _RingView:
+    """Numpy views of the header and ring slots inside a shared-memory block"""
+
+    def _map(self, shm, slots, max_hands):
+        self.shm = shm
+        self.slots = slots
+        self.max_hands = max_hands
+        ring = np.ndarray((slots,), slot_dtype(max_hands), buffer=shm.buf, offset=HEADER_SIZE)
+        self.latest = np.ndarray((1,), "<u8", buffer=shm.buf, offset=LATEST_SEQ_OFFSET)
+        self.seq_begin = ring["seq_begin"]
+        self.timestamps = ring["timestamp"]
+        self.num_hands = ring["num_hands"]
+        self.handedness = ring["handedness"]
+        self.landmarks = ring["landmarks"]
+        self.seq_end = ring["seq_end"]
+
+    def close(self):
+        # Views into the buffer have to go before the mapping can be closed
+        self.latest = self.seq_begin = self.timestamps = self.num_hands = None
+        self.handedness = self.landmarks = self.seq_end = None
+        self.shm.close()
+
+
+class LandmarkFeedWriter(_RingView):
+    """Publishes per-frame landmarks into a shared-memory ring (single writer)"""
+
+    def __init__(self, name=DEFAULT_FEED_NAME, slots=64, max_hands=2):
+        size = HEADER_SIZE + slots * slot_dtype(max_hands).itemsize
+        try:
+            shm = shared_memory.SharedMemory(name, create=True, size=size)
+        except FileExistsError:
+            existing = _attach(name)
+            live = _writer_alive(existing)
+            existing.close()
+            if live:
+                raise FileExistsError(f"Landmark feed '{name}' is being written by another running instance, "
+                                      f"publish under a different name") from None
+            # Left behind by a previous run that did not shut down cleanly
+            stale = shared_memory.SharedMemory(name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name, create=True, size=size)
+
+        HEADER.pack_into(shm.buf, 0, FEED_MAGIC, FEED_VERSION, slots, max_hands, 0)
+        self._map(shm, slots, max_hands)
+        self.heartbeat_time = np.ndarray((1,), "<f8", buffer=shm.buf, offset=HEARTBEAT_OFFSET)
+        self.seq_begin[:] = 0
+        self.seq_end[:] = 0
+        self.seq = 0
+        self.heartbeat()
+
+    def heartbeat(self):
+        """Mark the feed as live; called every frame, also when no landmarks are published"""
+        self.heartbeat_time[0] = time.time()
+
+    def publish(self, landmarks, handedness, num_hands, timestamp):
+        """Copy one frame into the next slot; landmarks is (max_hands, 21, 3), handedness holds codes"""
+        seq = self.seq + 1
+        slot = seq % self.slots
+        num_hands = min(num_hands, self.max_hands)
+
+        # Readers treat a slot whose seq_begin and seq_end differ as torn
+        self.seq_begin[slot] = seq
+        self.timestamps[slot] = timestamp
+        self.num_hands[slot] = num_hands
+        self.handedness[slot, :num_hands] = handedness[:num_hands]
+        self.landmarks[slot, :num_hands] = landmarks[:num_hands]
+        self.seq_end[slot] = seq
+
+        self.latest[0] = seq
+        self.seq = seq
+        self.heartbeat_time[0] = time.time()
+
+    def close(self):
+        shm = self.shm
+        self.heartbeat_time = None
+        super().close()
+        shm.unlink()
+
+
+class LandmarkFeedReader(_RingView):
+    """Reads frames published by LandmarkFeedWriter, detecting torn and dropped frames"""
+
+    def __init__(self, name=DEFAULT_FEED_NAME):
+        shm = _attach(name)
+        magic, version, slots, max_hands, _ = HEADER.unpack_from(shm.buf, 0)
+        if magic != FEED_MAGIC or version != FEED_VERSION:
+            shm.close()
+            raise ValueError(f"'{name}' is not a version {FEED_VERSION} landmark feed")
+        self._map(shm, slots, max_hands)
+
+        # Start from the newest frame instead of replaying the whole ring
+        self.last_seq = int(self.latest[0])
+        self.torn_reads = 0
+        self.dropped_frames = 0
+
+    def latest_seq(self):
+        return int(self.latest[0])
+
+    def read(self, seq):
+        """Return the frame with this sequence number, or None if it is missing, overwritten or torn"""
+        slot = seq % self.slots
+        if self.seq_end[slot] != seq:
+            return None
+
+        num_hands = min(int(self.num_hands[slot]), self.max_hands)
+        timestamp = float(self.timestamps[slot])
+        codes = self.handedness[slot, :num_hands].tolist()
+        landmarks = self.landmarks[slot, :num_hands].copy()
+
+        # The writer bumps seq_begin first, so a change here means the copy overlapped a write
+        if self.seq_begin[slot] != seq:
+            self.torn_reads += 1
+            return None
+
+        handedness = [HANDEDNESS_LABELS.get(code, "Unknown") for code in codes]
+        return LandmarkFrame(seq, timestamp, handedness, landmarks)
+
+    def read_latest(self, retries=3):
+        """Return the newest complete frame, or None if nothing has been published"""
+        for _ in range(retries):
+            seq = self.latest_seq()
+            if seq == 0:
+                return None
+            frame = self.read(seq)
+            if frame is not None:
+                self.last_seq = max(self.last_seq, seq)
+                return frame
+        return None
+
+    def poll(self):
+        """Return all frames published since the last poll, oldest first"""
+        latest = self.latest_seq()
+        if latest <= self.last_seq:
+            return []
+
+        # Frames older than one ring length have already been overwritten
+        first = max(self.last_seq + 1, latest - self.slots + 1)
+        self.dropped_frames += first - (self.last_seq + 1)
+        self.last_seq = latest
+
+        frames = []
+        for seq in range(first, latest + 1):
+            frame = self.read(seq)
+            if frame is not None:
+                frames.append(frame)
+        return frames
+
+    def wait(self, timeout=None, interval=0.0005):
+        """Block until new frames arrive (or the timeout passes) and return them"""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            frames = self.poll()
+            if frames or (deadline is not None and time.perf_counter() >= deadline):
+                return frames
+            time.sleep(interval)
+
+
+def _attach(name):
+    """Open an existing block without letting this process's resource tracker unlink it"""
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        # Python < 3.13 has no track argument
+        shm = shared_memory.SharedMemory(name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def _writer_alive(shm):
+    """Whether a feed block's writer has beaten within FEED_STALE_AFTER seconds"""
+    if shm.size < HEADER_SIZE or bytes(shm.buf[:4]) != FEED_MAGIC:
+        return False
+    heartbeat = struct.unpack_from("<d", shm.buf, HEARTBEAT_OFFSET)[0]
+    return abs(time.time() - heartbeat) < FEED_STALE_AFTER
+
+
+def main():
+    # Minimal consumer: print the wrist position of every hand in every frame
+    name = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_FEED_NAME
+    reader = LandmarkFeedReader(name)
+    print(f"Reading landmark feed '{name}' ({reader.slots} slots, {reader.max_hands} hands)")
+    try:
+        while True:
+            for frame in reader.wait(timeout=1.0):
+                age_ms = (time.perf_counter() - frame.timestamp) * 1000
+                hands = ", ".join(f"{label} wrist ({lms[0, 0]:.2f}, {lms[0, 1]:.2f})"
+                                  for label, lms in zip(frame.handedness, frame.landmarks))
+                print(f"#{frame.seq} +{age_ms:.1f} ms: {hands or 'no hands'}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Torn reads: {reader.torn_reads}, dropped frames: {reader.dropped_frames}")
+        reader.close()
+
+
+if __name__ == "__main__":
+    main()
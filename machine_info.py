@@ -0,0 +1,20 @@
+# Description of the machine a benchmark or soak test ran on, stored with its results
+import os
+import platform
+import socket
+
+import cv2
+import numpy as np
+
+
+def machine_info():
+    """Metadata stored with every baseline, since timings only compare on the same machine"""
+    return {
+        "hostname": socket.gethostname(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+    }
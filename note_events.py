@@ -0,0 +1,56 @@
+# Grouping of near-simultaneous finger presses into chord events
+import collections
+
+# One output event: the presses that belong together and their shared timestamp
+Chord = collections.namedtuple("Chord", ["timestamp", "notes"])
+
+
+class ChordGrouper:
+    """Collects presses that land within `window` seconds of each other into one chord
+
+    flush() is called once per frame. A chord is released as soon as the next
+    frame would land after the end of its window, so window=0 only groups presses
+    of the same frame, and a window of about one frame interval also picks up
+    presses from the following frame.
+    """
+
+    def __init__(self, window=0.0):
+        self.window = window
+        self.pending = []
+        self.chord_start = None
+        self.ready = []
+        # Smoothed frame interval, used to predict when the next frame arrives
+        self.frame_interval = 0.0
+        self.last_flush = None
+
+    def add(self, key, name, timestamp):
+        """Queue one press; key is the hand-finger key, name the note name"""
+        if self.chord_start is not None and timestamp > self.chord_start + self.window:
+            # Frame arrived later than predicted, close the old chord first
+            self.ready.append(Chord(self.chord_start, self.pending))
+            self.pending = []
+            self.chord_start = None
+        if self.chord_start is None:
+            self.chord_start = timestamp
+        self.pending.append((key, name))
+
+    def flush(self, now):
+        """Return the chords that are complete at frame time `now`"""
+        if self.last_flush is not None and now > self.last_flush:
+            interval = now - self.last_flush
+            if self.frame_interval:
+                self.frame_interval = self.frame_interval * 0.9 + interval * 0.1
+            else:
+                self.frame_interval = interval
+        self.last_flush = now
+
+        # A next frame landing exactly at the window's end still belongs to the chord
+        if self.pending and (not self.window or now + self.frame_interval > self.chord_start + self.window):
+            self.ready.append(Chord(self.chord_start, self.pending))
+            self.pending = []
+            self.chord_start = None
+
+        if not self.ready:
+            return ()
+        chords, self.ready = self.ready, []
+        return chords
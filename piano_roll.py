@@ -0,0 +1,100 @@
+# Piano roll: a strip scrolling the notes of the last few seconds across the bottom of the view
+import colorsys
+
+import cv2
+import numpy as np
+
+BACKGROUND_COLOR = (40, 40, 40)
+GRID_COLOR = (70, 70, 70)
+ONSET_COLOR = (255, 255, 255)
+LABEL_COLOR = (220, 220, 220)
+LABEL_WIDTH = 64
+
+
+class PianoRoll:
+    """Note history with one row per key, the newest notes at the right edge
+
+    The strip image is kept between frames and moved left by the pixels that have
+    elapsed since the previous update; only the uncovered columns are drawn, with the
+    bars of the keys held right now. A frame costs the same however many notes are on
+    screen.
+    """
+
+    def __init__(self, keys, names, width, seconds=4.0, row_height=14):
+        # Lowest note at the bottom
+        self.rows = {key: len(keys) - 1 - i for i, key in enumerate(keys)}
+        self.row_height = row_height
+        height = len(keys) * row_height
+        strip_width = max(1, width - LABEL_WIDTH)
+        self.pixels_per_second = strip_width / seconds
+        self.size = (width, height)
+
+        # One color per key, around the hue circle
+        self.colors = np.zeros((len(keys), 3), np.uint8)
+        for key, row in self.rows.items():
+            r, g, b = colorsys.hsv_to_rgb(row / len(keys), 0.7, 1.0)
+            self.colors[row] = (int(b * 255), int(g * 255), int(r * 255))
+
+        # Empty column with the row separators, copied into every uncovered column
+        self.column = np.empty((height, 1, 3), np.uint8)
+        self.column[:] = BACKGROUND_COLOR
+        self.column[::row_height] = GRID_COLOR
+
+        # Scrolling moves the strip between two buffers instead of allocating
+        self.strips = [np.empty((height, strip_width, 3), np.uint8) for _ in range(2)]
+        self.strip = self.strips[0]
+        self.strip[:] = self.column
+
+        # Key names, drawn once
+        self.labels = np.empty((height, LABEL_WIDTH, 3), np.uint8)
+        self.labels[:] = BACKGROUND_COLOR
+        for key, row in self.rows.items():
+            cv2.putText(self.labels, names[key].split()[0], (4, (row + 1) * row_height - 3),
+                        cv2.FONT_HERSHEY_SIMPLEX, row_height / 35, LABEL_COLOR, 1)
+
+        self.last_time = None
+        self.carry = 0.0
+        # Onsets of updates too short to uncover a column, drawn with the next one
+        self.pending_onsets = set()
+
+    def update(self, now, held, onsets=()):
+        """Scroll to time now; held and onsets are the keys sounding and starting since the last update"""
+        if self.last_time is None:
+            self.last_time = now
+            self.pending_onsets.update(onsets)
+            return
+        travel = (now - self.last_time) * self.pixels_per_second + self.carry
+        self.last_time = now
+        shift = int(travel)
+        self.carry = travel - shift
+        if not shift:
+            self.pending_onsets.update(onsets)
+            return
+
+        # Move the old columns left and clear the new ones
+        strip_width = self.strip.shape[1]
+        shift = min(shift, strip_width)
+        scrolled = self.strips[1] if self.strip is self.strips[0] else self.strips[0]
+        np.copyto(scrolled[:, :strip_width - shift], self.strip[:, shift:])
+        new_columns = scrolled[:, strip_width - shift:]
+        np.copyto(new_columns, self.column)
+
+        # Bars of the keys sounding now, with a bright start for new notes
+        row_height = self.row_height
+        for key in held:
+            row = self.rows.get(key)
+            if row is not None:
+                new_columns[row * row_height + 2:(row + 1) * row_height - 1] = self.colors[row]
+        for key in self.pending_onsets.union(onsets):
+            row = self.rows.get(key)
+            if row is not None:
+                new_columns[row * row_height + 2:(row + 1) * row_height - 1, :2] = ONSET_COLOR
+        self.pending_onsets.clear()
+        self.strip = scrolled
+
+    def draw(self, img):
+        """Copy the roll into the bottom of img"""
+        width, height = self.size
+        top = img.shape[0] - height
+        img[top:, :LABEL_WIDTH] = self.labels
+        img[top:, LABEL_WIDTH:width] = self.strip
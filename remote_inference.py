@@ -0,0 +1,324 @@
+# Remote inference: thin clients stream downsized frames, a server runs MediaPipe and
+# answers with compact landmark packets
+import argparse
+import collections
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from control_server import remove_stale_socket
+
+DEFAULT_INFERENCE_ADDRESS = "hand_inference.sock"
+PROTOCOL_MAGIC = b"HRIF"
+PROTOCOL_VERSION = 1
+NUM_LANDMARKS = 21
+
+# Frame encodings
+ENCODINGS = {"raw": 0, "jpeg": 1}
+
+# Client hello: magic, version, max hands
+HELLO = struct.Struct("<4sII")
+# Frame request: sequence number, capture timestamp, encoding, width, height, payload size
+REQUEST = struct.Struct("<IdBHHI")
+# Reply: sequence number, capture timestamp, server inference time, hand count; followed by
+# one handedness code (int8) per hand and the landmarks as float16 (hands, 21, 3)
+REPLY = struct.Struct("<IdfB")
+
+# Largest frame a client may send, checked before its payload is read; hand.py
+# downsizes frames to --remote-width (320 px by default) before sending them
+MAX_FRAME_PIXELS = 1920 * 1080
+# JPEG headers and tables, which outweigh the pixels of very small frames
+JPEG_HEADER_BYTES = 4096
+
+# Round trips kept for the latency report
+ROUND_TRIP_HISTORY = 1000
+
+LandmarkPacket = collections.namedtuple("LandmarkPacket", ["seq", "timestamp", "num_hands", "handedness",
+                                                           "landmarks", "inference_time"])
+
+
+def connect(address, timeout=None):
+    """Socket to a Unix socket path, "host:port", or a localhost port number"""
+    address = str(address)
+    if address.isdigit():
+        sock = socket.create_connection(("127.0.0.1", int(address)), timeout)
+    elif ":" in address:
+        host, port = address.rsplit(":", 1)
+        sock = socket.create_connection((host, int(port)), timeout)
+    else:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect(address)
+    if sock.family != getattr(socket, "AF_UNIX", None):
+        # Small replies must not wait for more data to fill a segment
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.settimeout(None)
+    return sock
+
+
+def read_packet(packet, landmarks, handedness_codes):
+    """Copy a LandmarkPacket into the landmark and handedness arrays, return the hand count"""
+    if packet is None:
+        return 0
+    num_hands = min(packet.num_hands, len(landmarks))
+    landmarks[:num_hands] = packet.landmarks[:num_hands]
+    handedness_codes[:num_hands] = packet.handedness[:num_hands]
+    return num_hands
+
+
+class RemoteHands:
+    """Client side of the inference server, used by hand.py in place of the MediaPipe model
+
+    process() downsizes and encodes a BGR frame, sends it and returns the newest landmarks
+    received. With pipeline=0 it waits for this frame's landmarks. With pipeline=N up to N
+    frames stay in flight, so capture and encoding of the next frame overlap the round
+    trip of this one, at the cost of returning older hands; that only pays off when the
+    round trip is longer than a frame interval. Replies are read on a receiver thread, so
+    round trips are timed when they arrive.
+    """
+
+    def __init__(self, address, max_hands=2, encoding="jpeg", width=320, quality=80, pipeline=0):
+        self.address = address
+        self.max_hands = max_hands
+        self.encoding = encoding
+        self.width = width
+        self.encode_params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+        self.pipeline = pipeline
+
+        self.sock = connect(address)
+        self.stream = self.sock.makefile("rb")
+        self.sock.sendall(HELLO.pack(PROTOCOL_MAGIC, PROTOCOL_VERSION, max_hands))
+
+        self.small = None
+        self.seq = 0
+        # Send times of the frames in flight, and the newest reply not yet returned
+        self.in_flight = collections.deque()
+        self.packet = None
+        self.error = None
+        self.condition = threading.Condition()
+        # Round trips and frame intervals in a fixed-size ring
+        self.round_trips = np.zeros(ROUND_TRIP_HISTORY)
+        self.frame_intervals = np.zeros(ROUND_TRIP_HISTORY)
+        self.inference_times = np.zeros(ROUND_TRIP_HISTORY)
+        self.replies = 0
+        self.last_timestamp = None
+        self.bytes_sent = 0
+        self.receiver = threading.Thread(target=self.receive_loop, name="remote-inference", daemon=True)
+        self.receiver.start()
+        print(f"Remote inference: connected to {address} ({encoding}, {width} px wide)")
+
+    def encode(self, image, scale=1.0):
+        """Downsize a BGR frame into a reused buffer and encode it; returns (width, height, payload)"""
+        height, width = image.shape[:2]
+        size = (max(1, int(self.width * scale)), max(1, int(height * self.width * scale / width)))
+        if self.small is None or self.small.shape[1::-1] != size:
+            self.small = np.empty((size[1], size[0], 3), np.uint8)
+        cv2.resize(image, size, dst=self.small, interpolation=cv2.INTER_AREA)
+        if self.encoding == "jpeg":
+            ok, payload = cv2.imencode(".jpg", self.small, self.encode_params)
+            return size[0], size[1], payload
+        return size[0], size[1], self.small
+
+    def process(self, image, timestamp, scale=1.0):
+        """Send one BGR frame; returns the newest LandmarkPacket not returned before, or None"""
+        width, height, payload = self.encode(image, scale)
+        payload = memoryview(payload).cast("B")
+        self.seq += 1
+        with self.condition:
+            self.in_flight.append(time.perf_counter())
+        self.sock.sendall(REQUEST.pack(self.seq, timestamp, ENCODINGS[self.encoding], width, height,
+                                       payload.nbytes))
+        self.sock.sendall(payload)
+        self.bytes_sent += REQUEST.size + payload.nbytes
+
+        if self.last_timestamp is not None:
+            self.frame_intervals[self.seq % ROUND_TRIP_HISTORY] = timestamp - self.last_timestamp
+        self.last_timestamp = timestamp
+
+        with self.condition:
+            while len(self.in_flight) > self.pipeline and self.error is None:
+                self.condition.wait()
+            if self.error is not None:
+                raise self.error
+            packet, self.packet = self.packet, None
+        return packet
+
+    def receive_loop(self):
+        """Receiver thread: read replies as they arrive and keep the newest"""
+        try:
+            while True:
+                header = self.stream.read(REPLY.size)
+                if len(header) < REPLY.size:
+                    raise ConnectionError(f"Inference server {self.address} closed the connection")
+                seq, timestamp, inference_time, num_hands = REPLY.unpack(header)
+                body = self.stream.read(num_hands * (1 + NUM_LANDMARKS * 3 * 2))
+                arrival = time.perf_counter()
+                handedness = np.frombuffer(body, np.int8, num_hands)
+                landmarks = np.frombuffer(body, "<f2", offset=num_hands).reshape(num_hands, NUM_LANDMARKS, 3)
+                packet = LandmarkPacket(seq, timestamp, num_hands, handedness, landmarks.astype(np.float32),
+                                        inference_time)
+
+                with self.condition:
+                    index = self.replies % ROUND_TRIP_HISTORY
+                    self.round_trips[index] = arrival - self.in_flight.popleft()
+                    self.inference_times[index] = inference_time
+                    self.replies += 1
+                    self.packet = packet
+                    self.condition.notify()
+        except (ConnectionError, OSError, ValueError) as error:
+            # Raised on the detection thread by the next process(); closing also ends up here
+            with self.condition:
+                self.error = ConnectionError(str(error))
+                self.condition.notify()
+
+    def report(self):
+        """Print round-trip latency against the frame interval"""
+        count = min(self.replies, ROUND_TRIP_HISTORY)
+        if not count:
+            return
+        round_trips = self.round_trips[:count] * 1000
+        inference = self.inference_times[:count] * 1000
+        intervals = self.frame_intervals[:min(self.seq, ROUND_TRIP_HISTORY)]
+        frame_ms = float(np.median(intervals[intervals > 0])) * 1000 if (intervals > 0).any() else 0.0
+        within = float(np.mean(round_trips <= frame_ms)) if frame_ms else 0.0
+        print(f"Remote inference: round trip median {np.median(round_trips):.1f} ms, "
+              f"p95 {np.percentile(round_trips, 95):.1f} ms (server inference {np.median(inference):.1f} ms), "
+              f"{within:.0%} within one frame ({frame_ms:.1f} ms), "
+              f"{self.bytes_sent / max(self.seq, 1) / 1024:.1f} KB per frame")
+
+    def close(self):
+        self.report()
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            # The server has already disconnected
+            pass
+        self.receiver.join()
+        self.stream.close()
+        self.sock.close()
+
+
+class _InferenceHandler(socketserver.StreamRequestHandler):
+    """One client: its own model, so tracking state follows that client's frames"""
+
+    def handle(self):
+        # Imported here, hand.py imports this module
+        from hand import load_hand_model, read_hand_result
+
+        hello = self.rfile.read(HELLO.size)
+        if len(hello) < HELLO.size:
+            return
+        magic, version, max_hands = HELLO.unpack(hello)
+        if magic != PROTOCOL_MAGIC or version != PROTOCOL_VERSION:
+            print(f"Inference server: rejected client with protocol {magic!r} v{version}")
+            return
+        client = self.client_address or "local client"
+        hands = load_hand_model((self.server.warmup_width, self.server.warmup_width * 3 // 4), max_hands,
+                                self.server.model_complexity)
+        print(f"Inference server: {client} connected, {max_hands} hands")
+
+        landmarks = np.zeros((max_hands, NUM_LANDMARKS, 3), np.float32)
+        handedness = np.full(max_hands, -1, np.int8)
+        payload = bytearray()
+        rgb = None
+        frames = 0
+        try:
+            while True:
+                header = self.rfile.read(REQUEST.size)
+                if len(header) < REQUEST.size:
+                    break
+                seq, timestamp, encoding, width, height, size = REQUEST.unpack(header)
+                # The size comes from the client; check it before allocating a buffer for it
+                limit = width * height * 3 + (JPEG_HEADER_BYTES if encoding == ENCODINGS["jpeg"] else 0)
+                if width * height > MAX_FRAME_PIXELS or size > limit:
+                    print(f"Inference server: {client} sent an oversized frame #{seq} "
+                          f"({width}x{height}, {size} bytes, at most {MAX_FRAME_PIXELS} pixels), closing")
+                    break
+                if len(payload) < size:
+                    payload = bytearray(size)
+                view = memoryview(payload)[:size]
+                if self.rfile.readinto(view) < size:
+                    break
+
+                # A malformed frame drops the client, its stream can no longer be trusted
+                start = time.perf_counter()
+                image = None
+                if encoding == ENCODINGS["jpeg"] and size:
+                    image = cv2.imdecode(np.frombuffer(view, np.uint8), cv2.IMREAD_COLOR)
+                elif encoding == ENCODINGS["raw"] and size == width * height * 3 and size:
+                    image = np.frombuffer(view, np.uint8).reshape(height, width, 3)
+                if image is None:
+                    print(f"Inference server: {client} sent an undecodable frame #{seq} "
+                          f"(encoding {encoding}, {width}x{height}, {size} bytes), closing")
+                    break
+                if rgb is None or rgb.shape != image.shape:
+                    rgb = np.empty(image.shape, np.uint8)
+                cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=rgb)
+                num_hands = read_hand_result(hands.process(rgb), landmarks, handedness)
+                inference_time = time.perf_counter() - start
+
+                self.wfile.write(REPLY.pack(seq, timestamp, inference_time, num_hands)
+                                 + handedness[:num_hands].tobytes()
+                                 + landmarks[:num_hands].astype("<f2").tobytes())
+                frames += 1
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            hands.close()
+            print(f"Inference server: {client} disconnected after {frames} frames")
+
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if hasattr(socket, "AF_UNIX"):
+    class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+
+def serve(address, model_complexity=1, warmup_width=320):
+    """Run the inference server until interrupted; every client is served on its own thread"""
+    address = str(address)
+    if address.isdigit() or ":" in address:
+        host, _, port = address.rpartition(":")
+        server = _TCPServer((host or "127.0.0.1", int(port)), _InferenceHandler)
+        server.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    else:
+        remove_stale_socket(address)
+        server = _UnixServer(address, _InferenceHandler)
+    server.model_complexity = model_complexity
+    server.warmup_width = warmup_width
+    print(f"Inference server listening on {address} ({os.cpu_count()} cores)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if not (address.isdigit() or ":" in address) and os.path.exists(address):
+            os.remove(address)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hand landmark inference server for hand.py --remote clients")
+    parser.add_argument("address", nargs="?", default=DEFAULT_INFERENCE_ADDRESS,
+                        help="Unix socket path, localhost port, or HOST:PORT to listen on "
+                             "(0.0.0.0:PORT for the LAN)")
+    parser.add_argument("--model-complexity", type=int, default=1, choices=[0, 1])
+    args = parser.parse_args()
+    try:
+        serve(args.address, args.model_complexity)
+    except OSError as error:
+        parser.exit(1, f"Inference server not started: {error}\n")
+
+
+if __name__ == "__main__":
+    main()
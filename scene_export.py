@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 無視窗場景輸出: 記錄 hello.py 的烏龜繪圖指令, 輸出為 SVG 或以 NumPy 光柵化為 PNG
+
+import math
+import struct
+import zlib
+
+import numpy as np
+
+# 光柵化用到的顏色名稱, 其餘顏色以 "#rrggbb" 表示
+COLOR_NAMES = {
+    "lightblue": (173, 216, 230),
+    "brown": (165, 42, 42),
+    "black": (0, 0, 0),
+    "white": (255, 255, 255),
+}
+
+# 場景: 畫布大小, 背景色與依繪製順序排列的圖元
+#   ("line", x0, y0, x1, y1, 筆寬, 顏色)
+#   ("polygon", 頂點列表, 顏色)
+#   ("circle", 圓心 x, 圓心 y, 半徑, 顏色)
+class Scene:
+    def __init__(self, width=800, height=600, background="lightblue"):
+        self.width = width
+        self.height = height
+        self.background = background
+        self.items = []
+
+    # 取代 turtle.Turtle 的建構函數, 所有烏龜畫在同一個場景
+    def new_turtle(self):
+        return SceneTurtle(self)
+
+# 只記錄不繪圖的烏龜, 支援 hello.py 用到的指令 (標準模式: 0 度向東, 逆時針)
+class SceneTurtle:
+    def __init__(self, scene):
+        self.scene = scene
+        self.x = 0.0
+        self.y = 0.0
+        self.angle = 0.0
+        self.down = True
+        self.width = 1
+        self.pen = "black"
+        self.fill = "black"
+        # 填色中: 圖元列表中預留的位置與走過的頂點
+        self.fill_index = None
+        self.fill_path = None
+        self.fill_circle = None
+
+    def speed(self, speed=None):
+        pass
+
+    def hideturtle(self):
+        pass
+
+    def getscreen(self):
+        return self
+
+    # 螢幕介面 (tracer / update) 在無視窗時不需要做事
+    def tracer(self, n=None, delay=None):
+        return 0 if n is None else None
+
+    def update(self):
+        pass
+
+    def penup(self):
+        self.down = False
+
+    def pendown(self):
+        self.down = True
+
+    def pensize(self, width=None):
+        if width is None:
+            return self.width
+        self.width = width
+
+    def pencolor(self, color):
+        self.pen = color
+
+    def fillcolor(self, color):
+        self.fill = color
+
+    def position(self):
+        return (self.x, self.y)
+
+    def heading(self):
+        return self.angle
+
+    def setheading(self, angle):
+        self.angle = angle % 360
+
+    def right(self, angle):
+        self.setheading(self.angle - angle)
+
+    def left(self, angle):
+        self.setheading(self.angle + angle)
+
+    def forward(self, distance):
+        radians = math.radians(self.angle)
+        self.goto(self.x + distance * math.cos(radians), self.y + distance * math.sin(radians))
+
+    def goto(self, x, y=None):
+        if y is None:
+            x, y = x
+        if self.down:
+            self.scene.items.append(("line", self.x, self.y, x, y, self.width, self.pen))
+        self.x, self.y = x, y
+        if self.fill_path is not None:
+            self.fill_path.append((x, y))
+
+    # 整圓: 圓心在烏龜左側 radius 處, 畫完回到原位
+    # 外框與填色同色時, 以半徑加半個筆寬的實心圓表示
+    def circle(self, radius):
+        radians = math.radians(self.angle)
+        cx = self.x - radius * math.sin(radians)
+        cy = self.y + radius * math.cos(radians)
+        outline = self.width / 2 if self.down else 0
+        if self.fill_path is not None:
+            self.fill_circle = (cx, cy, abs(radius) + outline)
+        elif self.down:
+            self.scene.items.append(("circle", cx, cy, abs(radius) + outline, self.pen))
+
+    # 填色區塊排在它的外框線之下
+    def begin_fill(self):
+        self.fill_index = len(self.scene.items)
+        self.fill_path = [(self.x, self.y)]
+        self.fill_circle = None
+
+    def end_fill(self):
+        if self.fill_circle is not None:
+            cx, cy, radius = self.fill_circle
+            self.scene.items.insert(self.fill_index, ("circle", cx, cy, radius, self.fill))
+        elif len(self.fill_path) >= 3:
+            self.scene.items.insert(self.fill_index, ("polygon", self.fill_path, self.fill))
+        self.fill_index = None
+        self.fill_path = None
+        self.fill_circle = None
+
+# 寫出 SVG (y 軸向上, 與烏龜座標相同)
+def write_svg(scene, path):
+    lines = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{scene.width}" height="{scene.height}" '
+        f'viewBox="0 0 {scene.width} {scene.height}">',
+        f'<rect width="100%" height="100%" fill="{scene.background}"/>',
+        f'<g transform="translate({scene.width / 2:g} {scene.height / 2:g}) scale(1 -1)" '
+        f'stroke-linecap="round" stroke-linejoin="round">',
+    ]
+    for item in scene.items:
+        kind = item[0]
+        if kind == "line":
+            _, x0, y0, x1, y1, width, color = item
+            lines.append(f'<line x1="{x0:.2f}" y1="{y0:.2f}" x2="{x1:.2f}" y2="{y1:.2f}" '
+                         f'stroke="{color}" stroke-width="{max(width, 1):.2f}"/>')
+        elif kind == "polygon":
+            _, points, color = item
+            coords = " ".join(f"{x:.2f},{y:.2f}" for x, y in points)
+            lines.append(f'<polygon points="{coords}" fill="{color}" fill-rule="evenodd"/>')
+        elif kind == "circle":
+            _, cx, cy, radius, color = item
+            lines.append(f'<circle cx="{cx:.2f}" cy="{cy:.2f}" r="{radius:.2f}" fill="{color}"/>')
+    lines.append("</g>")
+    lines.append("</svg>")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+def color_rgb(color):
+    if color.startswith("#"):
+        return tuple(int(color[i:i + 2], 16) for i in (1, 3, 5))
+    return COLOR_NAMES[color.lower()]
+
+# 光柵化場景, 回傳 (高, 寬, 3) 的 RGB 陣列
+# 每個圖元只在自己的外框範圍內以向量化運算判斷像素中心是否落在形狀內
+def rasterize(scene, scale=1.0):
+    height = int(round(scene.height * scale))
+    width = int(round(scene.width * scale))
+    image = np.empty((height, width, 3), np.uint8)
+    image[:] = color_rgb(scene.background)
+
+    # 烏龜座標 -> 像素座標 (像素中心在 +0.5)
+    def to_pixels(x, y):
+        return x * scale + width / 2, height / 2 - y * scale
+
+    # 範圍內的像素中心網格與其在影像中的切片
+    def window(left, top, right, bottom):
+        x0, y0 = max(int(math.floor(left)), 0), max(int(math.floor(top)), 0)
+        x1, y1 = min(int(math.ceil(right)) + 1, width), min(int(math.ceil(bottom)) + 1, height)
+        if x0 >= x1 or y0 >= y1:
+            return None, None, None
+        xs = np.arange(x0, x1, dtype=np.float32)[None, :] + 0.5
+        ys = np.arange(y0, y1, dtype=np.float32)[:, None] + 0.5
+        return image[y0:y1, x0:x1], xs, ys
+
+    for item in scene.items:
+        kind = item[0]
+        if kind == "line":
+            _, x0, y0, x1, y1, line_width, color = item
+            ax, ay = to_pixels(x0, y0)
+            bx, by = to_pixels(x1, y1)
+            # 圓頭線段: 到線段距離不超過半個筆寬
+            half = max(line_width * scale, 1.0) / 2
+            region, xs, ys = window(min(ax, bx) - half, min(ay, by) - half, max(ax, bx) + half, max(ay, by) + half)
+            if region is None:
+                continue
+            dx, dy = bx - ax, by - ay
+            length2 = dx * dx + dy * dy
+            if length2 > 0:
+                t = np.clip(((xs - ax) * dx + (ys - ay) * dy) / length2, 0, 1)
+            else:
+                t = 0
+            inside = (xs - ax - t * dx) ** 2 + (ys - ay - t * dy) ** 2 <= half * half
+        elif kind == "circle":
+            _, cx, cy, radius, color = item
+            cx, cy = to_pixels(cx, cy)
+            radius = max(radius * scale, 0.5)
+            region, xs, ys = window(cx - radius, cy - radius, cx + radius, cy + radius)
+            if region is None:
+                continue
+            inside = (xs - cx) ** 2 + (ys - cy) ** 2 <= radius * radius
+        elif kind == "polygon":
+            _, points, color = item
+            px, py = to_pixels(*np.array(points, np.float64).T)
+            region, xs, ys = window(px.min(), py.min(), px.max(), py.max())
+            if region is None:
+                continue
+            # 奇偶規則 (與 Tk 及 SVG evenodd 相同): 向右的水平射線與邊相交奇數次即在內部
+            inside = np.zeros(region.shape[:2], bool)
+            for ax, ay, bx, by in zip(px, py, np.roll(px, -1), np.roll(py, -1)):
+                if ay == by:
+                    continue
+                crosses = (ay > ys) != (by > ys)
+                inside ^= crosses & (xs < ax + (ys - ay) * (bx - ax) / (by - ay))
+        else:
+            continue
+        region[inside] = color_rgb(color)
+    return image
+
+# 寫出 RGB 影像為 PNG (zlib 壓縮, 不需要影像函式庫)
+def write_png(image, path):
+    height, width = image.shape[:2]
+    # 每列前加上濾波類型 0
+    raw = np.zeros((height, width * 3 + 1), np.uint8)
+    raw[:, 1:] = image.reshape(height, width * 3)
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)))
+        f.write(chunk(b"IEND", b""))
+
+# 依副檔名輸出 .svg 或 .png
+def save_scene(scene, path, scale=1.0):
+    if path.lower().endswith(".svg"):
+        write_svg(scene, path)
+    elif path.lower().endswith(".png"):
+        write_png(rasterize(scene, scale), path)
+    else:
+        raise ValueError(f"不支援的輸出格式: {path} (請用 .svg 或 .png)")
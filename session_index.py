@@ -0,0 +1,363 @@
+# Session video with a seekable index: frame times, keyframes, note presses and hand
+# loss events, so a review can jump straight to any event of an hour-long recording
+import argparse
+import os
+import queue
+import struct
+import threading
+import time
+
+import cv2
+import numpy as np
+
+# Motion JPEG: every frame is a keyframe, and OpenCV's own AVI reader seeks through the
+# file's frame index instead of decoding from the start
+VIDEO_FOURCC = "MJPG"
+KEYFRAME_INTERVAL = 1
+# Version 2 adds the byte offset and size of every frame's JPEG in the AVI
+INDEX_VERSION = 2
+# Seconds of session between index saves while recording, so a crash loses at most this much
+INDEX_SAVE_INTERVAL = 5.0
+
+# AVI (RIFF) chunk header: FOURCC, data size; lists add a list type after it
+CHUNK_HEADER = struct.Struct("<4sI")
+LIST_HEADER_SIZE = 12
+
+# Queued to the writer thread instead of a frame: save the index as far as it goes
+SAVE_INDEX = object()
+
+# Hand events
+HAND_LOST = 0
+HAND_FOUND = 1
+
+
+def index_path(video_path):
+    return os.path.splitext(video_path)[0] + ".index.npz"
+
+
+class SessionVideoRecorder:
+    """Writes the clean camera frames to an AVI on a background thread and indexes them
+
+    add() copies the frame into one of a few preallocated buffers and returns; it only
+    waits when the writer has fallen `buffers` frames behind, so no frame goes missing
+    from the video or the index. The writer thread also saves the index every
+    INDEX_SAVE_INTERVAL seconds of session, with the byte offsets of the frames it
+    finds on disk so far, so a recording that never reaches close() stays seekable.
+    """
+
+    def __init__(self, path, frame_size, fps=30.0, buffers=8):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*VIDEO_FOURCC), fps, frame_size)
+        if not self.writer.isOpened():
+            raise RuntimeError(f"Cannot write {VIDEO_FOURCC} video to {path}")
+        width, height = frame_size
+        self.free = queue.Queue()
+        for _ in range(buffers):
+            self.free.put(np.empty((height, width, 3), np.uint8))
+        self.pending = queue.Queue()
+        self.thread = threading.Thread(target=self._write, name="session-video", daemon=True)
+        self.thread.start()
+
+        # Index, appended per frame and turned into arrays whenever it is saved
+        self.start_time = None
+        self.frame_times = []
+        self.presses = []
+        self.hand_events = []
+        self.previous_ids = set()
+        self.next_save = INDEX_SAVE_INTERVAL
+        # Where each frame's JPEG is in the file, filled in by scanning what the writer has flushed
+        self.frame_offsets = []
+        self.frame_sizes = []
+        self.scan_position = 0
+
+    def _write(self):
+        while True:
+            frame = self.pending.get()
+            if frame is None:
+                return
+            if frame is SAVE_INDEX:
+                self._save_index()
+                continue
+            self.writer.write(frame)
+            self.free.put(frame)
+
+    def _scan_frames(self):
+        """Record the offset and size of the frame chunks written to the file since the last scan"""
+        with open(self.path, "rb") as f:
+            f.seek(self.scan_position)
+            data = f.read()
+        position = 0
+        while position + CHUNK_HEADER.size <= len(data):
+            fourcc, size = CHUNK_HEADER.unpack_from(data, position)
+            if fourcc in (b"RIFF", b"LIST"):
+                # Step into lists; their sizes are only filled in when the video is closed
+                if position + LIST_HEADER_SIZE > len(data):
+                    break
+                position += LIST_HEADER_SIZE
+                continue
+            # Chunks are padded to an even size; stop at one that is not completely on disk yet
+            end = position + CHUNK_HEADER.size + size + (size & 1)
+            if end > len(data):
+                break
+            if fourcc[2:] == b"dc":
+                self.frame_offsets.append(self.scan_position + position + CHUNK_HEADER.size)
+                self.frame_sizes.append(size)
+            position = end
+        self.scan_position += position
+
+    def add(self, frame, timestamp, labels, triggered, notes, ids):
+        """Record one frame with its detection results: hand labels, triggered fingers,
+        the notes of the hand slots and the hand IDs"""
+        buffer = self.free.get()
+        np.copyto(buffer, frame)
+        self.pending.put(buffer)
+
+        if self.start_time is None:
+            self.start_time = timestamp
+        frame_index = len(self.frame_times)
+        seconds = timestamp - self.start_time
+        self.frame_times.append(seconds)
+
+        for idx, label in enumerate(labels):
+            for finger_index in np.flatnonzero(triggered[idx]):
+                self.presses.append((frame_index, seconds, label, int(finger_index), notes[idx, finger_index]))
+
+        current_ids = set(ids.tolist())
+        for hand_id in self.previous_ids - current_ids:
+            self.hand_events.append((frame_index, seconds, hand_id, HAND_LOST))
+        for hand_id in current_ids - self.previous_ids:
+            self.hand_events.append((frame_index, seconds, hand_id, HAND_FOUND))
+        self.previous_ids = current_ids
+
+        # Saved by the writer once the frames queued before it are written
+        if seconds >= self.next_save:
+            self.next_save = seconds + INDEX_SAVE_INTERVAL
+            self.pending.put(SAVE_INDEX)
+
+    def _save_index(self):
+        """Write the index as far as it goes, replacing the previous one in one step"""
+        self._scan_frames()
+        # Copies, the frame thread keeps appending while a save runs on the writer thread
+        frame_times = np.array(self.frame_times[:], np.float64)
+        presses = list(zip(*self.presses[:])) or [(), (), (), (), ()]
+        hand_events = list(zip(*self.hand_events[:])) or [(), (), (), ()]
+        press_times = np.array(presses[1], np.float64)
+        seconds = int(np.ceil(frame_times[-1])) + 1 if len(frame_times) else 0
+        path = index_path(self.path)
+        temporary = path + ".tmp"
+        with open(temporary, "wb") as f:
+            np.savez_compressed(
+                f,
+                version=INDEX_VERSION,
+                keyframe_interval=KEYFRAME_INTERVAL,
+                frame_times=frame_times,
+                frame_offsets=np.array(self.frame_offsets, np.int64),
+                frame_sizes=np.array(self.frame_sizes, np.int32),
+                press_frames=np.array(presses[0], np.int32),
+                press_times=press_times,
+                press_hands=np.array(presses[2], str),
+                press_fingers=np.array(presses[3], np.int8),
+                press_notes=np.array(presses[4], str),
+                notes_per_second=np.bincount(press_times.astype(np.int64), minlength=seconds).astype(np.int32),
+                hand_event_frames=np.array(hand_events[0], np.int32),
+                hand_event_times=np.array(hand_events[1], np.float64),
+                hand_event_ids=np.array(hand_events[2], np.int32),
+                hand_event_kinds=np.array(hand_events[3], np.int8),
+            )
+        os.replace(temporary, path)
+        return path
+
+    def close(self):
+        """Finish the video and write the complete index next to it; returns the index path"""
+        self.pending.put(None)
+        self.thread.join()
+        self.writer.release()
+        return self._save_index()
+
+
+class SessionIndex:
+    """Loaded index of a recorded session, with event queries that return frame numbers"""
+
+    def __init__(self, path):
+        # Version 1 indexes have no frame offsets
+        self.frame_offsets = np.zeros(0, np.int64)
+        self.frame_sizes = np.zeros(0, np.int32)
+        with np.load(path) as data:
+            if int(data["version"]) not in (1, INDEX_VERSION):
+                raise ValueError(f"{path} is not a version 1 or {INDEX_VERSION} session index")
+            for name in data.files:
+                setattr(self, name, data[name])
+        self.keyframe_interval = int(self.keyframe_interval)
+
+    def __len__(self):
+        return len(self.frame_times)
+
+    def press_frame(self, hand, finger_index, number):
+        """Frame of the number-th (from 1) press of one hand's finger, or None"""
+        frames = self.press_frames[(self.press_hands == hand) & (self.press_fingers == finger_index)]
+        return int(frames[number - 1]) if 0 < number <= len(frames) else None
+
+    def next_hand_event(self, frame, kind=HAND_LOST):
+        """First frame after `frame` where a hand was lost (or found), or None"""
+        frames = self.hand_event_frames[self.hand_event_kinds == kind]
+        position = np.searchsorted(frames, frame, side="right")
+        return int(frames[position]) if position < len(frames) else None
+
+    def next_press(self, frame):
+        position = np.searchsorted(self.press_frames, frame, side="right")
+        return int(self.press_frames[position]) if position < len(self.press_frames) else None
+
+    def frame_at(self, seconds):
+        """Frame shown at a time into the session"""
+        return max(0, int(np.searchsorted(self.frame_times, seconds, side="right")) - 1)
+
+    def keyframe_before(self, frame):
+        return frame - frame % self.keyframe_interval
+
+    def summary(self):
+        duration = self.frame_times[-1] if len(self) else 0.0
+        lost = int(np.count_nonzero(self.hand_event_kinds == HAND_LOST))
+        busiest = int(np.argmax(self.notes_per_second)) if len(self.notes_per_second) else 0
+        return (f"{len(self)} frames, {duration:.1f} s, {len(self.press_frames)} presses "
+                f"(busiest second {busiest} s: {self.notes_per_second.max() if len(self.notes_per_second) else 0}), "
+                f"{lost} hand losses")
+
+
+class SessionVideo:
+    """Random access to a recorded session video through its index"""
+
+    def __init__(self, path, index=None):
+        self.index = index or SessionIndex(index_path(path))
+        # Frames with a recorded offset are decoded straight from the file; that also
+        # works for a recording whose AVI was never finished
+        self.file = open(path, "rb")
+        # OpenCV's own MJPEG reader seeks through the AVI index; other backends may decode
+        # forward from an earlier position
+        self.cap = cv2.VideoCapture(path, cv2.CAP_OPENCV_MJPEG)
+        if not self.cap.isOpened():
+            self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened() and not len(self.index.frame_offsets):
+            self.file.close()
+            raise OSError(f"Cannot open {path}")
+        self.position = 0
+
+    def read(self, frame):
+        """Decode one frame; seeks to the nearest keyframe unless it is the next frame anyway"""
+        if 0 <= frame < len(self.index.frame_offsets):
+            self.file.seek(int(self.index.frame_offsets[frame]))
+            data = self.file.read(int(self.index.frame_sizes[frame]))
+            # The capture no longer follows on from its last frame
+            self.position = -1
+            return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if frame != self.position:
+            keyframe = self.index.keyframe_before(frame)
+            if not keyframe <= self.position < frame:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, keyframe)
+                self.position = keyframe
+            while self.position < frame:
+                self.cap.grab()
+                self.position += 1
+        ok, img = self.cap.read()
+        self.position += 1
+        return img if ok else None
+
+    def close(self):
+        self.cap.release()
+        self.file.close()
+
+
+def parse_finger(name):
+    """Hand and finger index from "Left_8" or "Left_Index" """
+    # Imported here, hand.py imports this module
+    from hand import ALL_FINGER_TIPS, FINGER_NAMES
+    hand, finger = name.split("_")
+    if finger.isdigit():
+        return hand, ALL_FINGER_TIPS.index(int(finger))
+    return hand, [n.lower() for n in FINGER_NAMES].index(finger.lower())
+
+
+def review(video, start_frame=0):
+    """Step through a session: space plays, ',' '.' step, 'n' next press, 'l' next hand loss, 'q' quits"""
+    index = video.index
+    frame = start_frame
+    playing = False
+    while True:
+        start = time.perf_counter()
+        img = video.read(frame)
+        seek_ms = (time.perf_counter() - start) * 1000
+        if img is None:
+            break
+        cv2.putText(img, f"{index.frame_times[frame]:.2f} s  frame {frame + 1}/{len(index)}  ({seek_ms:.1f} ms)",
+                    (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+        cv2.imshow("Session review", img)
+
+        if playing and frame + 1 < len(index):
+            delay = max(1, int((index.frame_times[frame + 1] - index.frame_times[frame]) * 1000))
+        else:
+            delay = 0
+        key = cv2.waitKey(delay)
+        target = None
+        if key == ord('q'):
+            break
+        elif key == ord(' '):
+            playing = not playing
+        elif key == ord(','):
+            target = frame - 1
+        elif key == ord('.'):
+            target = frame + 1
+        elif key == ord('n'):
+            target = index.next_press(frame)
+        elif key == ord('l'):
+            target = index.next_hand_event(frame, HAND_LOST)
+        elif playing:
+            frame = min(frame + 1, len(index) - 1)
+        if target is not None:
+            playing = False
+            frame = min(max(target, 0), len(index) - 1)
+    cv2.destroyAllWindows()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Jump to events in a session recorded with hand.py --record-video")
+    parser.add_argument("video", help="session video (.avi); its index is read from VIDEO.index.npz")
+    parser.add_argument("--press", nargs=2, metavar=("FINGER", "N"),
+                        help="the N-th press of a finger, e.g. Left_Index 37 or Left_8 37")
+    parser.add_argument("--next-loss", type=int, nargs="?", const=0, metavar="FRAME",
+                        help="the first frame after FRAME where a hand was lost")
+    parser.add_argument("--time", type=float, metavar="SECONDS", help="the frame at a time into the session")
+    parser.add_argument("-o", "--output", help="save the frame found as an image instead of reviewing from it")
+    args = parser.parse_args()
+
+    video = SessionVideo(args.video)
+    index = video.index
+    print(index.summary())
+
+    frame = 0
+    if args.press:
+        hand, finger_index = parse_finger(args.press[0])
+        frame = index.press_frame(hand, finger_index, int(args.press[1]))
+        if frame is None:
+            parser.exit(1, f"No press #{args.press[1]} of {args.press[0]}\n")
+    elif args.next_loss is not None:
+        frame = index.next_hand_event(args.next_loss, HAND_LOST)
+        if frame is None:
+            parser.exit(1, f"No hand lost after frame {args.next_loss}\n")
+    elif args.time is not None:
+        frame = index.frame_at(args.time)
+
+    start = time.perf_counter()
+    img = video.read(frame)
+    print(f"Frame {frame} at {index.frame_times[frame]:.2f} s, decoded in {(time.perf_counter() - start) * 1000:.1f} ms")
+    if args.output:
+        cv2.imwrite(args.output, img)
+        print(f"Saved to {args.output}")
+    else:
+        review(video, frame)
+    video.close()
+
+
+if __name__ == "__main__":
+    main()
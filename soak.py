@@ -0,0 +1,254 @@
+# Soak testing: long runs of the full pipeline, sampled for memory growth and latency drift
+import gc
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+from machine_info import machine_info
+
+# Stages timed on the detection thread, in the order they run
+DETECTION_STAGES = ["capture", "convert", "inference", "detection", "output"]
+DISPLAY_STAGES = ["overlay"]
+
+# Samples at the start left out of the trend, while caches, pools and the model settle
+WARMUP_SAMPLES = 1
+# Memory growth over the run flagged above this many MB and this fraction of the starting size
+MEMORY_GROWTH_MB = 20.0
+MEMORY_GROWTH_FRACTION = 0.1
+# Median stage latency or frame rate change between the first and last quarter flagged above this
+DRIFT_TOLERANCE = 0.25
+# Garbage collections longer than this stall at least one frame
+GC_PAUSE_LIMIT = 0.016
+
+# Optional, only used for a cross-platform RSS reading
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def current_rss():
+    """Resident set size of this process in bytes"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # Peak instead of current size, still shows growth
+        import resource
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def latency_summary(durations):
+    """Percentiles in ms of an array of durations in seconds"""
+    if not len(durations):
+        return None
+    p50, p95, p99 = np.percentile(durations, [50, 95, 99]) * 1000
+    return {"p50_ms": round(float(p50), 4), "p95_ms": round(float(p95), 4),
+            "p99_ms": round(float(p99), 4), "max_ms": round(float(durations.max()) * 1000, 4),
+            "count": int(len(durations))}
+
+
+class StageTimer:
+    """Per-stage durations of one thread, collected in preallocated arrays between samples"""
+
+    def __init__(self, stages, capacity=200000):
+        self.stages = stages
+        self.index = {stage: i for i, stage in enumerate(stages)}
+        self.durations = np.zeros((len(stages), capacity))
+        self.counts = np.zeros(len(stages), np.intp)
+        self.lock = threading.Lock()
+        self.last = None
+
+    def start(self):
+        """Mark the start of a frame"""
+        self.last = time.perf_counter()
+
+    def lap(self, stage):
+        """Record the time since start() or the previous lap as this stage's duration"""
+        now = time.perf_counter()
+        i = self.index[stage]
+        with self.lock:
+            count = self.counts[i]
+            # Past capacity the rest of the interval is dropped rather than reallocating
+            if count < self.durations.shape[1]:
+                self.durations[i, count] = now - self.last
+                self.counts[i] = count + 1
+        self.last = now
+
+    def take(self):
+        """Return the latency summary of every stage since the last take() and start over"""
+        with self.lock:
+            summaries = {stage: latency_summary(self.durations[i, :self.counts[i]])
+                         for stage, i in self.index.items()}
+            self.counts[:] = 0
+        return summaries
+
+
+class SoakMonitor:
+    """Samples RSS, traced allocations, stage latencies and GC pauses at a fixed interval
+
+    Create it before the pipeline starts, so tracemalloc sees every allocation.
+    """
+
+    def __init__(self, duration, interval=60.0, report_path="soak-report.json", top_allocations=10):
+        self.duration = duration
+        self.interval = interval
+        self.report_path = report_path
+        self.top_allocations = top_allocations
+        self.detection_timer = StageTimer(DETECTION_STAGES)
+        self.display_timer = StageTimer(DISPLAY_STAGES)
+        self.samples = []
+
+        # GC pauses, appended from whichever thread triggered the collection
+        self.gc_pauses = []
+        self.gc_start = None
+        gc.callbacks.append(self._gc_callback)
+
+        if top_allocations:
+            tracemalloc.start()
+            self.first_snapshot = None
+
+    def _gc_callback(self, phase, info):
+        if phase == "start":
+            self.gc_start = time.perf_counter()
+        elif self.gc_start is not None:
+            self.gc_pauses.append((info["generation"], time.perf_counter() - self.gc_start))
+            self.gc_start = None
+
+    def sample(self, elapsed, frames, fps):
+        """Take one sample of everything and print a one-line summary"""
+        pauses, self.gc_pauses = self.gc_pauses, []
+        pause_times = np.array([pause for _, pause in pauses])
+        sample = {
+            "elapsed_s": round(elapsed, 1),
+            "frames": frames,
+            "fps": round(fps, 1),
+            "rss_mb": round(current_rss() / 2**20, 2),
+            "stages": {**self.detection_timer.take(), **self.display_timer.take()},
+            "gc": {
+                "collections": len(pauses),
+                "by_generation": [sum(1 for generation, _ in pauses if generation == g) for g in range(3)],
+                "total_ms": round(float(pause_times.sum()) * 1000, 3),
+                "max_ms": round(float(pause_times.max()) * 1000, 3) if len(pauses) else 0.0,
+            },
+        }
+
+        if self.top_allocations:
+            snapshot = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap*"),
+            ])
+            sample["traced_mb"] = round(tracemalloc.get_traced_memory()[0] / 2**20, 2)
+            if self.first_snapshot is None:
+                self.first_snapshot = snapshot
+            # Allocation sites that grew most since the first sample
+            growth = [stat for stat in snapshot.compare_to(self.first_snapshot, "lineno")
+                      if stat.size_diff > 0][:self.top_allocations]
+            sample["top_growth"] = [{"where": str(stat.traceback[0]), "size_kb": round(stat.size / 1024, 1),
+                                     "growth_kb": round(stat.size_diff / 1024, 1), "count": stat.count}
+                                    for stat in growth]
+
+        self.samples.append(sample)
+        inference = sample["stages"].get("inference") or {}
+        print(f"Soak {elapsed:7.0f} s: {fps:6.1f} fps, RSS {sample['rss_mb']:.1f} MB, "
+              f"inference p50 {inference.get('p50_ms', 0):.2f} ms, "
+              f"GC {sample['gc']['collections']} ({sample['gc']['max_ms']:.1f} ms max)")
+
+    def run(self, piano, detection, latest_frame):
+        """Draw detected frames off-screen as fast as they come and sample until the duration ends"""
+        start = last_sample = time.perf_counter()
+        frames_at_sample = 0
+        timer = self.display_timer
+        while detection.is_alive():
+            now = time.perf_counter()
+            if now - last_sample >= self.interval or now - start >= self.duration:
+                frames = detection.frames
+                self.sample(now - start, frames, (frames - frames_at_sample) / (now - last_sample))
+                frames_at_sample, last_sample = frames, now
+                if now - start >= self.duration:
+                    break
+
+            img, state = latest_frame.take()
+            if img is None:
+                time.sleep(0.0005)
+                continue
+            hands_state, fps, model_loading = state
+            timer.start()
+            piano.draw_overlay(img, fps, model_loading, hands_state)
+            timer.lap("overlay")
+
+    def trend_flags(self):
+        """Flags for memory growth, latency drift and long GC pauses across the samples"""
+        samples = self.samples[WARMUP_SAMPLES:]
+        flags = []
+        if len(samples) < 2:
+            return flags
+
+        for field, label in (("rss_mb", "RSS"), ("traced_mb", "traced memory")):
+            if field not in samples[0]:
+                continue
+            first, last = samples[0][field], samples[-1][field]
+            elapsed = samples[-1]["elapsed_s"] - samples[0]["elapsed_s"]
+            growth = last - first
+            if growth > MEMORY_GROWTH_MB and growth > first * MEMORY_GROWTH_FRACTION:
+                rate = growth / elapsed * 3600 if elapsed else 0.0
+                flags.append(f"{label} grew {first:.1f} -> {last:.1f} MB ({rate:.1f} MB/hour)")
+
+        # Medians of the first and last quarter of the run
+        quarter = max(1, len(samples) // 4)
+        early, late = samples[:quarter], samples[-quarter:]
+        for stage in DETECTION_STAGES + DISPLAY_STAGES:
+            before = [s["stages"][stage]["p50_ms"] for s in early if s["stages"].get(stage)]
+            after = [s["stages"][stage]["p50_ms"] for s in late if s["stages"].get(stage)]
+            if before and after and np.median(before) > 0:
+                change = np.median(after) / np.median(before) - 1
+                if change > DRIFT_TOLERANCE:
+                    flags.append(f"{stage} p50 drifted {np.median(before):.3f} -> {np.median(after):.3f} ms "
+                                 f"({change:+.0%})")
+        fps_before = np.median([s["fps"] for s in early])
+        fps_after = np.median([s["fps"] for s in late])
+        if fps_before > 0 and fps_after < fps_before * (1 - DRIFT_TOLERANCE):
+            flags.append(f"frame rate dropped {fps_before:.1f} -> {fps_after:.1f} fps")
+
+        longest = max(s["gc"]["max_ms"] for s in samples)
+        if longest > GC_PAUSE_LIMIT * 1000:
+            flags.append(f"GC pause of {longest:.1f} ms, longer than a frame")
+        return flags
+
+    def write_report(self, settings):
+        """Write the time series and flags as JSON, print the flags and return them"""
+        flags = self.trend_flags()
+        report = {
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "machine": machine_info(),
+            "settings": settings,
+            "interval_s": self.interval,
+            "tracemalloc": bool(self.top_allocations),
+            "flags": flags,
+            "samples": self.samples,
+        }
+        directory = os.path.dirname(self.report_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+        print(f"Soak report ({len(self.samples)} samples) written to {self.report_path}")
+        for flag in flags:
+            print(f"FLAG: {flag}")
+        if not flags:
+            print("No memory growth or latency drift found")
+        return flags
+
+    def close(self):
+        gc.callbacks.remove(self._gc_callback)
+        if self.top_allocations:
+            tracemalloc.stop()